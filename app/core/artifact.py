@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+from z3 import *
+
+# A compiled contract saved next to its logics.json: the rules as SMT-LIB2 text, the variable
+# and rule-label map, and the formula trees used by the exact evaluation. Bump ARTIFACT_VERSION
+# whenever the layout changes; artifacts of another version or contract are ignored.
+ARTIFACT_VERSION = "1"
+ARTIFACT_FILENAME = "logics.smt2.json"
+
+def to_artifact(key, engine_version, vars, formulas, programs, rule_ids):
+
+    declarations = [f"(declare-fun {var.sexpr()} () Real)" for var in vars.values()]
+    assertions = [f"(assert {formula.sexpr()})" for formula in formulas]
+
+    return {
+        "artifact_version": ARTIFACT_VERSION,
+        "engine_version": engine_version,
+        "z3_version": get_version_string(),
+        "contract_key": key,
+        "smt2": "\n".join(declarations + assertions) + "\n",
+        "variables": list(vars),
+        "rules": [{"id": rule_id, "label": f"RULE_{rule_id}"} for rule_id in rule_ids],
+        "programs": programs
+    }
+
+def is_current(artifact, key, engine_version):
+
+    return (artifact.get("artifact_version") == ARTIFACT_VERSION and
+            artifact.get("engine_version") == engine_version and
+            artifact.get("contract_key") == key)
+
+def as_program(node):
+
+    return tuple(as_program(n) for n in node) if isinstance(node, list) else node
+
+def from_artifact(artifact, ctx=None):
+
+    vars = {name: Real(name, ctx) for name in artifact["variables"]}
+
+    # parse_smt2_string returns the assertions in file order, one per rule.
+    formulas = list(parse_smt2_string(artifact["smt2"], ctx=ctx))
+    assert len(formulas) == len(artifact["rules"]), "ARTIFACT_RULES_MISMATCH"
+
+    programs = [as_program(program) for program in artifact["programs"]]
+
+    return vars, formulas, programs
+
+def read_artifact(path):
+
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+def write_artifact(path, artifact):
+
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent=4)
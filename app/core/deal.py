@@ -1,15 +1,19 @@
 from app.core.z3engine import verify_logics
+from app.core.result_cache import verify_logics_cached
+from app.core.history import History, PeriodRecord, VerificationResult
 
 class Deal:
-    def __init__(self, id):
+    def __init__(self, id, store=None):
 
         assert isinstance(id, str), "ID_NOT_STR"
         assert len(id) > 0, "ID_EMPTY"
 
         self.id = id
-        self.history = {}
+        self.history = History()
+        self.store = store
 
-    def process_logics_and_cfo_data(self, year, quarter, logics, cfo_data):
+    def process_logics_and_cfo_data(self, year, quarter, logics, cfo_data, quiet=False, cache=None, keep_model=False,
+                                    limits=None, artifact=None):
 
         assert isinstance(year, str), "YEAR_NOT_STR"
         assert len(year) == 4, "YEAR_FORMAT_INVALID"
@@ -18,15 +22,19 @@ class Deal:
         assert isinstance(logics, dict), "LOGICS_NOT_DICT"
         assert isinstance(cfo_data, dict), "CFO_DATA_NOT_DICT"
 
-        if year not in self.history:
-            self.history[year] = {
-                "Q1": None, "Q2": None, "Q3": None, "Q4": None
-            }
-
-        z3_result = verify_logics(logics, cfo_data)
-        
-        self.history[year][quarter] = {
-            "logics": logics,
-            "cfo_data": cfo_data,
-            "z3_result": z3_result
-        }
\ No newline at end of file
+        if cache is None:
+            z3_result = verify_logics(logics, cfo_data, quiet=quiet, limits=limits, artifact=artifact)
+        else:
+            z3_result = verify_logics_cached(logics, cfo_data, cache, quiet=quiet, limits=limits, artifact=artifact)
+
+        self.record(year, quarter, logics, cfo_data, VerificationResult.from_response(z3_result, keep_model=keep_model))
+
+    def record(self, year, quarter, logics, cfo_data, z3_result):
+
+        if not isinstance(z3_result, VerificationResult):
+            z3_result = VerificationResult.from_response(z3_result)
+
+        self.history.record(year, quarter, PeriodRecord(logics, cfo_data, z3_result))
+
+        if self.store is not None:
+            self.store.update(self.id, year, quarter, cfo_data, z3_result)
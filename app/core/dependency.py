@@ -0,0 +1,176 @@
+import math
+import numpy as np
+from app.core.formula import NotDetermined, formula_variables, lift, lower_python, lower_python_bool, lower_numpy
+
+def analyze_rules(logical_conditions, programs):
+
+    rules = []
+    for rule, program in zip(logical_conditions, programs):
+
+        targets = []
+        if program[0] == "cmp" and program[1] == "==":
+            for side, other in [(program[2], program[3]), (program[3], program[2])]:
+                if side[0] == "var":
+                    targets.append((side[1], other))
+
+        rules.append({
+            "id": rule['id'],
+            "program": program,
+            "variables": formula_variables(program),
+            "targets": targets
+        })
+
+    return rules
+
+def rule_components(rules, known):
+
+    # Rules sharing a variable that the data leaves free constrain each other; with the known
+    # variables fixed, each connected component of that graph is satisfiable on its own.
+    parent = list(range(len(rules)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, rule in enumerate(rules):
+        for name in rule["variables"]:
+            if name in known:
+                continue
+            if name in owner:
+                parent[find(i)] = find(owner[name])
+            else:
+                owner[name] = i
+
+    components = {}
+    for i, rule in enumerate(rules):
+        components.setdefault(find(i), []).append(rule)
+
+    return list(components.values())
+
+def determined_definitions(rules, env):
+
+    # Definitions whose value the data already fixes (ebitda from revenue and operating_expenses, ...),
+    # evaluated exactly; a zero denominator leaves the variable to the solver.
+    env = dict(env)
+    definitions = {}
+
+    progress = True
+    while progress:
+        progress = False
+        for rule in rules:
+            for name, expr in rule["targets"]:
+                if name in env or not formula_variables(expr) <= env.keys():
+                    continue
+                try:
+                    env[name] = lift(lower_python(expr, env))
+                except NotDetermined:
+                    continue
+                definitions[name] = rule
+                progress = True
+
+    return definitions
+
+def with_definitions(rules, selected, definitions):
+
+    # Adds the definition chain of every fixed variable the selected rules read.
+    selected = set(selected)
+    pending = [name for rule in rules if rule["id"] in selected for name in rule["variables"] if name in definitions]
+    while pending:
+        rule = definitions[pending.pop()]
+        if rule["id"] not in selected:
+            selected.add(rule["id"])
+            pending += [name for name in rule["variables"] if name in definitions]
+
+    return [rule["id"] for rule in rules if rule["id"] in selected]
+
+def slice_rules(rules, known, query, definitions=None):
+
+    # Cone of influence of the query variables: the components holding a rule that reads one of them.
+    # Every other component (the rest) gives the same answer whatever values the query variables take.
+    # Variables fixed by definitions count as known, and both sides take their definition chain along.
+    definitions = definitions or {}
+
+    selected, rest = set(), set()
+    for component in rule_components(rules, set(known) | definitions.keys()):
+        side = selected if any(rule["variables"] & query for rule in component) else rest
+        side.update(rule["id"] for rule in component)
+
+    return with_definitions(rules, selected, definitions), with_definitions(rules, rest, definitions)
+
+def split_definitions(rules, known):
+
+    # A rule defines the first variable it can solve for that is neither known nor defined already;
+    # every other rule is a check.
+    definitions = {}
+    checks = []
+
+    for rule in rules:
+        target = next(((name, expr) for name, expr in rule["targets"]
+                       if name not in known and name not in definitions), None)
+        if target is None:
+            checks.append(rule)
+        else:
+            name, expr = target
+            definitions[name] = {"rule": rule, "expr": expr, "depends": formula_variables(expr)}
+
+    return definitions, checks
+
+def plan_evaluation(rules, var_names, known):
+
+    definitions, checks = split_definitions(rules, known)
+
+    if any(name not in known and name not in definitions for name in var_names):
+        return None
+
+    order = []
+    resolved = set(known)
+    pending = dict(definitions)
+    while pending:
+        ready = [name for name, d in pending.items() if d["depends"] <= resolved]
+        if not ready:
+            return None
+        for name in ready:
+            order.append((name, pending.pop(name)["expr"]))
+            resolved.add(name)
+
+    return {"order": order, "checks": checks}
+
+def evaluate_plan(plan, cfo_data):
+
+    env = {name: lift(value) for name, value in cfo_data.items()}
+
+    for name, expr in plan["order"]:
+        env[name] = lift(lower_python(expr, env))
+
+    conflict_rules = [rule["id"] for rule in plan["checks"] if not lower_python_bool(rule["program"], env)]
+
+    return env, conflict_rules
+
+def decimal_value(value):
+
+    # Mirrors z3's as_decimal(2): truncated towards zero to two decimals. Integer division rounds like
+    # float() of the printed decimal, without printing values past Python's int-to-str digit limit.
+    cents = math.floor(abs(value) * 100)
+    try:
+        magnitude = cents / 100
+    except OverflowError:
+        magnitude = math.inf
+
+    return -magnitude if value < 0 else magnitude
+
+def evaluate_plan_array(plan, arrays, shape):
+
+    env = {name: np.broadcast_to(np.asarray(value, dtype=float), shape) for name, value in arrays.items()}
+    unsafe = np.zeros(shape, dtype=bool)
+
+    for name, expr in plan["order"]:
+        env[name] = np.broadcast_to(np.asarray(lower_numpy(expr, env, unsafe), dtype=float), shape)
+
+    verdicts = {}
+    for rule in plan["checks"]:
+        verdicts[rule["id"]] = np.broadcast_to(np.asarray(lower_numpy(rule["program"], env, unsafe), dtype=bool), shape)
+
+    return env, verdicts, unsafe
@@ -0,0 +1,266 @@
+import ast
+import math
+from fractions import Fraction
+import numpy as np
+from z3 import If, And, Or
+
+# Formula grammar accepted from logics.json. Anything else is rejected when the contract is compiled,
+# before a single value is computed:
+#   number | variable | -e | +e | e (+ - * / **) e | e (== != < <= > >=) e
+#   abs(e) | min(e, e) | max(e, e) | And(e, ...) | Or(e, ...) | If(e, e, e)
+#
+# A compiled formula is a tree of tuples:
+#   ("const", value) ("var", name) ("unary", op, e) ("bin", op, a, b) ("cmp", op, a, b) ("call", name, args)
+
+BINARY_OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**"}
+UNARY_OPERATORS = {ast.USub: "-", ast.UAdd: "+"}
+COMPARISON_OPERATORS = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="}
+FUNCTION_ARITY = {"abs": (1, 1), "min": (2, 2), "max": (2, 2), "And": (1, None), "Or": (1, None), "If": (3, 3)}
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b
+}
+
+ARITHMETIC = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "**": lambda a, b: a ** b
+}
+
+TIE_TOLERANCE = 1e-9
+
+class NotDetermined(Exception):
+    pass
+
+def position(node):
+
+    return f"{getattr(node, 'lineno', 1)}:{getattr(node, 'col_offset', 0) + 1}"
+
+def compile_formula(formula, var_names):
+
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError as e:
+        raise AssertionError(f"FORMULA_SYNTAX_INVALID at {e.lineno or 1}:{e.offset or 1}")
+
+    return compile_node(tree.body, set(var_names))
+
+def compile_node(node, var_names):
+
+    if isinstance(node, ast.Constant):
+        assert isinstance(node.value, (int, float)), f"FORMULA_CONSTANT_INVALID at {position(node)}"
+        return ("const", node.value)
+
+    if isinstance(node, ast.Name):
+        assert node.id in var_names, f"FORMULA_NAME_UNKNOWN at {position(node)}"
+        return ("var", node.id)
+
+    if isinstance(node, ast.UnaryOp):
+        assert type(node.op) in UNARY_OPERATORS, f"FORMULA_OPERATOR_NOT_ALLOWED at {position(node)}"
+        return ("unary", UNARY_OPERATORS[type(node.op)], compile_node(node.operand, var_names))
+
+    if isinstance(node, ast.BinOp):
+        assert type(node.op) in BINARY_OPERATORS, f"FORMULA_OPERATOR_NOT_ALLOWED at {position(node)}"
+        return ("bin", BINARY_OPERATORS[type(node.op)],
+                compile_node(node.left, var_names), compile_node(node.right, var_names))
+
+    if isinstance(node, ast.Compare):
+        assert len(node.ops) == 1, f"FORMULA_CHAINED_COMPARISON at {position(node)}"
+        assert type(node.ops[0]) in COMPARISON_OPERATORS, f"FORMULA_OPERATOR_NOT_ALLOWED at {position(node)}"
+        return ("cmp", COMPARISON_OPERATORS[type(node.ops[0])],
+                compile_node(node.left, var_names), compile_node(node.comparators[0], var_names))
+
+    if isinstance(node, ast.Call):
+        assert isinstance(node.func, ast.Name) and node.func.id in FUNCTION_ARITY, f"FORMULA_FUNCTION_NOT_ALLOWED at {position(node)}"
+        assert not node.keywords, f"FORMULA_KEYWORD_ARGUMENTS_NOT_ALLOWED at {position(node)}"
+        low, high = FUNCTION_ARITY[node.func.id]
+        assert len(node.args) >= low and (high is None or len(node.args) <= high), f"FORMULA_ARITY_INVALID at {position(node)}"
+        return ("call", node.func.id, tuple(compile_node(a, var_names) for a in node.args))
+
+    raise AssertionError(f"FORMULA_NODE_NOT_ALLOWED at {position(node)}")
+
+def formula_variables(program):
+
+    kind = program[0]
+    if kind == "var":
+        return {program[1]}
+    if kind == "const":
+        return set()
+    if kind == "unary":
+        return formula_variables(program[2])
+    if kind in ["bin", "cmp"]:
+        return formula_variables(program[2]) | formula_variables(program[3])
+    return set().union(*[formula_variables(a) for a in program[2]])
+
+def lower_z3(program, vars, ctx):
+
+    # Python operators are applied to z3 objects and plain constants exactly like the former eval()
+    # did, so the solver receives the same expressions (constant sub-expressions stay Python floats).
+    kind = program[0]
+
+    if kind == "const":
+        return program[1]
+    if kind == "var":
+        return vars[program[1]]
+    if kind == "unary":
+        value = lower_z3(program[2], vars, ctx)
+        return -value if program[1] == "-" else +value
+    if kind == "bin":
+        return ARITHMETIC[program[1]](lower_z3(program[2], vars, ctx), lower_z3(program[3], vars, ctx))
+    if kind == "cmp":
+        return COMPARISONS[program[1]](lower_z3(program[2], vars, ctx), lower_z3(program[3], vars, ctx))
+
+    # Calls on constants only have no z3 argument to take the context from, so it is passed explicitly.
+    name, args = program[1], [lower_z3(a, vars, ctx) for a in program[2]]
+    if name == "abs":
+        return If(args[0] >= 0, args[0], -args[0], ctx)
+    if name == "max":
+        return If(args[0] > args[1], args[0], args[1], ctx)
+    if name == "min":
+        return If(args[0] < args[1], args[0], args[1], ctx)
+    if name == "And":
+        return And(*args, ctx)
+    if name == "Or":
+        return Or(*args, ctx)
+    return If(*args, ctx)
+
+def lift(value):
+
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise NotDetermined()
+    if isinstance(value, float) and not math.isfinite(value):
+        raise NotDetermined()
+    return Fraction(str(value))
+
+def arithmetic(op, a, b):
+
+    exact = isinstance(a, Fraction) or isinstance(b, Fraction)
+    if exact:
+        a, b = lift(a), lift(b)
+
+    if op == "/" and b == 0:
+        raise NotDetermined()
+    if op == "**" and exact and (b.denominator != 1 or (a == 0 and b < 0)):
+        raise NotDetermined()
+
+    return ARITHMETIC[op](a, b)
+
+def lower_python(program, env):
+
+    # Exact evaluation: variables are Fractions built like RealVal(str(x)), constants combine as
+    # plain Python numbers until they meet a variable. NotDetermined means "ask the solver".
+    kind = program[0]
+
+    if kind == "const":
+        return program[1]
+
+    if kind == "var":
+        if program[1] not in env:
+            raise NotDetermined()
+        return env[program[1]]
+
+    if kind == "unary":
+        value = lower_python(program[2], env)
+        return -value if program[1] == "-" else +value
+
+    if kind == "bin":
+        return arithmetic(program[1], lower_python(program[2], env), lower_python(program[3], env))
+
+    if kind == "cmp":
+        a, b = lower_python(program[2], env), lower_python(program[3], env)
+        if isinstance(a, Fraction) or isinstance(b, Fraction):
+            a, b = lift(a), lift(b)
+        return COMPARISONS[program[1]](a, b)
+
+    name, args = program[1], program[2]
+
+    if name == "If":
+        return lower_python(args[1] if lower_python_bool(args[0], env) else args[2], env)
+    if name == "And":
+        return all(lower_python_bool(a, env) for a in args)
+    if name == "Or":
+        return any(lower_python_bool(a, env) for a in args)
+
+    values = [lower_python(a, env) for a in args]
+    if any(isinstance(v, Fraction) for v in values):
+        values = [lift(v) for v in values]
+
+    if name == "abs":
+        return abs(values[0])
+    if name == "max":
+        return values[0] if values[0] > values[1] else values[1]
+    return values[0] if values[0] < values[1] else values[1]
+
+def lower_python_bool(program, env):
+
+    value = lower_python(program, env)
+    if not isinstance(value, bool):
+        raise NotDetermined()
+    return value
+
+def lower_numpy(program, env, unsafe):
+
+    # Float64 counterpart of lower_python(). Cells whose verdict could depend on rounding (near ties,
+    # divisions by zero, non-finite values) are flagged in unsafe for an exact re-check.
+    kind = program[0]
+
+    if kind == "const":
+        return program[1]
+
+    if kind == "var":
+        if program[1] not in env:
+            raise NotDetermined()
+        return env[program[1]]
+
+    if kind == "unary":
+        value = lower_numpy(program[2], env, unsafe)
+        return -value if program[1] == "-" else +value
+
+    if kind == "bin":
+        a, b = lower_numpy(program[2], env, unsafe), lower_numpy(program[3], env, unsafe)
+
+        if not isinstance(a, np.ndarray) and not isinstance(b, np.ndarray):
+            return arithmetic(program[1], a, b)
+
+        with np.errstate(all="ignore"):
+            if program[1] == "/":
+                unsafe |= np.asarray(b) == 0
+            value = ARITHMETIC[program[1]](np.asarray(a, dtype=float), b)
+
+        unsafe |= ~np.isfinite(value)
+        return value
+
+    if kind == "cmp":
+        a, b = lower_numpy(program[2], env, unsafe), lower_numpy(program[3], env, unsafe)
+
+        if not isinstance(a, np.ndarray) and not isinstance(b, np.ndarray):
+            return lower_python(program, {})
+
+        with np.errstate(all="ignore"):
+            scale = np.maximum(np.maximum(np.abs(a), np.abs(b)), 1.0)
+            unsafe |= np.abs(np.subtract(a, b)) <= TIE_TOLERANCE * scale
+
+        return COMPARISONS[program[1]](np.asarray(a), b)
+
+    name, args = program[1], [lower_numpy(a, env, unsafe) for a in program[2]]
+
+    if name == "If":
+        return np.where(args[0], args[1], args[2])
+    if name == "And":
+        return np.logical_and.reduce(np.broadcast_arrays(*args))
+    if name == "Or":
+        return np.logical_or.reduce(np.broadcast_arrays(*args))
+    if name == "abs":
+        return np.abs(args[0])
+    if name == "max":
+        return np.where(np.greater(args[0], args[1]), args[0], args[1])
+    return np.where(np.less(args[0], args[1]), args[0], args[1])
@@ -0,0 +1,181 @@
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+
+class Record:
+
+    # Records keep their fields in __slots__ and still answer the dict-style access
+    # (record["key"], record.get("key")) used by reports and callers of the former nested dicts.
+    __slots__ = ()
+
+    def __getitem__(self, key):
+
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+
+        return list(self.__slots__)
+
+    def items(self):
+
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def to_dict(self):
+
+        return dict(self.items())
+
+    def __eq__(self, other):
+
+        return type(other) is type(self) and self.items() == other.items()
+
+    def __repr__(self):
+
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class VerificationResult(Record):
+
+    __slots__ = ("status", "is_compliant", "calculated_values", "model", "missing",
+                 "norm_metric", "conflict_variables", "conflict_rules")
+
+    def __init__(self, status, is_compliant, calculated_values, model, missing, norm_metric,
+                 conflict_variables, conflict_rules):
+
+        self.status = status
+        self.is_compliant = is_compliant
+        self.calculated_values = calculated_values
+        self.model = model
+        self.missing = missing
+        self.norm_metric = norm_metric
+        self.conflict_variables = conflict_variables
+        self.conflict_rules = conflict_rules
+
+    @classmethod
+    def from_response(cls, response, keep_model=False):
+
+        # A live z3 model pins its solver context in memory and cannot be pickled, so it is dropped by default.
+        # is_compliant stays None when the solver ran out of budget (status "UNKNOWN").
+        is_compliant = response["is_compliant"]
+
+        return cls(
+            status=response["status"],
+            is_compliant=None if is_compliant is None else bool(is_compliant),
+            calculated_values=dict(response["calculated_values"]),
+            model=response["model"] if keep_model else None,
+            missing=list(response["missing"]),
+            norm_metric=response["norm_metric"],
+            conflict_variables=list(response["conflict_variables"]),
+            conflict_rules=list(response["conflict_rules"])
+        )
+
+class PeriodRecord(Record):
+
+    __slots__ = ("logics", "cfo_data", "z3_result")
+
+    def __init__(self, logics, cfo_data, z3_result):
+
+        self.logics = logics
+        self.cfo_data = cfo_data
+        self.z3_result = z3_result
+
+class YearView:
+    def __init__(self, history, year):
+
+        self.history = history
+        self.year = year
+
+    def __getitem__(self, quarter):
+
+        if quarter not in QUARTERS:
+            raise KeyError(quarter)
+        return self.history.period(self.year, quarter)
+
+    def __contains__(self, quarter):
+
+        return quarter in QUARTERS
+
+    def __iter__(self):
+
+        return iter(QUARTERS)
+
+    def __len__(self):
+
+        return len(QUARTERS)
+
+    def get(self, quarter, default=None):
+
+        return self.history.period(self.year, quarter) if quarter in QUARTERS else default
+
+    def keys(self):
+
+        return list(QUARTERS)
+
+    def values(self):
+
+        return [self.history.period(self.year, q) for q in QUARTERS]
+
+    def items(self):
+
+        return [(q, self.history.period(self.year, q)) for q in QUARTERS]
+
+class History:
+
+    # Periods are indexed by (year, quarter); history[year] still reads like the former
+    # {"Q1": ..., "Q4": ...} dict, with None for quarters that were never processed.
+    def __init__(self):
+
+        self.records = {}
+        self.years = {}
+
+    def record(self, year, quarter, record):
+
+        self.years.setdefault(year, None)
+        self.records[(year, quarter)] = record
+
+    def period(self, year, quarter):
+
+        return self.records.get((year, quarter))
+
+    def periods(self):
+
+        return [(year, quarter, self.records[(year, quarter)])
+                for year, quarter in sorted(self.records, key=lambda p: (p[0], QUARTERS.index(p[1])))]
+
+    def __getitem__(self, year):
+
+        if year not in self.years:
+            raise KeyError(year)
+        return YearView(self, year)
+
+    def __contains__(self, year):
+
+        return year in self.years
+
+    def __iter__(self):
+
+        return iter(list(self.years))
+
+    def __len__(self):
+
+        return len(self.years)
+
+    def get(self, year, default=None):
+
+        return YearView(self, year) if year in self.years else default
+
+    def keys(self):
+
+        return list(self.years)
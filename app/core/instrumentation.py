@@ -0,0 +1,140 @@
+import functools
+import heapq
+import json
+import time
+from contextlib import contextmanager
+
+# Process-wide timings and counters. Stages accumulate wall and CPU seconds per name
+# ("verify.solve", "report.final", ...); counters are plain event counts ("solver.checks", "verify.sat", ...).
+SLOWEST_PERIODS = 10
+PROMETHEUS_PREFIX = "covenant_check"
+
+_stages = {}
+_counters = {}
+_periods = []
+
+def reset():
+
+    _stages.clear()
+    _counters.clear()
+    _periods.clear()
+
+def add_time(name, wall, cpu, calls=1):
+
+    entry = _stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+    entry["calls"] += calls
+    entry["wall_seconds"] += wall
+    entry["cpu_seconds"] += cpu
+
+def count(name, n=1):
+
+    _counters[name] = _counters.get(name, 0) + n
+
+def record_period(label, seconds):
+
+    item = (seconds, label)
+    if len(_periods) < SLOWEST_PERIODS:
+        heapq.heappush(_periods, item)
+    elif item > _periods[0]:
+        heapq.heapreplace(_periods, item)
+
+@contextmanager
+def stage(name):
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+def instrumented(name):
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class Timer:
+
+    # Consecutive laps of one code path: lap(name) books the time since the previous lap under name.
+    def __init__(self):
+
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def lap(self, name):
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        elapsed = wall - self.wall
+        add_time(name, elapsed, cpu - self.cpu)
+        self.wall, self.cpu = wall, cpu
+
+        return elapsed
+
+def ratio(a, b):
+
+    return a / (a + b) if a + b > 0 else None
+
+def snapshot():
+
+    return {
+        "stages": {name: dict(entry) for name, entry in sorted(_stages.items())},
+        "counters": dict(sorted(_counters.items())),
+        "ratios": {
+            "verify_sat_ratio": ratio(_counters.get("verify.sat", 0), _counters.get("verify.unsat", 0)),
+            "solver_sat_ratio": ratio(_counters.get("solver.sat", 0), _counters.get("solver.unsat", 0))
+        },
+        "slowest_periods": [{"period": label, "seconds": seconds} for seconds, label in sorted(_periods, reverse=True)]
+    }
+
+def merge(other):
+
+    # Folds a snapshot taken in a worker process into this process.
+    for name, entry in other["stages"].items():
+        add_time(name, entry["wall_seconds"], entry["cpu_seconds"], entry["calls"])
+    for name, n in other["counters"].items():
+        count(name, n)
+    for item in other["slowest_periods"]:
+        record_period(item["period"], item["seconds"])
+
+def prometheus_text():
+
+    data = snapshot()
+    lines = []
+
+    for metric, key in [("stage_calls_total", "calls"), ("stage_wall_seconds_total", "wall_seconds"),
+                        ("stage_cpu_seconds_total", "cpu_seconds")]:
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} counter")
+        for name, entry in data["stages"].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_{metric}{{stage="{name}"}} {entry[key]}')
+
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events_total counter")
+    for name, n in data["counters"].items():
+        lines.append(f'{PROMETHEUS_PREFIX}_events_total{{event="{name}"}} {n}')
+
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_ratio gauge")
+    for name, value in data["ratios"].items():
+        if value is not None:
+            lines.append(f'{PROMETHEUS_PREFIX}_ratio{{ratio="{name}"}} {value}')
+
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_slowest_period_seconds gauge")
+    for item in data["slowest_periods"]:
+        lines.append(f'{PROMETHEUS_PREFIX}_slowest_period_seconds{{period="{item["period"]}"}} {item["seconds"]}')
+
+    return "\n".join(lines) + "\n"
+
+def write(path, format="json"):
+
+    assert format in ["json", "prometheus"], "METRICS_FORMAT_INVALID"
+
+    with open(path, "w") as f:
+        if format == "json":
+            json.dump(snapshot(), f, indent=4)
+        else:
+            f.write(prometheus_text())
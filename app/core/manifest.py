@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from app.core.report import REPORT_TEMPLATE_VERSION
+from app.core.instrumentation import count
+
+MANIFEST_FILENAME = "report_manifest.json"
+
+def report_digest(kind, *inputs):
+
+    payload = json.dumps({
+        "template_version": REPORT_TEMPLATE_VERSION,
+        "kind": kind,
+        "inputs": inputs
+    }, sort_keys=True, default=str)
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def result_inputs(z3_result):
+
+    # The live z3 model is not an input of the report and has no stable serialisation.
+    return {k: v for k, v in z3_result.items() if k != "model"}
+
+class ReportManifest:
+    def __init__(self, root_path, entries=None):
+
+        self.root_path = str(root_path)
+        self.path = Path(self.root_path) / MANIFEST_FILENAME
+        self.rendered = 0
+        self.skipped = 0
+        self.updates = {}
+
+        if entries is not None:
+            self.entries = dict(entries)
+        elif self.path.exists():
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = {}
+
+    def key(self, output_path):
+
+        return Path(os.path.relpath(output_path, self.root_path)).as_posix()
+
+    def is_current(self, output_path, digest):
+
+        return Path(output_path).exists() and self.entries.get(self.key(output_path)) == digest
+
+    def record(self, output_path, digest):
+
+        self.entries[self.key(output_path)] = digest
+        self.updates[self.key(output_path)] = digest
+
+    def render(self, output_path, digest, generate, force=False):
+
+        if not force and self.is_current(output_path, digest):
+            self.skipped += 1
+            count("reports.skipped")
+            return False
+
+        generate()
+        self.record(output_path, digest)
+        self.rendered += 1
+        count("reports.rendered")
+
+        return True
+
+    def by_directory(self):
+
+        # Entries grouped by the directory of their report, e.g. "TechCorp/2024_Q3".
+        groups = {}
+        for key, digest in self.entries.items():
+            groups.setdefault(key.rpartition("/")[0], {})[key] = digest
+
+        return groups
+
+    def merge(self, updates, rendered, skipped):
+
+        self.entries.update(updates)
+        self.updates.update(updates)
+        self.rendered += rendered
+        self.skipped += skipped
+
+    def save(self):
+
+        if not self.updates:
+            return
+
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
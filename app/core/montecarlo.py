@@ -0,0 +1,252 @@
+import math
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+from app.core.z3engine import verify_logics, SolverLimits, ContractSession, compile_logics
+from app.core.formula import NotDetermined
+from app.core.dependency import evaluate_plan_array, split_definitions
+from app.core.postprocessing import validate_stress_scope
+from app.core import instrumentation
+from app.core.instrumentation import count, instrumented
+
+# Shocks are relative moves of CFO inputs: an input of value v becomes v * multiplier.
+#   normal:    multiplier = 1 + mean + std * z
+#   lognormal: multiplier = exp(mean + std * z)
+#   uniform:   multiplier = 1 + low + (high - low) * Phi(z)
+# The z are standard normals correlated through the Cholesky factor of the correlation matrix (Gaussian copula).
+SHOCK_DISTRIBUTIONS = {"normal": ["mean", "std"], "lognormal": ["mean", "std"], "uniform": ["low", "high"]}
+SHOCKS_MAX = 16
+DRAWS_MAX = 1000000
+
+# Abramowitz and Stegun 7.1.26: erf to within 1.5e-7 on the whole real line.
+ERF_P = 0.3275911
+ERF_A = [0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429]
+
+# Draws are generated in fixed chunks with one child seed each, so results do not depend on the worker count.
+CHUNK_DRAWS = 4096
+
+def validate_shock_config(shock_config):
+
+    assert isinstance(shock_config, dict), "SHOCK_CONFIG_NOT_DICT"
+    assert "shocks" in shock_config, "SHOCKS_MISSING"
+    assert isinstance(shock_config["shocks"], list), "SHOCKS_NOT_LIST"
+    assert 0 < len(shock_config["shocks"]) <= SHOCKS_MAX, "SHOCKS_IMPOSSIBLE_COUNT"
+
+    for k, shock in enumerate(shock_config["shocks"]):
+        key = f"shock_{k}"
+
+        assert isinstance(shock, dict), f"SHOCK_NOT_DICT_IN_{key}"
+        assert "name" in shock, f"NAME_MISSING_IN_{key}"
+        assert "distribution" in shock, f"DISTRIBUTION_MISSING_IN_{key}"
+        assert isinstance(shock["name"], str), f"NAME_NOT_STR_IN_{key}"
+        assert len(shock["name"]) > 0, f"NAME_EMPTY_IN_{key}"
+        assert shock["distribution"] in SHOCK_DISTRIBUTIONS, f"DISTRIBUTION_INVALID_IN_{key}"
+
+        for param in SHOCK_DISTRIBUTIONS[shock["distribution"]]:
+            assert param in shock, f"{param.upper()}_MISSING_IN_{key}"
+            assert isinstance(shock[param], float), f"{param.upper()}_NOT_FLOAT_IN_{key}"
+
+        if shock["distribution"] == "uniform":
+            assert shock["low"] < shock["high"], f"RANGE_EMPTY_IN_{key}"
+        else:
+            assert shock["std"] >= 0, f"STD_NEGATIVE_IN_{key}"
+
+    names = [shock["name"] for shock in shock_config["shocks"]]
+    assert len(set(names)) == len(names), "SHOCKS_DUPLICATED"
+
+    if "correlation" in shock_config:
+        correlation = np.asarray(shock_config["correlation"], dtype=float)
+        assert correlation.shape == (len(names), len(names)), "CORRELATION_SHAPE_INVALID"
+        assert np.allclose(correlation, correlation.T), "CORRELATION_NOT_SYMMETRIC"
+        assert np.allclose(np.diag(correlation), 1.0), "CORRELATION_DIAGONAL_NOT_ONE"
+
+def cholesky_factor(shock_config):
+
+    n = len(shock_config["shocks"])
+    correlation = np.asarray(shock_config.get("correlation", np.eye(n)), dtype=float)
+
+    try:
+        return np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        assert False, "CORRELATION_NOT_POSITIVE_DEFINITE"
+
+def normal_cdf(z):
+
+    x = np.abs(z) / math.sqrt(2)
+    t = 1 / (1 + ERF_P * x)
+    erf = 1 - t * (ERF_A[0] + t * (ERF_A[1] + t * (ERF_A[2] + t * (ERF_A[3] + t * ERF_A[4])))) * np.exp(-x * x)
+
+    return 0.5 * (1 + np.sign(z) * erf)
+
+def shock_multipliers(shocks, factor, rng, size):
+
+    z = rng.standard_normal((size, len(shocks))) @ factor.T
+
+    multipliers = {}
+    for k, shock in enumerate(shocks):
+        if shock["distribution"] == "normal":
+            multipliers[shock["name"]] = 1 + shock["mean"] + shock["std"] * z[:, k]
+        elif shock["distribution"] == "lognormal":
+            multipliers[shock["name"]] = np.exp(shock["mean"] + shock["std"] * z[:, k])
+        else:
+            multipliers[shock["name"]] = 1 + shock["low"] + (shock["high"] - shock["low"]) * normal_cdf(z[:, k])
+
+    return multipliers
+
+def wilson_interval(k, n, z):
+
+    if n == 0:
+        return [0.0, 1.0]
+
+    p = k / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+
+    return [max(0.0, center - half), min(1.0, center + half)]
+
+def simulate_chunk(logics, cfo_data, shocks, factor, seed, size, limits=None):
+
+    rng = np.random.default_rng(seed)
+    multipliers = shock_multipliers(shocks, factor, rng, size)
+
+    compiled = compile_logics(logics)
+    rule_ids = [str(rule["id"]) for rule in compiled.rules]
+
+    compliant = np.zeros(size, dtype=bool)
+    rule_breaches = {rule_id: np.zeros(size, dtype=bool) for rule_id in rule_ids}
+    pending = list(range(size))
+
+    # Draws the NumPy plan decides exactly are never solved; definition rules hold there by construction.
+    plan = compiled.plan(cfo_data)
+    if plan is not None:
+        arrays = {name: cfo_data[name] for name in compiled.vars if name in cfo_data}
+        for name, multiplier in multipliers.items():
+            arrays[name] = cfo_data[name] * multiplier
+        try:
+            _, verdicts, unsafe = evaluate_plan_array(plan, arrays, (size,))
+            compliant = np.ones(size, dtype=bool)
+            for rule_id, verdict in verdicts.items():
+                compliant &= verdict
+                rule_breaches[str(rule_id)] = ~verdict & ~unsafe
+            pending = np.nonzero(unsafe)[0].tolist()
+        except NotDetermined:
+            pass
+
+    # The solver decides the rest. As on the NumPy path, a breach is charged to the checks that fail
+    # with only the definitions beside them, never to the definitions themselves.
+    definitions, checks = split_definitions(compiled.rules, {name for name in cfo_data if name in compiled.vars})
+    definition_ids = [d["rule"]["id"] for d in definitions.values()]
+    sessions = {}
+
+    undecided = 0
+    for k in pending:
+        test_data = cfo_data.copy()
+        for name, multiplier in multipliers.items():
+            test_data[name] = cfo_data[name] * multiplier[k]
+
+        response = verify_logics(logics, test_data, quiet=True, level="verdict", limits=limits)
+        compliant[k] = response["is_compliant"] is True
+        undecided += response["is_compliant"] is None
+        if response["is_compliant"] is not False:
+            continue
+
+        for rule in checks:
+            if rule["id"] not in sessions:
+                sessions[rule["id"]] = ContractSession(logics, limits, definition_ids + [rule["id"]])
+            rule_breaches[str(rule["id"])][k] = sessions[rule["id"]].check(test_data) is False
+
+    count("montecarlo.draws", size)
+    count("montecarlo.solved", len(pending))
+
+    return {
+        "draws": size,
+        "breaches": int(size - compliant.sum()),
+        "undecided": undecided,
+        "solved": len(pending),
+        "rules": {rule_id: int(breached.sum()) for rule_id, breached in rule_breaches.items()}
+    }
+
+def simulate_chunk_in_worker(*args):
+
+    # Spawned workers start with empty metrics and send theirs back with the counts.
+    instrumentation.reset()
+
+    return simulate_chunk(*args), instrumentation.snapshot()
+
+@instrumented("montecarlo.breach")
+def simulate_breach_probability(portfolio, clients, year, quarter, shock_config, draws=10000, seed=0, confidence=0.95,
+                                workers=1, progress=None, limits=None):
+
+    validate_stress_scope(portfolio, clients, year, quarter)
+    validate_shock_config(shock_config)
+
+    assert isinstance(draws, int), "DRAWS_NOT_INT"
+    assert 0 < draws <= DRAWS_MAX, "DRAWS_IMPOSSIBLE_VALUE"
+    assert isinstance(seed, int), "SEED_NOT_INT"
+    assert isinstance(confidence, float), "CONFIDENCE_NOT_FLOAT"
+    assert 0 < confidence < 1, "CONFIDENCE_IMPOSSIBLE_VALUE"
+    assert isinstance(workers, int), "WORKERS_NOT_INT"
+    assert workers > 0, "WORKERS_BELOW_ONE"
+    assert progress is None or callable(progress), "PROGRESS_NOT_CALLABLE"
+    assert limits is None or isinstance(limits, SolverLimits), "LIMITS_INVALID"
+
+    shocks = shock_config["shocks"]
+    factor = cholesky_factor(shock_config)
+
+    entries = {c: (portfolio[c].history[year][quarter]["logics"], portfolio[c].history[year][quarter]["cfo_data"])
+               for c in clients}
+    for c in clients:
+        assert all(shock["name"] in entries[c][1] for shock in shocks), "SHOCK_VARIABLE_NOT_IN_CFO_DATA"
+
+    # Every client sees the same scenarios (common random numbers), so their probabilities are comparable.
+    sizes = [min(CHUNK_DRAWS, draws - start) for start in range(0, draws, CHUNK_DRAWS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    units = [(c, seeds[k], sizes[k]) for c in clients for k in range(len(sizes))]
+
+    results = {}
+    if workers == 1:
+        for k, (c, chunk_seed, size) in enumerate(units):
+            results[k] = simulate_chunk(*entries[c], shocks, factor, chunk_seed, size, limits)
+            if progress:
+                progress(k + 1, len(units))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(simulate_chunk_in_worker, *entries[c], shocks, factor, chunk_seed, size, limits): k
+                       for k, (c, chunk_seed, size) in enumerate(units)}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]], metrics = future.result()
+                instrumentation.merge(metrics)
+                if progress:
+                    progress(completed, len(units))
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    totals = {}
+    for k, (c, _, _) in enumerate(units):
+        total = totals.setdefault(c, {"breaches": 0, "undecided": 0, "solved": 0, "rules": {}})
+        for key in ["breaches", "undecided", "solved"]:
+            total[key] += results[k][key]
+        for rule_id, n in results[k]["rules"].items():
+            total["rules"][rule_id] = total["rules"].get(rule_id, 0) + n
+
+    # Undecided draws count as breaches, so the deal probability is an upper bound under a solver budget.
+    probability_results = {}
+    for c in clients:
+        total = totals[c]
+        probability_results[c] = {
+            "draws": draws,
+            "breaches": total["breaches"],
+            "breach_probability": total["breaches"] / draws,
+            "confidence_interval": wilson_interval(total["breaches"], draws, z),
+            "undecided_draws": total["undecided"],
+            "solved_draws": total["solved"],
+            "rules": {rule_id: {"breaches": n,
+                                "breach_probability": n / draws,
+                                "confidence_interval": wilson_interval(n, draws, z)}
+                      for rule_id, n in total["rules"].items()},
+            "metadata": {"shocks": [shock["name"] for shock in shocks], "seed": seed, "confidence": confidence}
+        }
+
+    return probability_results
@@ -1,12 +1,106 @@
 import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from app.core.report import generate_initial_report, generate_final_report
 from app.core.deal import Deal
+from app.core.z3engine import SolverLimits, RETRY_TACTICS
+from app.core.result_cache import ResultCache, CACHE_FILENAME
+from app.core.manifest import ReportManifest, report_digest, result_inputs
+from app.core.artifact import ARTIFACT_FILENAME, read_artifact
+from app.core import instrumentation
+from app.core.instrumentation import Timer, instrumented, record_period, stage
+
+logger = logging.getLogger(__name__)
 
 FILENAME_LOGICS = "logics.json"
 FILENAME_CFO_DATA = "cfo_data.json"
 
-def create_portfolio(clients, years, quarters, root_path):
+def period_limits(limits, deadline):
+
+    # With a run budget every period gets at most the time left before the deadline.
+    if deadline is None:
+        return limits
+
+    return limits.until(deadline)
+
+def process_period(deal, y, q, root_path, quiet=True, cache=None, manifest=None, force=False, limits=None,
+                   deadline=None):
+
+    year_quarter = f"{y}_{q}"
+    timer = Timer()
+
+    logger.log(logging.DEBUG if quiet else logging.INFO, "-- Client: %s | %s --", deal.id, year_quarter)
+
+    path = Path(f"{root_path}/{deal.id}/{year_quarter}")
+    assert path.exists(), f"PATH_DOES_NOT_EXIST"
+
+    path_logics = path / FILENAME_LOGICS
+    assert path_logics.exists(), f"LOGICS_JSON_DOES_NOT_EXIST"
+    with open(path_logics, "r") as f, stage("portfolio.load_json"):
+        logics = json.load(f)
+        
+    assert logics['audit_id'] == f"{deal.id}_{year_quarter}", "AUDIT_ID_IS_WRONG"
+
+    path_cfo_data = path / FILENAME_CFO_DATA
+    assert path_cfo_data.exists(), f"CFO_DATA_JSON_DOES_NOT_EXIST"
+    with open(path_cfo_data, "r") as f, stage("portfolio.load_json"):
+        cfo_data = json.load(f)
+
+    # A precompiled contract (app/utils/compile_contracts.py) skips validation and parsing; stale ones are ignored.
+    with stage("portfolio.load_artifact"):
+        artifact = read_artifact(path / ARTIFACT_FILENAME)
+
+    deal.process_logics_and_cfo_data(y, q, logics, cfo_data, quiet=quiet, cache=cache,
+                                     limits=period_limits(limits, deadline), artifact=artifact)
+    assert deal.history[y][q] is not None
+
+    filename_initial_report = f"report_initial_{year_quarter}.pdf"
+    filename_final_report = f"report_final_{year_quarter}.pdf"
+
+    entry = deal.history[y][q]
+    path_initial_report = path / filename_initial_report
+    path_final_report = path / filename_final_report
+
+    if manifest is None:
+        manifest = ReportManifest(root_path, entries={})
+
+    manifest.render(path_initial_report,
+                    report_digest("initial", entry["logics"]),
+                    lambda: generate_initial_report(entry["logics"], path_initial_report),
+                    force)
+
+    manifest.render(path_final_report,
+                    report_digest("final", result_inputs(entry["z3_result"]), entry["logics"], entry["cfo_data"]),
+                    lambda: generate_final_report(entry["z3_result"], entry["logics"], entry["cfo_data"], path_final_report),
+                    force)
+
+    record_period(f"{deal.id}_{year_quarter}", timer.lap("portfolio.period"))
+
+    return deal.history[y][q]
+
+def process_period_in_worker(client_ID, y, q, root_path, quiet, cache_path, manifest_entries, force, limits, deadline):
+
+    # Workers only report what they rendered; the parent owns report_manifest.json.
+    # Metrics start empty in every task and travel back with the entry.
+    instrumentation.reset()
+    manifest = ReportManifest(root_path, entries=manifest_entries)
+
+    cache = ResultCache(cache_path) if cache_path is not None else None
+    try:
+        entry = process_period(Deal(client_ID), y, q, root_path, quiet, cache, manifest, force, limits, deadline)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return (entry, cache.stats() if cache is not None else None, (manifest.updates, manifest.rendered, manifest.skipped),
+            instrumentation.snapshot())
+
+@instrumented("portfolio.create")
+def create_portfolio(clients, years, quarters, root_path, workers=1, quiet=True, cache=False, force=False, store=None,
+                     limits=None, time_budget=None):
 
     assert isinstance(clients, list), "CLIENTS_NOT_A_LIST" 
     assert len(clients) > 0, "CLIENTS_LIST_EMPTY"
@@ -23,46 +117,89 @@ def create_portfolio(clients, years, quarters, root_path):
     assert all(q in ["Q1", "Q2", "Q3", "Q4"] for q in quarters), "QUARTER_FORMAT_INVALID"
     assert isinstance(root_path, str), "ROOT_PATH_NOT_A_STR"
     assert len(root_path) > 0, "ROOT_PATH_EMPTY"
+    assert isinstance(workers, int), "WORKERS_NOT_AN_INT"
+    assert workers > 0, "WORKERS_BELOW_ONE"
+    assert isinstance(cache, bool), "CACHE_NOT_A_BOOL"
+    assert isinstance(force, bool), "FORCE_NOT_A_BOOL"
+    assert limits is None or isinstance(limits, SolverLimits), "LIMITS_INVALID"
+    assert time_budget is None or isinstance(time_budget, (int, float)), "TIME_BUDGET_NOT_A_NUMBER"
+    assert time_budget is None or time_budget > 0, "TIME_BUDGET_NOT_POSITIVE"
+
+    # A run budget (seconds) must not abort the fund halfway, so periods that run out of time come back
+    # UNKNOWN instead of raising, after the retry tactics had their chance.
+    if limits is None and time_budget is not None:
+        limits = SolverLimits(allow_unknown=True, retry_tactics=RETRY_TACTICS)
+    deadline = time.time() + time_budget if time_budget is not None else None
 
     portfolio = {}
 
     for client_ID in clients:
         
-        deal = Deal(client_ID)
+        deal = Deal(client_ID, store=store)
         portfolio[deal.id] = deal
 
-        for y in years:
+    units = [(client_ID, y, q) for client_ID in clients for y in years for q in quarters]
+
+    # Verification responses persist under the fund root, so a rerun only solves new or edited periods.
+    cache_path = str(Path(root_path) / CACHE_FILENAME) if cache else None
+    stats = {"hits": 0, "misses": 0}
+
+    # report_manifest.json remembers the inputs of every PDF, so unchanged reports are not re-rendered.
+    manifest = ReportManifest(root_path)
+
+    if workers == 1:
+
+        result_cache = ResultCache(cache_path) if cache else None
+        try:
+            for client_ID, y, q in units:
+                process_period(portfolio[client_ID], y, q, root_path, quiet, result_cache, manifest, force, limits,
+                               deadline)
+        finally:
+            if result_cache is not None:
+                result_cache.close()
+                stats = result_cache.stats()
+            manifest.save()
+
+        log_cache_stats(cache_path, stats)
+        log_manifest_stats(manifest)
+
+        return portfolio
 
-            for q in quarters:
-                
-                year_quarter = f"{y}_{q}"
+    # Spawned workers start with a fresh interpreter, so every worker owns its own Z3 context.
+    # map() yields in submission order, which rebuilds Deal.history exactly as the sequential run.
+    # Each unit only carries the manifest entries of its own period directory.
+    manifest_groups = manifest.by_directory()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
 
-                print(f"\n-- Client: {client_ID} | {year_quarter} --")
+        entries = pool.map(process_period_in_worker,
+                           [c for c, _, _ in units], [y for _, y, _ in units], [q for _, _, q in units],
+                           [root_path] * len(units), [quiet] * len(units), [cache_path] * len(units),
+                           [manifest_groups.get(f"{c}/{y}_{q}", {}) for c, y, q in units], [force] * len(units), [limits] * len(units),
+                           [deadline] * len(units))
 
-                path = Path(f"{root_path}/{deal.id}/{year_quarter}")
-                assert path.exists(), f"PATH_DOES_NOT_EXIST"
+        try:
+            for (client_ID, y, q), (entry, unit_stats, unit_reports, metrics) in zip(units, entries):
+                portfolio[client_ID].record(y, q, entry["logics"], entry["cfo_data"], entry["z3_result"])
+                instrumentation.merge(metrics)
+                if unit_stats is not None:
+                    stats["hits"] += unit_stats["hits"]
+                    stats["misses"] += unit_stats["misses"]
+                manifest.merge(*unit_reports)
+        finally:
+            manifest.save()
 
-                path_logics = path / FILENAME_LOGICS
-                assert path_logics.exists(), f"LOGICS_JSON_DOES_NOT_EXIST"
-                with open(path_logics, "r") as f:
-                    logics = json.load(f)
-                    
-                assert logics['audit_id'] == f"{client_ID}_{year_quarter}", "AUDIT_ID_IS_WRONG"
+    log_cache_stats(cache_path, stats)
+    log_manifest_stats(manifest)
 
-                path_cfo_data = path / FILENAME_CFO_DATA
-                assert path_cfo_data.exists(), f"CFO_DATA_JSON_DOES_NOT_EXIST"
-                with open(path_cfo_data, "r") as f:
-                    cfo_data = json.load(f)
+    return portfolio
 
-                deal.process_logics_and_cfo_data(y, q, logics, cfo_data)
-                assert deal.history[y][q] is not None
+def log_cache_stats(cache_path, stats):
 
-                filename_initial_report = f"report_initial_{year_quarter}.pdf"
-                filename_final_report = f"report_final_{year_quarter}.pdf"
+    if cache_path is None:
+        return
 
-                generate_initial_report(deal.history[y][q]["logics"], path / filename_initial_report)
+    logger.info("Verification cache %s: %d hits, %d misses.", cache_path, stats["hits"], stats["misses"])
 
-                generate_final_report(deal.history[y][q]["z3_result"], deal.history[y][q]["logics"],
-                                      deal.history[y][q]["cfo_data"], path / filename_final_report)
+def log_manifest_stats(manifest):
 
-    return portfolio
\ No newline at end of file
+    logger.info("Reports %s: %d rendered, %d skipped.", manifest.path, manifest.rendered, manifest.skipped)
@@ -1,7 +1,29 @@
+import math
+import multiprocessing
+import numpy as np
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from z3 import *
-from app.core.z3engine import verify_logics
+from app.core.z3engine import verify_logics, SlicedSession, SolverLimits, compile_logics
+from app.core.formula import NotDetermined
+from app.core.dependency import evaluate_plan_array
+from app.core import instrumentation
+from app.core.instrumentation import instrumented, stage
 
-def calculate_stress_matrix(portfolio, clients, year, quarter, stress_config):
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+STRESS_MODES = ["naive", "incremental", "frontier", "vectorized", "adaptive"]
+
+REFINED_STEPS_MAX = 200
+
+SAMPLING_METHODS = ["lhs", "sobol"]
+SPACE_VARIABLES_MAX = 8
+SPACE_SAMPLES_MAX = 65536
+
+def validate_stress_scope(portfolio, clients, year, quarter):
 
     assert isinstance(portfolio, dict), "PORTFOLIO_NOT_DICT"
 
@@ -12,71 +34,374 @@ def calculate_stress_matrix(portfolio, clients, year, quarter, stress_config):
     assert len(year) == 4, "YEAR_FORMAT_INVALID"
     assert isinstance(quarter, str), "QUARTER_NOT_STR"
     assert quarter in ["Q1", "Q2", "Q3", "Q4"], "QUARTER_FORMAT_INVALID"
+
+def validate_stress_variable(var, key, steps=True):
+
+    assert "name" in var, f"NAME_MISSING_IN_{key}"
+    assert "direction" in var, f"DIRECTION_MISSING_IN_{key}"
+    if steps:
+        assert "steps" in var, f"STEPS_MISSING_IN_{key}"
+    assert "max_pct" in var, f"MAX_PCT_MISSING_IN_{key}"
+
+    assert isinstance(var["name"], str), f"NAME_NOT_STR_IN_{key}"
+    assert isinstance(var["direction"], str), f"DIRECTION_NOT_STR_IN_{key}"
+    if steps:
+        assert isinstance(var["steps"], int), f"STEPS_NOT_INT_IN_{key}"
+    assert isinstance(var["max_pct"], float), f"MAX_PCT_NOT_FLOAT_IN_{key}"
+
+    assert len(var["name"]) > 0, f"NAME_EMPTY_IN_{key}"
+    assert len(var["direction"]) > 0, f"DIRECTION_EMPTY_IN_{key}"
+    assert var["direction"] in ["down", "up"], f"DIRECTION_FORMAT_INVALID_IN_{key}"
+    if steps:
+        assert var["steps"] > 0 and var["steps"] < 21, f"STEPS_IMPOSSIBLE_VALUE_IN_{key}"
+    assert var["max_pct"] > 0.001 and var["max_pct"] < 1.001, f"MAX_PCT_IMPOSSIBLE_VALUE_IN_{key}"
+
+def validate_stress_inputs(portfolio, clients, year, quarter, stress_config):
+
+    validate_stress_scope(portfolio, clients, year, quarter)
+
     assert isinstance(stress_config, dict), "STRESS_CONFIG_NOT_DICT"
     
     assert "var_x" in stress_config, "VAR_X_MISSING"
     assert "var_y" in stress_config, "VAR_Y_MISSING"
 
     for key in ["var_x", "var_y"]:
+        validate_stress_variable(stress_config[key], key)
 
-        var = stress_config[key]
+def validate_space_inputs(portfolio, clients, year, quarter, space_config, samples, method):
 
-        assert "name" in var, f"NAME_MISSING_IN_{key}"
-        assert "direction" in var, f"DIRECTION_MISSING_IN_{key}"
-        assert "steps" in var, f"STEPS_MISSING_IN_{key}"
-        assert "max_pct" in var, f"MAX_PCT_MISSING_IN_{key}"
-    
-        assert isinstance(var["name"], str), f"NAME_NOT_STR_IN_{key}"
-        assert isinstance(var["direction"], str), f"DIRECTION_NOT_STR_IN_{key}"
-        assert isinstance(var["steps"], int), f"STEPS_NOT_INT_IN_{key}"
-        assert isinstance(var["max_pct"], float), f"MAX_PCT_NOT_FLOAT_IN_{key}"
+    validate_stress_scope(portfolio, clients, year, quarter)
 
-        assert len(var["name"]) > 0, f"NAME_EMPTY_IN_{key}"
-        assert len(var["direction"]) > 0, f"DIRECTION_EMPTY_IN_{key}"
-        assert var["direction"] in ["down", "up"], f"DIRECTION_FORMAT_INVALID_IN_{key}"
-        assert var["steps"] > 0 and var["steps"] < 21, f"STEPS_IMPOSSIBLE_VALUE_IN_{key}"
-        assert var["max_pct"] > 0.001 and var["max_pct"] < 1.001, f"MAX_PCT_IMPOSSIBLE_VALUE_IN_{key}"
+    assert isinstance(space_config, dict), "SPACE_CONFIG_NOT_DICT"
+    assert "variables" in space_config, "VARIABLES_MISSING"
+    assert isinstance(space_config["variables"], list), "VARIABLES_NOT_LIST"
+    assert 0 < len(space_config["variables"]) <= SPACE_VARIABLES_MAX, "VARIABLES_IMPOSSIBLE_COUNT"
+
+    for k, var in enumerate(space_config["variables"]):
+        assert isinstance(var, dict), f"VARIABLE_NOT_DICT_IN_var_{k}"
+        validate_stress_variable(var, f"var_{k}", steps=False)
+
+    names = [var["name"] for var in space_config["variables"]]
+    assert len(set(names)) == len(names), "VARIABLES_DUPLICATED"
+
+    assert method in SAMPLING_METHODS, "METHOD_INVALID"
+    assert isinstance(samples, int), "SAMPLES_NOT_INT"
+    assert 0 < samples <= SPACE_SAMPLES_MAX, "SAMPLES_IMPOSSIBLE_VALUE"
+
+    if method == "sobol":
+        assert qmc is not None, "SOBOL_REQUIRES_SCIPY"
+        assert samples & (samples - 1) == 0, "SOBOL_SAMPLES_NOT_POWER_OF_TWO"
+
+def stress_factor(conf, pct):
+
+    return (1 - pct) if conf["direction"] == "down" else (1 + pct)
+
+def stressed_data(cfo_data, conf_x, conf_y, drop_x, drop_y):
+
+    test_data = cfo_data.copy()
+
+    test_data[conf_x["name"]] = cfo_data[conf_x["name"]] * stress_factor(conf_x, drop_x)
+    test_data[conf_y["name"]] = cfo_data[conf_y["name"]] * stress_factor(conf_y, drop_y)
+
+    return test_data
+
+def session_checker(logics, cfo_data, query, limits=None):
+
+    sessions = []
+
+    def check(data):
+        if not sessions:
+            sessions.append(SlicedSession(logics, cfo_data, query, limits))
+        return sessions[0].check(data)
+
+    return check
+
+def trace_frontier(check_cell, n_rows, n_cols):
+
+    # Compliance is assumed monotone: stressing further along x or y never turns a BREACH into OK.
+    # Each row is then an OK prefix whose length never grows with y, so walking that staircase from
+    # the (0, n_cols - 1) corner only needs the cells next to the frontier.
+    # A cell the solver could not decide (None) moves the frontier like a BREACH and stays None.
+    verdicts = []
+    solved = 0
+    bound = n_cols
+
+    for j in range(n_rows):
+        undecided = []
+        while bound > 0:
+            solved += 1
+            verdict = check_cell(j, bound - 1)
+            if verdict:
+                break
+            if verdict is None:
+                undecided.append(bound - 1)
+            bound -= 1
+        row = [i < bound for i in range(n_cols)]
+        for i in undecided:
+            row[i] = None
+        verdicts.append(row)
+
+    return verdicts, solved
+
+def refine_verdicts(check_cell, n_rows, n_cols, block_rows, block_cols):
+
+    # Quadtree on the lattice: starting from blocks of block_rows x block_cols points, a block whose four
+    # corners agree takes their verdict; any other block is halved until it is one step wide. Under the
+    # same monotonicity as trace_frontier only the blocks the boundary crosses are ever solved.
+    solved = {}
+
+    def at(j, i):
+        if (j, i) not in solved:
+            solved[(j, i)] = check_cell(j, i)
+        return solved[(j, i)]
+
+    verdicts = [[None] * n_cols for _ in range(n_rows)]
+    filled = [[False] * n_cols for _ in range(n_rows)]
+
+    edges_y = sorted(set(list(range(0, n_rows - 1, block_rows)) + [n_rows - 1]))
+    edges_x = sorted(set(list(range(0, n_cols - 1, block_cols)) + [n_cols - 1]))
+    stack = [(j0, j1, i0, i1) for j0, j1 in zip(edges_y, edges_y[1:])
+             for i0, i1 in zip(edges_x, edges_x[1:])]
+
+    while stack:
+        j0, j1, i0, i1 = stack.pop()
+        corners = [at(j0, i0), at(j0, i1), at(j1, i0), at(j1, i1)]
+
+        if all(v == corners[0] for v in corners):
+            for j in range(j0, j1 + 1):
+                for i in range(i0, i1 + 1):
+                    if (j, i) not in solved and not filled[j][i]:
+                        verdicts[j][i], filled[j][i] = corners[0], True
+            continue
+
+        if j1 - j0 <= 1 and i1 - i0 <= 1:
+            continue
+
+        jm, im = (j0 + j1) // 2, (i0 + i1) // 2
+        rows = [(j0, jm), (jm, j1)] if j1 - j0 > 1 else [(j0, j1)]
+        cols = [(i0, im), (im, i1)] if i1 - i0 > 1 else [(i0, i1)]
+        stack += [(a, b, c, d) for a, b in rows for c, d in cols]
+
+    for (j, i), verdict in solved.items():
+        verdicts[j][i] = verdict
+
+    return verdicts, len(solved)
+
+def vectorized_verdicts(entries, conf_x, conf_y, range_x, range_y):
+
+    # Clients sharing a compiled contract and the same set of CFO inputs are stacked on the first
+    # axis and the whole (client, y, x) cube is evaluated in one NumPy pass.
+    groups = {}
+    for c, logics, cfo_data in entries:
+        compiled = compile_logics(logics)
+        plan = compiled.plan(cfo_data)
+        if plan is not None:
+            known = tuple(name for name in compiled.vars if name in cfo_data)
+            groups.setdefault((compiled.key, known), (plan, []))[1].append((c, cfo_data))
+
+    factors_x = np.array([stress_factor(conf_x, p) for p in range_x]).reshape(1, 1, -1)
+    factors_y = np.array([stress_factor(conf_y, p) for p in range_y]).reshape(1, -1, 1)
+
+    results = {}
+    for (key, known), (plan, members) in groups.items():
+        shape = (len(members), len(range_y), len(range_x))
+
+        arrays = {name: np.array([cfo_data[name] for _, cfo_data in members]).reshape(-1, 1, 1) for name in known}
+        # The stressed variables come from the CFO data: the contract need not read them.
+        arrays[conf_x["name"]] = np.array([cfo_data[conf_x["name"]] for _, cfo_data in members]).reshape(-1, 1, 1) * factors_x
+        arrays[conf_y["name"]] = np.array([cfo_data[conf_y["name"]] for _, cfo_data in members]).reshape(-1, 1, 1) * factors_y
+
+        try:
+            _, verdicts, unsafe = evaluate_plan_array(plan, arrays, shape)
+        except NotDetermined:
+            continue
+
+        compliant = np.ones(shape, dtype=bool)
+        for verdict in verdicts.values():
+            compliant &= verdict
+
+        for k, (c, _) in enumerate(members):
+            results[c] = {"verdicts": compliant[k].tolist(), "unsafe": list(zip(*np.nonzero(unsafe[k])))}
+
+    return results
+
+def adaptive_rows(check_cell, check, cfo_data, conf_x, conf_y, range_x, range_y, refined):
+
+    # The fine lattice is refined first; coarse points that lie on it are read off it and only the
+    # others are solved by the coarse frontier walk. Returns the coarse verdicts, every solve made,
+    # the fine verdicts and the fine solves.
+    fine_x, fine_y, block_rows, block_cols = refined
+    fine, fine_solved = refine_verdicts(
+        lambda j, i: check(stressed_data(cfo_data, conf_x, conf_y, fine_x[i], fine_y[j])),
+        len(fine_y), len(fine_x), block_rows, block_cols)
+
+    step_y = Fraction(len(fine_y) - 1, len(range_y) - 1)
+    step_x = Fraction(len(fine_x) - 1, len(range_x) - 1)
+    solved = []
+
+    def coarse_cell(j, i):
+        if (j * step_y).denominator == 1 and (i * step_x).denominator == 1:
+            return fine[int(j * step_y)][int(i * step_x)]
+        solved.append((j, i))
+        return check_cell(j, i)
+
+    coarse, _ = trace_frontier(coarse_cell, len(range_y), len(range_x))
+
+    return coarse, fine_solved + len(solved), fine, fine_solved
+
+def stress_rows(logics, cfo_data, conf_x, conf_y, range_x, range_y, mode, rows, limits=None, refined=None):
+
+    if mode == "naive":
+        check = lambda data: verify_logics(logics, data, quiet=True, level="verdict", limits=limits)["is_compliant"]
+    else:
+        check = session_checker(logics, cfo_data, {conf_x["name"], conf_y["name"]}, limits)
+
+    check_cell = lambda j, i: check(stressed_data(cfo_data, conf_x, conf_y, range_x[i], range_y[j]))
+
+    if mode == "frontier":
+        return trace_frontier(check_cell, len(range_y), len(range_x))
+    if mode == "adaptive":
+        return adaptive_rows(check_cell, check, cfo_data, conf_x, conf_y, range_x, range_y, refined)
+
+    verdicts = [[check_cell(j, i) for i in range(len(range_x))] for j in rows]
+
+    return verdicts, len(rows) * len(range_x)
+
+def stress_rows_in_worker(*args):
+
+    # Spawned workers start with empty metrics and send theirs back with the verdicts.
+    instrumentation.reset()
+
+    return stress_rows(*args), instrumentation.snapshot()
+
+def split_rows(n_rows, n_blocks):
+
+    size = -(-n_rows // n_blocks)
+
+    return [list(range(start, min(start + size, n_rows))) for start in range(0, n_rows, size)]
+
+@instrumented("stress.matrix")
+def calculate_stress_matrix(portfolio, clients, year, quarter, stress_config, mode="incremental", workers=1, progress=None,
+                            limits=None, steps_x_refined=None, steps_y_refined=None):
+
+    validate_stress_inputs(portfolio, clients, year, quarter, stress_config)
+
+    assert mode in STRESS_MODES, "MODE_INVALID"
+    assert isinstance(workers, int), "WORKERS_NOT_INT"
+    assert workers > 0, "WORKERS_BELOW_ONE"
+    assert progress is None or callable(progress), "PROGRESS_NOT_CALLABLE"
+    assert limits is None or isinstance(limits, SolverLimits), "LIMITS_INVALID"
 
     matrix_results = {}
 
+    conf_x = stress_config["var_x"]
+    conf_y = stress_config["var_y"]
+
+    if mode == "adaptive":
+        for steps, conf in [(steps_x_refined, conf_x), (steps_y_refined, conf_y)]:
+            assert isinstance(steps, int), "REFINED_STEPS_NOT_INT"
+            assert conf["steps"] <= steps <= REFINED_STEPS_MAX, "REFINED_STEPS_IMPOSSIBLE_VALUE"
+
+    range_x = [i * (conf_x["max_pct"] / conf_x["steps"]) for i in range(conf_x["steps"] + 1)]
+    range_y = [i * (conf_y["max_pct"] / conf_y["steps"]) for i in range(conf_y["steps"] + 1)]
+
+    # The adaptive mode refines on the fine lattice, starting from blocks about one coarse cell wide,
+    # and draws the coarse grid from it.
+    refined = None
+    if mode == "adaptive":
+        refined = ([i * (conf_x["max_pct"] / steps_x_refined) for i in range(steps_x_refined + 1)],
+                   [i * (conf_y["max_pct"] / steps_y_refined) for i in range(steps_y_refined + 1)],
+                   -(-steps_y_refined // conf_y["steps"]), -(-steps_x_refined // conf_x["steps"]))
+
+    entries = {c: (portfolio[c].history[year][quarter]["logics"], portfolio[c].history[year][quarter]["cfo_data"])
+               for c in clients}
+
+    vectorized = {}
+    if mode == "vectorized":
+        with stage("stress.vectorized"):
+            vectorized = vectorized_verdicts([(c, *entries[c]) for c in clients], conf_x, conf_y, range_x, range_y)
+
+    # Work is split into (client, row block) units. Full-grid modes are cut into row blocks when
+    # there are more workers than clients; the frontier walk and the refinement need the whole client grid.
+    n_blocks = 1 if workers == 1 or mode in ["frontier", "adaptive"] else -(-workers // len(clients))
+
+    units = []
     for c in clients:
-        logics = portfolio[c].history[year][quarter]["logics"]
-        cfo_data = portfolio[c].history[year][quarter]["cfo_data"]
-        
-        conf_x = stress_config["var_x"]
-        conf_y = stress_config["var_y"]
+        if c not in vectorized:
+            unit_mode = "incremental" if mode == "vectorized" else mode
+            units += [(c, unit_mode, rows) for rows in split_rows(len(range_y), n_blocks)]
+
+    total = len(units) + len(vectorized)
+    completed = 0
+    results = {}
+
+    if workers == 1:
+        for k, (c, unit_mode, rows) in enumerate(units):
+            results[k] = stress_rows(*entries[c], conf_x, conf_y, range_x, range_y, unit_mode, rows, limits, refined)
+            completed += 1
+            if progress:
+                progress(completed, total)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(stress_rows_in_worker, *entries[c], conf_x, conf_y, range_x, range_y, unit_mode, rows,
+                                   limits, refined): k
+                       for k, (c, unit_mode, rows) in enumerate(units)}
+            for future in as_completed(futures):
+                results[futures[future]], metrics = future.result()
+                instrumentation.merge(metrics)
+                completed += 1
+                if progress:
+                    progress(completed, total)
+
+    client_verdicts = {}
+    fine_results = {}
+    for k, (c, _, _) in enumerate(units):
+        verdicts, solved = client_verdicts.get(c, ([], 0))
+        client_verdicts[c] = (verdicts + results[k][0], solved + results[k][1])
+        if mode == "adaptive":
+            fine_results[c] = results[k][2:]
+
+    for c in vectorized:
+        logics, cfo_data = entries[c]
+        check = session_checker(logics, cfo_data, {conf_x["name"], conf_y["name"]}, limits)
+
+        verdicts = vectorized[c]["verdicts"]
+        for j, i in vectorized[c]["unsafe"]:
+            verdicts[j][i] = check(stressed_data(cfo_data, conf_x, conf_y, range_x[i], range_y[j]))
 
-        range_x = [i * (conf_x["max_pct"] / conf_x["steps"]) for i in range(conf_x["steps"] + 1)]
-        range_y = [i * (conf_y["max_pct"] / conf_y["steps"]) for i in range(conf_y["steps"] + 1)]
+        client_verdicts[c] = (verdicts, len(vectorized[c]["unsafe"]))
+        completed += 1
+        if progress:
+            progress(completed, total)
+
+    for c in clients:
+        cfo_data = entries[c][1]
+        verdicts, solved = client_verdicts[c]
 
         grid = []
-        for drop_y in range_y:
+        for j, drop_y in enumerate(range_y):
             row = []
-            for drop_x in range_x:
-                test_data = cfo_data.copy()
-                
-                factor_x = (1 - drop_x) if conf_x["direction"] == "down" else (1 + drop_x)
-                test_data[conf_x["name"]] = cfo_data[conf_x["name"]] * factor_x
-                
-                factor_y = (1 - drop_y) if conf_y["direction"] == "down" else (1 + drop_y)
-                test_data[conf_y["name"]] = cfo_data[conf_y["name"]] * factor_y
-                
-                z3_res = verify_logics(logics, test_data)
+            for i, drop_x in enumerate(range_x):
+                test_data = stressed_data(cfo_data, conf_x, conf_y, drop_x, drop_y)
                 
                 row.append({
                     "val_x": test_data[conf_x["name"]],
                     "val_y": test_data[conf_y["name"]],
                     "pct_x": drop_x,
                     "pct_y": drop_y,
-                    "is_compliant": z3_res["is_compliant"]
+                    "is_compliant": verdicts[j][i]
                 })
             grid.append(row)
         
-        last_safe_x = max([i for i, cell in enumerate(grid[0]) if cell["is_compliant"]], default=0)
-        headroom_x = range_x[last_safe_x] * 100
+        # Headroom is read off the finest lattice that was solved.
+        axis_x, axis_y = refined[:2] if mode == "adaptive" else (range_x, range_y)
+        edge = fine_results[c][0] if mode == "adaptive" else verdicts
 
-        last_safe_y = max([i for i, r in enumerate(grid) if r[0]["is_compliant"]], default=0)
-        headroom_y = range_y[last_safe_y] * 100
+        last_safe_x = max([i for i, ok in enumerate(edge[0]) if ok], default=0)
+        headroom_x = axis_x[last_safe_x] * 100
+
+        last_safe_y = max([j for j, r in enumerate(edge) if r[0]], default=0)
+        headroom_y = axis_y[last_safe_y] * 100
 
         matrix_results[c] = {
             "grid": grid,
@@ -89,5 +414,169 @@ def calculate_stress_matrix(portfolio, clients, year, quarter, stress_config):
                 "labels_y": [f"-{p*100:.0f}%" if conf_y["direction"]=="down" else f"+{p*100:.0f}%" for p in range_y]
             }
         }
+
+        if mode in ["frontier", "vectorized", "adaptive"]:
+            matrix_results[c]["solved_cells"] = solved
+
+        if mode == "adaptive":
+            fine_verdicts, fine_solved = fine_results[c]
+            matrix_results[c]["refinement"] = {
+                "steps_x": steps_x_refined,
+                "steps_y": steps_y_refined,
+                "cells": len(axis_x) * len(axis_y),
+                "solved_cells": fine_solved,
+                "boundary": [{"pct_y": drop_y,
+                              "last_safe_pct_x": max([axis_x[i] for i, ok in enumerate(row) if ok], default=None)}
+                             for drop_y, row in zip(axis_y, fine_verdicts)]
+            }
         
-    return matrix_results
\ No newline at end of file
+    return matrix_results
+
+def find_breakeven(logics, cfo_data, conf, tolerance, limits=None):
+
+    session = SlicedSession(logics, cfo_data, {conf["name"]}, limits)
+
+    def check(pct):
+        test_data = cfo_data.copy()
+        test_data[conf["name"]] = cfo_data[conf["name"]] * stress_factor(conf, pct)
+        return session.check(test_data)
+
+    if not check(0.0):
+        return 0.0, 1
+    if check(conf["max_pct"]):
+        return conf["max_pct"], 2
+
+    solves = 2
+
+    low, high = 0.0, conf["max_pct"]
+    while high - low > tolerance:
+        mid = (low + high) / 2
+        if check(mid):
+            low = mid
+        else:
+            high = mid
+        solves += 1
+
+    return low, solves
+
+@instrumented("stress.headroom")
+def calculate_headroom(portfolio, clients, year, quarter, stress_config, tolerance=1e-5, limits=None):
+
+    validate_stress_inputs(portfolio, clients, year, quarter, stress_config)
+
+    assert isinstance(tolerance, float), "TOLERANCE_NOT_FLOAT"
+    assert tolerance > 0, "TOLERANCE_NOT_POSITIVE"
+    assert limits is None or isinstance(limits, SolverLimits), "LIMITS_INVALID"
+
+    headroom_results = {}
+
+    for c in clients:
+        logics = portfolio[c].history[year][quarter]["logics"]
+        cfo_data = portfolio[c].history[year][quarter]["cfo_data"]
+
+        # Undecided checks count as a breach, so headroom under a budget is a lower bound.
+        headroom_x, solves_x = find_breakeven(logics, cfo_data, stress_config["var_x"], tolerance, limits)
+        headroom_y, solves_y = find_breakeven(logics, cfo_data, stress_config["var_y"], tolerance, limits)
+
+        headroom_results[c] = {
+            "headroom_x": headroom_x * 100,
+            "headroom_y": headroom_y * 100,
+            "solves": solves_x + solves_y
+        }
+
+    return headroom_results
+
+def sample_unit_cube(method, samples, dimensions, seed):
+
+    # Latin hypercube: every variable hits each of the samples strata exactly once, jittered inside it.
+    if method == "lhs":
+        rng = np.random.default_rng(seed)
+        strata = rng.permuted(np.tile(np.arange(samples), (dimensions, 1)), axis=1).T
+        return (strata + rng.random((samples, dimensions))) / samples
+
+    return qmc.Sobol(dimensions, scramble=True, seed=seed).random_base2(int(math.log2(samples)))
+
+def space_verdicts(logics, cfo_data, variables, points, limits=None):
+
+    # Points the NumPy evaluation decides exactly are not solved; the rest go through the sliced session.
+    names = [var["name"] for var in variables]
+    factors = {var["name"]: np.array([stress_factor(var, pct) for pct in points[:, k]]) for k, var in enumerate(variables)}
+
+    compiled = compile_logics(logics)
+    plan = compiled.plan(cfo_data)
+
+    verdicts = [None] * len(points)
+    pending = list(range(len(points)))
+
+    if plan is not None:
+        arrays = {name: cfo_data[name] for name in compiled.vars if name in cfo_data}
+        for name in names:
+            arrays[name] = cfo_data[name] * factors[name]
+        try:
+            _, rule_verdicts, unsafe = evaluate_plan_array(plan, arrays, (len(points),))
+            compliant = np.ones(len(points), dtype=bool)
+            for verdict in rule_verdicts.values():
+                compliant &= verdict
+            verdicts = compliant.tolist()
+            pending = np.nonzero(unsafe)[0].tolist()
+        except NotDetermined:
+            pass
+
+    check = session_checker(logics, cfo_data, set(names), limits)
+    for k in pending:
+        test_data = cfo_data.copy()
+        for name in names:
+            test_data[name] = cfo_data[name] * factors[name][k]
+        verdicts[k] = check(test_data)
+
+    return verdicts, len(pending)
+
+@instrumented("stress.space")
+def calculate_stress_space(portfolio, clients, year, quarter, space_config, samples=256, method="lhs", seed=0,
+                           tolerance=1e-5, limits=None):
+
+    validate_space_inputs(portfolio, clients, year, quarter, space_config, samples, method)
+
+    assert isinstance(seed, int), "SEED_NOT_INT"
+    assert isinstance(tolerance, float), "TOLERANCE_NOT_FLOAT"
+    assert tolerance > 0, "TOLERANCE_NOT_POSITIVE"
+    assert limits is None or isinstance(limits, SolverLimits), "LIMITS_INVALID"
+
+    variables = space_config["variables"]
+    names = [var["name"] for var in variables]
+
+    # The same design is used for every client, so their fractions are comparable.
+    points = sample_unit_cube(method, samples, len(variables), seed) * np.array([var["max_pct"] for var in variables])
+
+    space_results = {}
+
+    for c in clients:
+        logics = portfolio[c].history[year][quarter]["logics"]
+        cfo_data = portfolio[c].history[year][quarter]["cfo_data"]
+
+        verdicts, solved = space_verdicts(logics, cfo_data, variables, points, limits)
+
+        # The compliant fraction estimates the OK share of the stress box; undecided points count against it.
+        fraction = sum(v is True for v in verdicts) / samples
+        undecided = sum(v is None for v in verdicts)
+
+        marginal = {}
+        solves = 0
+        for var in variables:
+            headroom, n = find_breakeven(logics, cfo_data, var, tolerance, limits)
+            marginal[var["name"]] = headroom * 100
+            solves += n
+
+        space_results[c] = {
+            "points": [{"pct": dict(zip(names, point.tolist())), "is_compliant": verdict}
+                       for point, verdict in zip(points, verdicts)],
+            "compliant_fraction": fraction,
+            "standard_error": math.sqrt(fraction * (1 - fraction) / samples),
+            "undecided_points": undecided,
+            "marginal_headroom": marginal,
+            "solved_points": solved,
+            "solves": solved + solves,
+            "metadata": {"variables": names, "method": method, "samples": samples, "seed": seed}
+        }
+
+    return space_results
@@ -1,6 +1,11 @@
 from fpdf import FPDF
 import os
+from app.core.instrumentation import instrumented
 
+# Bump whenever the layout of a report changes, so report_manifest.json re-renders every PDF.
+REPORT_TEMPLATE_VERSION = "2"
+
+@instrumented("report.initial")
 def generate_initial_report(logics, output_path):
 
     pdf = FPDF('P', 'mm', 'A4')
@@ -56,6 +61,7 @@ def generate_initial_report(logics, output_path):
         os.makedirs(dir_name, exist_ok=True)
     pdf.output(output_path)
 
+@instrumented("report.final")
 def generate_final_report(z3_result, logics, cfo_data, output_path):
 
     pdf = FPDF('P', 'mm', 'A4')
@@ -76,6 +82,10 @@ def generate_final_report(z3_result, logics, cfo_data, output_path):
         status_text = "PASSED: COMPLIANT WITH ALL COVENANTS"
         bg_color = (230, 255, 230)
         text_color = (0, 100, 0)
+    elif is_compliant is None:
+        status_text = "UNDECIDED: SOLVER RETURNED UNKNOWN"
+        bg_color = (255, 245, 210)
+        text_color = (150, 90, 0)
     else:
         status_text = "FAILED: COVENANT BREACH DETECTED"
         bg_color = (255, 230, 230)
@@ -125,6 +135,7 @@ def generate_final_report(z3_result, logics, cfo_data, output_path):
 
     pdf.output(output_path)
 
+@instrumented("report.portfolio")
 def generate_portfolio_report(portfolio, analysis_config, output_path):
     
     pdf = FPDF('P', 'mm', 'A4')
@@ -188,6 +199,9 @@ def generate_portfolio_report(portfolio, analysis_config, output_path):
                     display = f"OK |"
                     if m1: display += f" {m1}"
                     if m2: display += f" | {m2}"
+                elif is_ok is None:
+                    pdf.set_text_color(200, 120, 0)
+                    display = "UNKNOWN"
                 else:
                     pdf.set_text_color(200, 30, 30)
                     display = "BREACH"
@@ -206,6 +220,7 @@ def generate_portfolio_report(portfolio, analysis_config, output_path):
 
     pdf.output(output_path)
 
+@instrumented("report.matrix")
 def generate_matrix_report(matrix_results, year, quarter, output_path):
 
     pdf = FPDF('P', 'mm', 'A4')
@@ -259,6 +274,10 @@ def generate_matrix_report(matrix_results, year, quarter, output_path):
                     pdf.set_fill_color(200, 255, 200)
                     pdf.set_text_color(0, 100, 0)
                     txt = "OK"
+                elif cell["is_compliant"] is None:
+                    pdf.set_fill_color(255, 235, 190)
+                    pdf.set_text_color(150, 90, 0)
+                    txt = "UNKNOWN"
                 else:
                     pdf.set_fill_color(255, 200, 200)
                     pdf.set_text_color(150, 0, 0)
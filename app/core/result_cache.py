@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from app.core.z3engine import ENGINE_VERSION, contract_key, validate_header, verify_logics
+from app.core.instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = ".verification_cache.sqlite"
+
+def result_key(logics, cfo_data):
+
+    payload = json.dumps({
+        "engine_version": ENGINE_VERSION,
+        "contract": contract_key(logics),
+        "cfo_data": cfo_data
+    }, sort_keys=True, default=str)
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self, path):
+
+        self.path = str(path)
+        self.hits = 0
+        self.misses = 0
+
+        # Several worker processes may share the file; sqlite serialises their writes.
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, engine_version TEXT, response TEXT)")
+        self.connection.commit()
+
+    def get(self, logics, cfo_data):
+
+        row = self.connection.execute(
+            "SELECT response FROM results WHERE key = ?", (result_key(logics, cfo_data),)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            count("result_cache.misses")
+            return None
+
+        self.hits += 1
+        count("result_cache.hits")
+        response = json.loads(row[0])
+        response["model"] = None
+
+        return response
+
+    def put(self, logics, cfo_data, response):
+
+        stored = {k: v for k, v in response.items() if k != "model"}
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results (key, engine_version, response) VALUES (?, ?, ?)",
+            (result_key(logics, cfo_data), ENGINE_VERSION, json.dumps(stored)))
+        self.connection.commit()
+
+    def stats(self):
+
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+
+        self.connection.close()
+
+def verify_logics_cached(logics, cfo_data, cache, quiet=False, limits=None, artifact=None):
+
+    validate_header(logics)
+
+    for name, value in cfo_data.items():
+        assert isinstance(value, (float)), "CFO_DATA_VAR_INVALID"
+
+    response = cache.get(logics, cfo_data)
+    if response is not None:
+        logger.debug("verify_logics %s: cache hit.", logics['audit_id'])
+        return response
+
+    response = verify_logics(logics, cfo_data, quiet=quiet, limits=limits, artifact=artifact)
+
+    # An UNKNOWN only says the budget ran out; a later run with more time may decide it.
+    if response["is_compliant"] is not None:
+        cache.put(logics, cfo_data, response)
+
+    return response
@@ -0,0 +1,190 @@
+import warnings
+import numpy as np
+from app.core.history import QUARTERS
+
+AGGREGATES = {
+    "mean": np.nanmean,
+    "median": np.nanmedian,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "sum": np.nansum,
+    "std": np.nanstd
+}
+
+FILLS = {"values": np.nan, "compliant": False, "unknown": False, "recorded": False}
+
+def period_key(period):
+
+    return (period[0], QUARTERS.index(period[1]))
+
+def grown(array, axis, size, fill):
+
+    # Capacity doubles along the axis, so n inserts cost O(n) copied slots in total.
+    if array.shape[axis] >= size:
+        return array
+
+    shape = list(array.shape)
+    shape[axis] = max(size, 2 * shape[axis], 4)
+    larger = np.full(shape, fill, dtype=array.dtype)
+    larger[tuple(slice(0, n) for n in array.shape)] = array
+
+    return larger
+
+class PortfolioStore:
+
+    # Columnar copy of every Deal.history: values[deal, period, variable] holds the calculated value
+    # (or the reported cfo_data value when the solver returned none, as in breached periods), NaN elsewhere.
+    # compliant, unknown and recorded are the matching (deal, period) bitmaps; unknown marks periods the solver
+    # could not decide within its limits. Periods are kept in chronological order.
+    # The arrays are views on storage with spare capacity on every axis.
+    def __init__(self):
+
+        self.deals = []
+        self.periods = []
+        self.variables = []
+
+        self.deal_index = {}
+        self.period_index = {}
+        self.variable_index = {}
+
+        self.storage = {
+            "values": np.full((0, 0, 0), np.nan),
+            "compliant": np.zeros((0, 0), dtype=bool),
+            "unknown": np.zeros((0, 0), dtype=bool),
+            "recorded": np.zeros((0, 0), dtype=bool)
+        }
+
+    @property
+    def values(self):
+
+        return self.storage["values"][:len(self.deals), :len(self.periods), :len(self.variables)]
+
+    @property
+    def compliant(self):
+
+        return self.storage["compliant"][:len(self.deals), :len(self.periods)]
+
+    @property
+    def unknown(self):
+
+        return self.storage["unknown"][:len(self.deals), :len(self.periods)]
+
+    @property
+    def recorded(self):
+
+        return self.storage["recorded"][:len(self.deals), :len(self.periods)]
+
+    def add_deal(self, deal_id):
+
+        if deal_id not in self.deal_index:
+            d = len(self.deals)
+            for name, array in self.storage.items():
+                self.storage[name] = grown(array, 0, d + 1, FILLS[name])
+                self.storage[name][d] = FILLS[name]
+            self.deal_index[deal_id] = d
+            self.deals.append(deal_id)
+
+        return self.deal_index[deal_id]
+
+    def add_period(self, year, quarter):
+
+        period = (year, quarter)
+        if period not in self.period_index:
+            n = len(self.periods)
+            position = sum(1 for p in self.periods if period_key(p) < period_key(period))
+            # Periods mostly arrive in order; an earlier one shifts only the later slots.
+            for name, array in self.storage.items():
+                array = self.storage[name] = grown(array, 1, n + 1, FILLS[name])
+                array[:, position + 1:n + 1] = array[:, position:n]
+                array[:, position] = FILLS[name]
+            self.periods.insert(position, period)
+            if position == n:
+                self.period_index[period] = n
+            else:
+                self.period_index = {p: i for i, p in enumerate(self.periods)}
+
+        return self.period_index[period]
+
+    def add_variable(self, name):
+
+        if name not in self.variable_index:
+            v = len(self.variables)
+            self.storage["values"] = grown(self.storage["values"], 2, v + 1, np.nan)
+            self.storage["values"][:, :, v] = np.nan
+            self.variable_index[name] = v
+            self.variables.append(name)
+
+        return self.variable_index[name]
+
+    def update(self, deal_id, year, quarter, cfo_data, z3_result):
+
+        d = self.add_deal(deal_id)
+        p = self.add_period(year, quarter)
+
+        observed = {**cfo_data, **z3_result["calculated_values"]}
+        columns = [self.add_variable(name) for name in observed]
+
+        self.values[d, p, :] = np.nan
+        self.values[d, p, columns] = [float(v) for v in observed.values()]
+        self.compliant[d, p] = z3_result["is_compliant"] is True
+        self.unknown[d, p] = z3_result["is_compliant"] is None
+        self.recorded[d, p] = True
+
+    def series(self, variable, deal_id=None):
+
+        # Time series of one variable: (deals x periods), or a single row for deal_id.
+        column = self.values[:, :, self.variable_index[variable]]
+
+        return column if deal_id is None else column[self.deal_index[deal_id]]
+
+    def cross_section(self, year, quarter, variables=None):
+
+        # All deals at one period: (deals x variables), restricted to the given variables if any.
+        section = self.values[:, self.period_index[(year, quarter)], :]
+        if variables is None:
+            return section
+
+        return section[:, [self.variable_index[v] for v in variables]]
+
+    def aggregate(self, variable, how="mean", over="deals"):
+
+        assert how in AGGREGATES, "AGGREGATE_INVALID"
+        assert over in ["deals", "periods"], "AXIS_INVALID"
+
+        column = self.series(variable)
+        if column.size == 0:
+            return column
+
+        # All-NaN slices (nothing recorded) come back as NaN without a warning.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return AGGREGATES[how](column, axis=0 if over == "deals" else 1)
+
+    def compliance_rate(self, over="deals"):
+
+        assert over in ["deals", "periods"], "AXIS_INVALID"
+
+        # Undecided periods are left out of both counts.
+        axis = 0 if over == "deals" else 1
+        counts = (self.recorded & ~self.unknown).sum(axis=axis)
+
+        with np.errstate(all="ignore"):
+            return np.where(counts > 0, (self.compliant & self.recorded).sum(axis=axis) / counts, np.nan)
+
+    def breaches(self):
+
+        return [(self.deals[d], self.periods[p])
+                for d, p in zip(*np.nonzero(self.recorded & ~self.compliant & ~self.unknown))]
+
+    def undecided(self):
+
+        return [(self.deals[d], self.periods[p]) for d, p in zip(*np.nonzero(self.recorded & self.unknown))]
+
+def build_store(portfolio):
+
+    store = PortfolioStore()
+    for deal in portfolio.values():
+        for year, quarter, entry in deal.history.periods():
+            store.update(deal.id, year, quarter, entry["cfo_data"], entry["z3_result"])
+
+    return store
@@ -1,6 +1,36 @@
+import copy
+import hashlib
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
 from z3 import *
+from app.core.formula import NotDetermined, compile_formula, lift, lower_z3
+from app.core.dependency import analyze_rules, plan_evaluation, evaluate_plan, decimal_value, determined_definitions, slice_rules
+from app.core.instrumentation import Timer, count, stage
+from app.core.artifact import to_artifact, from_artifact, is_current
 
-def validate_json(logics):
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change can alter verify_logics responses, so persisted results are not reused.
+ENGINE_VERSION = "2"
+
+CONTRACT_CACHE_SIZE = 256
+
+# verdict: status and is_compliant only. core: adds conflict_variables and conflict_rules.
+# full: adds calculated_values, model and norm_metric.
+VERIFICATION_LEVELS = ["verdict", "core", "full"]
+
+# Logic left once the CFO values are substituted into the rules. Ratio definitions such as
+# leverage_ratio == net_debt / ebitda divide by a known constant and usually fall back to QF_LRA.
+# The first class whose probe accepts the preprocessed goal is used; ALL takes the rest.
+SOLVER_CLASSES = [("QF_LRA", "is-qflra"), ("QF_NRA", "is-qfnra"), ("ALL", None)]
+
+_contract_cache = OrderedDict()
+_contract_cache_stats = {"hits": 0, "misses": 0}
+
+def validate_header(logics):
 
     assert isinstance(logics, dict), "LOGICS_NOT_DICT"
     
@@ -12,6 +42,10 @@ def validate_json(logics):
     assert isinstance(logics["contract_name"], str), "CONTRACT_NAME_NOT_STR"
     assert len(logics["contract_name"]) > 0, "CONTRACT_NAME_EMPTY"
 
+def validate_json(logics):
+
+    validate_header(logics)
+
     assert "variables" in logics, "VARIABLES_MISSING"
     assert len(logics["variables"]) > 0, "VARIABLES_EMPTY"
     
@@ -50,45 +84,415 @@ def validate_json(logics):
     logic_ids = [l["id"] for l in logics["logical_conditions"]]
     assert len(logic_ids) == len(set(logic_ids)), "DUPLICATES_IN_LOGICAL_CONDITIONS"
 
-    print(f"logics validated.")
+    logger.debug("logics validated.")
 
-def verify_logics(logics, cfo_data):
+def parse_logics(logics, ctx):
 
-    validate_json(logics)
+    vars = {v['name']: Real(v['name'], ctx) for v in logics['variables']}
 
-    s = Solver()
-    s.set(unsat_core=True)
-    
-    vars = {v['name']: Real(v['name']) for v in logics['variables']}
-
-    z3_helpers = {
-        'abs': lambda x: If(x >= 0, x, -x),
-        'max': lambda a, b: If(a > b, a, b),
-        'min': lambda a, b: If(a < b, a, b),
-        'And': And,
-        'Or': Or,
-        'If': If
+    programs = [compile_formula(rule['formula'], vars) for rule in logics['logical_conditions']]
+
+    formulas = []
+    for program in programs:
+        formula_z3 = lower_z3(program, vars, ctx)
+        assert is_expr(formula_z3), "Z3_EXPRESSION_INVALID"
+        formulas.append(formula_z3)
+
+    return vars, formulas, programs
+
+class CompiledContract:
+    def __init__(self, key, logics, artifact=None):
+
+        self.key = key
+        self.variables = copy.deepcopy(logics['variables'])
+        self.logical_conditions = copy.deepcopy(logics['logical_conditions'])
+
+        # Each contract owns a Z3 context, so its terms (and with them the solver's choices, unsat cores
+        # included) do not depend on what else the process built before, or on which worker compiled it.
+        self.ctx = Context()
+        if artifact is None:
+            self.vars, self.formulas, self.programs = parse_logics(logics, self.ctx)
+        else:
+            self.vars, self.formulas, self.programs = from_artifact(artifact, self.ctx)
+        self.rules = analyze_rules(self.logical_conditions, self.programs)
+        self.plans = {}
+
+    def plan(self, cfo_data):
+
+        known = frozenset(name for name in cfo_data if name in self.vars)
+        if known not in self.plans:
+            self.plans[known] = plan_evaluation(self.rules, list(self.vars), known)
+
+        return self.plans[known]
+
+    def slice(self, cfo_data, query):
+
+        known = {name for name in cfo_data if name in self.vars}
+        try:
+            env = {name: lift(cfo_data[name]) for name in known - set(query)}
+        except NotDetermined:
+            env = {}
+
+        return slice_rules(self.rules, known, set(query), determined_definitions(self.rules, env))
+
+    def evaluate(self, cfo_data):
+
+        plan = self.plan(cfo_data)
+        if plan is None:
+            return None
+
+        try:
+            return evaluate_plan(plan, {name: cfo_data[name] for name in cfo_data if name in self.vars})
+        except NotDetermined:
+            return None
+
+def contract_key(logics):
+
+    payload = json.dumps({
+        "variables": logics.get("variables"),
+        "logical_conditions": logics.get("logical_conditions")
+    }, sort_keys=True, default=str)
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def compile_logics(logics, artifact=None):
+
+    validate_header(logics)
+
+    key = contract_key(logics)
+
+    if key in _contract_cache:
+        _contract_cache.move_to_end(key)
+        _contract_cache_stats["hits"] += 1
+        return _contract_cache[key]
+
+    _contract_cache_stats["misses"] += 1
+
+    # An artifact compiled from the same content was validated when it was built.
+    if artifact is not None and not is_current(artifact, key, ENGINE_VERSION):
+        count("artifact.stale")
+        artifact = None
+
+    if artifact is not None:
+        with stage("compile.artifact"):
+            compiled = CompiledContract(key, logics, artifact)
+        count("artifact.loaded")
+    else:
+        with stage("compile.validate"):
+            validate_json(logics)
+        with stage("compile.parse"):
+            compiled = CompiledContract(key, logics)
+
+    _contract_cache[key] = compiled
+    while len(_contract_cache) > CONTRACT_CACHE_SIZE:
+        _contract_cache.popitem(last=False)
+
+    return compiled
+
+def build_artifact(logics):
+
+    compiled = compile_logics(logics)
+
+    return to_artifact(compiled.key, ENGINE_VERSION, compiled.vars, compiled.formulas, compiled.programs,
+                       [rule['id'] for rule in compiled.logical_conditions])
+
+def contract_cache_info():
+
+    return {
+        "hits": _contract_cache_stats["hits"],
+        "misses": _contract_cache_stats["misses"],
+        "size": len(_contract_cache),
+        "max_size": CONTRACT_CACHE_SIZE
     }
 
-    context_eval = {**vars, **z3_helpers}
+def clear_contract_cache():
 
-    for i, rule in enumerate(logics['logical_conditions']):
-        formula_z3 = eval(rule['formula'], {"__builtins__": None}, context_eval)
-        assert is_expr(formula_z3), "Z3_EXPRESSION_INVALID"
-        print(f"Rule #{rule['id']}: {formula_z3}")
-        s.assert_and_track(formula_z3, f"RULE_{rule['id']}")
+    _contract_cache.clear()
+    _contract_cache_stats["hits"] = 0
+    _contract_cache_stats["misses"] = 0
+
+def assert_cfo_data(solver, vars, cfo_data, track=False):
 
     for name, value in cfo_data.items():
         assert isinstance(value, (float)), "CFO_DATA_VAR_INVALID"
         if name in vars:
-            s.assert_and_track(vars[name] == RealVal(str(value)), f"DATA_{name}")
+            if track:
+                solver.assert_and_track(vars[name] == RealVal(str(value), solver.ctx), f"DATA_{name}")
+            else:
+                solver.add(vars[name] == RealVal(str(value), solver.ctx))
+
+# Tactics tried, in order, when a check comes back unknown and the limits ask for retries.
+RETRY_TACTICS = ["qfnra-nlsat", "nra"]
+
+class SolverLimits:
+    def __init__(self, timeout_ms=None, rlimit=None, allow_unknown=False, retry_tactics=None, deadline=None):
+
+        assert timeout_ms is None or isinstance(timeout_ms, int), "TIMEOUT_NOT_INT"
+        assert timeout_ms is None or timeout_ms > 0, "TIMEOUT_BELOW_ONE"
+        assert rlimit is None or isinstance(rlimit, int), "RLIMIT_NOT_INT"
+        assert rlimit is None or rlimit > 0, "RLIMIT_BELOW_ONE"
+        assert isinstance(allow_unknown, bool), "ALLOW_UNKNOWN_NOT_BOOL"
+        assert retry_tactics is None or isinstance(retry_tactics, list), "RETRY_TACTICS_NOT_LIST"
+        assert deadline is None or isinstance(deadline, (int, float)), "DEADLINE_NOT_A_NUMBER"
+
+        self.timeout_ms = timeout_ms
+        self.rlimit = rlimit
+        self.allow_unknown = allow_unknown
+        self.retry_tactics = list(retry_tactics or [])
+        self.deadline = deadline
+
+    def timeout(self):
+
+        # A deadline (time.time() seconds) is read again for every check, so the preprocessed check,
+        # the fallbacks and the retries of one verification share what is left of the run.
+        if self.deadline is None:
+            return self.timeout_ms
+
+        return self.within((self.deadline - time.time()) * 1000).timeout_ms
+
+    def apply(self, solver):
+
+        timeout_ms = self.timeout()
+        if timeout_ms is not None:
+            solver.set(timeout=timeout_ms)
+        if self.rlimit is not None:
+            solver.set(rlimit=self.rlimit)
+
+        return solver
+
+    def within(self, remaining_ms):
+
+        # A per-run budget caps every check with whatever is left of the run.
+        remaining_ms = max(1, int(remaining_ms))
+        timeout_ms = remaining_ms if self.timeout_ms is None else min(self.timeout_ms, remaining_ms)
+
+        return SolverLimits(timeout_ms, self.rlimit, self.allow_unknown, self.retry_tactics)
+
+    def until(self, deadline):
+
+        return SolverLimits(self.timeout_ms, self.rlimit, self.allow_unknown, self.retry_tactics, deadline)
+
+DEFAULT_LIMITS = SolverLimits()
+
+def rule_solver(compiled, track, limits=DEFAULT_LIMITS, tactic=None, rule_ids=None):
+
+    s = Then("simplify", tactic, ctx=compiled.ctx).solver() if tactic is not None else Solver(ctx=compiled.ctx)
+    limits.apply(s)
+    if track:
+        s.set(unsat_core=True)
+
+    for rule, formula_z3 in zip(compiled.logical_conditions, compiled.formulas):
+        if rule_ids is not None and rule['id'] not in rule_ids:
+            continue
+        if track:
+            s.assert_and_track(formula_z3, f"RULE_{rule['id']}")
+        else:
+            s.add(formula_z3)
+
+    return s
+
+# Propagates the CFO values through the definitions (ebitda, net_debt, ...) until every known value is a
+# constant; the equalities themselves stay in the goal, so the model still holds every variable.
+PREPROCESS_TACTICS = ["simplify", "propagate-values", "simplify"]
+
+def preprocess(compiled, cfo_data):
+
+    goal = Goal(ctx=compiled.ctx)
+    goal.add(*compiled.formulas)
+    for name, value in cfo_data.items():
+        if name in compiled.vars:
+            goal.add(compiled.vars[name] == RealVal(str(value), compiled.ctx))
+
+    goal = Then(*PREPROCESS_TACTICS, ctx=compiled.ctx)(goal)[0]
+
+    solver_class = next(name for name, probe in SOLVER_CLASSES
+                        if probe is None or Probe(probe, compiled.ctx)(goal) == 1.0)
+
+    return goal, solver_class
+
+def preprocessed_solver(compiled, cfo_data, limits):
+
+    with stage("verify.preprocess"):
+        goal, solver_class = preprocess(compiled, cfo_data)
+
+    s = SolverFor(solver_class, ctx=compiled.ctx) if solver_class != "ALL" else Solver(ctx=compiled.ctx)
+    limits.apply(s)
+    s.add(goal.as_expr())
+    count(f"preprocess.{solver_class}")
+
+    return s, solver_class
 
-    result = s.check()
-    assert result != unknown, "RESULT_UNKNOWN"
+def numeral_model(m, vars):
+
+    # Constants propagated into a power stay unevaluated, e.g. y == (1600001/2)**700; the rule solver
+    # computes the value itself.
+    return all(m[var] is None or hasattr(m[var], "as_decimal") for var in vars.values())
+
+def retried(compiled, cfo_data, track, limits, rule_ids=None):
+
+    # Fresh solvers built from the retry tactics; the first decided result wins.
+    s, result = None, unknown
+    for tactic in limits.retry_tactics:
+        s = rule_solver(compiled, track, limits, tactic, rule_ids)
+        assert_cfo_data(s, compiled.vars, cfo_data, track=track)
+        result = checked(s, limits)
+        count("solver.retries")
+        if result != unknown:
+            break
+
+    return s, result
+
+def checked(solver, limits=DEFAULT_LIMITS):
+
+    if limits.deadline is not None:
+        solver.set(timeout=limits.timeout())
+
+    result = solver.check()
+    count("solver.checks")
+    count(f"solver.{result}")
+
+    return result
+
+def verify_logics(logics, cfo_data, fast_path=True, quiet=False, level="full", limits=None, preprocessed=True,
+                  artifact=None):
+
+    assert level in VERIFICATION_LEVELS, "LEVEL_INVALID"
+
+    timer = Timer()
+
+    compiled = compile_logics(logics, artifact)
+
+    compile_time = timer.lap("verify.compile")
+
+    if not quiet and logger.isEnabledFor(logging.INFO):
+        for rule, formula_z3 in zip(compiled.logical_conditions, compiled.formulas):
+            logger.info("Rule #%s: %s", rule['id'], formula_z3)
+
+    return verify_compiled(compiled, logics['audit_id'], cfo_data, fast_path, quiet, level,
+                           compile_time=compile_time, limits=limits, preprocessed=preprocessed)
+
+def verify_compiled(compiled, audit_id, cfo_data, fast_path=True, quiet=False, level="full", solver=None,
+                    compile_time=0.0, limits=None, preprocessed=True):
+
+    limits = DEFAULT_LIMITS if limits is None else limits
+
+    # quiet drops the per-rule and per-value messages, which dominate wall time inside stress grids.
+    log = logger.debug if quiet else logger.info
+    verbose = not quiet and logger.isEnabledFor(logging.INFO)
+
+    timings = {"compile": compile_time}
+    vars = compiled.vars
+
+    for name, value in cfo_data.items():
+        assert isinstance(value, (float)), "CFO_DATA_VAR_INVALID"
+
+    timer = Timer()
+    count("verify.calls")
+
+    # Fully determined contracts are computed exactly without Z3. Unless only the verdict is asked for,
+    # breaches still go through the solver so that conflict_variables and conflict_rules come from its unsat core.
+    evaluation = compiled.evaluate(cfo_data) if fast_path else None
+    calculated = evaluation[0] if evaluation is not None and not evaluation[1] else None
+    if calculated is not None and level == "full" and not all(map(printable, calculated.values())):
+        calculated = None
+    breached = evaluation is not None and bool(evaluation[1]) and level == "verdict"
+
+    timings["evaluate"] = timer.lap("verify.evaluate")
+
+    track = level != "verdict"
+
+    # A solver handed in by verify_logics_batch already holds the rules; the data lives in a push scope.
+    s = None
+    scoped = False
+
+    if calculated is not None:
+        result = sat
+        count("verify.fast_path")
+    elif breached:
+        result = unsat
+        count("verify.fast_path")
+    else:
+        result = unknown
+
+        # Substituted rules no longer mention the data, so a breach needs the original problem for its unsat core;
+        # breaches the evaluation already found skip the preprocessed check.
+        if solver is None and preprocessed and not (track and evaluation is not None and evaluation[1]):
+            s, solver_class = preprocessed_solver(compiled, cfo_data, limits)
+            with stage(f"verify.solve.{solver_class}"):
+                result = checked(s, limits)
+            if result == sat and level == "full" and not numeral_model(s.model(), vars):
+                result = unknown
+
+        if result == unknown or (result == unsat and track):
+            if solver is not None:
+                s, scoped = solver, True
+                s.push()
+            else:
+                s = rule_solver(compiled, track, limits)
+
+            assert_cfo_data(s, vars, cfo_data, track=track)
+            result = checked(s, limits)
+
+        if result == unknown and scoped:
+            # Incremental solving can give up on non-linear contracts that a fresh solver decides.
+            s.pop()
+            s, scoped = rule_solver(compiled, track, limits), False
+            assert_cfo_data(s, vars, cfo_data, track=track)
+            result = checked(s, limits)
+
+        if result == unknown and limits.retry_tactics:
+            reason = s.reason_unknown()
+            retry_s, result = retried(compiled, cfo_data, track, limits)
+            if result != unknown:
+                if scoped:
+                    s.pop()
+                s, scoped = retry_s, False
+            logger.debug("verify_logics %s: unknown (%s), retries gave %s.", audit_id, reason, result)
+
+    count(f"verify.{result}")
+
+    try:
+        assert result != unknown or limits.allow_unknown, "RESULT_UNKNOWN"
+
+        timings["solve"] = timer.lap("verify.solve")
+
+        response = build_response(compiled, cfo_data, result, s, calculated, level, log, verbose)
+    finally:
+        if scoped:
+            s.pop()
+
+    timings["model"] = timer.lap("verify.model")
+    logger.debug("verify_logics %s: compile=%.6fs evaluate=%.6fs solve=%.6fs model=%.6fs",
+                 audit_id, timings["compile"], timings["evaluate"], timings["solve"], timings["model"])
+
+    return response
+
+def printable(value):
+
+    # The exact model prints numerals; past sys.get_int_max_str_digits() (0: no limit) the solver builds it.
+    limit = sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits") else 0
+    bits = max(value.numerator.bit_length(), value.denominator.bit_length())
+
+    return limit == 0 or bits * math.log10(2) + 1 < limit
+
+def exact_model(compiled, calculated):
+
+    # The fast path fixes every variable, so the solver's model would hold these same rationals.
+    m = Model(compiled.ctx)
+    for name, var in compiled.vars.items():
+        value = calculated[name]
+        m.update_value(var, RealVal(f"{value.numerator}/{value.denominator}", compiled.ctx))
+
+    return m
+
+def build_response(compiled, cfo_data, result, s, calculated, level, log, verbose):
+
+    vars = compiled.vars
+    track = level != "verdict"
 
     response = {
         "status": str(result).upper(),
-        "is_compliant": result == z3.sat,
+        "is_compliant": None if result == unknown else result == sat,
         "calculated_values": {},
         "model": None,
         "missing": {},
@@ -97,29 +501,37 @@ def verify_logics(logics, cfo_data):
         "conflict_rules": []
     }
 
-    values = []
     if result == sat:
+        log("STATUS: COMPLIANT (SAT).")
+    elif result == unsat:
+        log("STATUS: NON-COMPLIANT OR CONFLICT (UNSAT - BREACH).")
+    else:
+        log("STATUS: UNDECIDED (UNKNOWN - %s).", s.reason_unknown())
 
-        print("STATUS: ✅ COMPLIANT (SAT).")
+    values = []
+    if result == sat and level == "full":
         
-        m = s.model()
+        m = s.model() if calculated is None else exact_model(compiled, calculated)
         response["model"] = m
       
         for var_name in vars:
 
-            var_obj = vars[var_name]
-            z3_val = m[var_obj]
-            
-            assert z3_val is not None, "Z3_VALUE_IS_NONE"
-            
-            val_float = float(z3_val.as_decimal(2).replace('?', '')) if hasattr(z3_val, 'as_decimal') else z3_val
+            if calculated is not None:
+                val_float = decimal_value(calculated[var_name])
+            else:
+                var_obj = vars[var_name]
+                z3_val = m[var_obj]
+                
+                assert z3_val is not None, "Z3_VALUE_IS_NONE"
+                
+                val_float = float(z3_val.as_decimal(2).replace('?', '')) if hasattr(z3_val, 'as_decimal') else z3_val
+
             values = values + [val_float]
             response["calculated_values"][var_name] = val_float
-            print(f"  > {var_name:.<50} {val_float}")
-
-    elif result == unsat:
+            if verbose:
+                logger.info("  > %s %s", f"{var_name:.<50}", val_float)
 
-        print("STATUS: ❌ NON-COMPLIANT OR CONFLICT (UNSAT - BREACH).")
+    elif result == unsat and track:
 
         core = s.unsat_core()
         for label in core:
@@ -130,20 +542,90 @@ def verify_logics(logics, cfo_data):
                 response["conflict_rules"].append(label_str.replace("RULE_", ""))
 
         if response["conflict_variables"]:
-            vars_str = ", ".join(response["conflict_variables"])
-            print(f"Variables causing conflict: {vars_str}.")
+            log("Variables causing conflict: %s.", ", ".join(response["conflict_variables"]))
         
         if response["conflict_rules"]:
-            rules_str = ", ".join(response["conflict_rules"])
-            print(f"Broken rules (IDs): {rules_str}.")
+            log("Broken rules (IDs): %s.", ", ".join(response["conflict_rules"]))
 
     missing = [v for v in vars if v not in cfo_data]
     if missing:
         
         response["missing"] = missing
-        print(f"NOTE: The variables {missing} have been automatically calculated to satisfy the agreement.")
+        log("NOTE: The variables %s have been automatically calculated to satisfy the agreement.", missing)
 
     norm_metric = math.sqrt(sum(v**2 for v in values))/math.pi
     response["norm_metric"] = norm_metric
 
-    return response
\ No newline at end of file
+    return response
+
+class ContractSession:
+    def __init__(self, logics, limits=None, rule_ids=None):
+
+        self.logics = logics
+        self.compiled = compile_logics(logics)
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self.rule_ids = None if rule_ids is None else set(rule_ids)
+
+        # A session over a slice only asserts its rules and the data of the variables they read.
+        self.vars = self.compiled.vars
+        if self.rule_ids is not None:
+            names = set().union(*[r["variables"] for r in self.compiled.rules if r["id"] in self.rule_ids])
+            self.vars = {name: var for name, var in self.compiled.vars.items() if name in names}
+
+        self.solver = rule_solver(self.compiled, track=False, limits=self.limits, rule_ids=self.rule_ids)
+
+    def check(self, cfo_data):
+
+        self.solver.push()
+        try:
+            assert_cfo_data(self.solver, self.vars, cfo_data)
+            result = checked(self.solver, self.limits)
+        finally:
+            self.solver.pop()
+
+        if result == unknown and self.limits.retry_tactics:
+            _, result = retried(self.compiled, cfo_data, False, self.limits, self.rule_ids)
+
+        assert result != unknown or self.limits.allow_unknown, "RESULT_UNKNOWN"
+
+        # None marks a check the solver could not decide within its limits.
+        return None if result == unknown else result == sat
+
+class SlicedSession:
+
+    # Stress and headroom queries only move the query variables. The rules outside their cone of influence
+    # are checked once against the base data; every later check asserts the slice alone.
+    def __init__(self, logics, cfo_data, query, limits=None):
+
+        self.compiled = compile_logics(logics)
+        self.rule_ids, rest = self.compiled.slice(cfo_data, query)
+
+        self.base = ContractSession(logics, limits, rest).check(cfo_data) if rest else True
+        self.session = ContractSession(logics, limits, self.rule_ids) if self.rule_ids else None
+
+        count("slice.rules_kept", len(self.rule_ids))
+        count("slice.rules_dropped", len(rest))
+
+    def check(self, cfo_data):
+
+        if self.base is False:
+            return False
+
+        verdict = self.session.check(cfo_data) if self.session is not None else True
+        if verdict is False:
+            return False
+
+        return None if self.base is None or verdict is None else True
+
+def verify_logics_batch(logics, cfo_data_list, fast_path=True, quiet=True, level="full", limits=None):
+
+    assert level in VERIFICATION_LEVELS, "LEVEL_INVALID"
+    assert isinstance(cfo_data_list, list), "CFO_DATA_LIST_NOT_LIST"
+    assert all(isinstance(cfo_data, dict) for cfo_data in cfo_data_list), "CFO_DATA_NOT_DICT"
+
+    compiled = compile_logics(logics)
+    limits = DEFAULT_LIMITS if limits is None else limits
+    solver = rule_solver(compiled, track=level != "verdict", limits=limits)
+
+    return [verify_compiled(compiled, logics['audit_id'], cfo_data, fast_path, quiet, level, solver, limits=limits)
+            for cfo_data in cfo_data_list]
@@ -0,0 +1,82 @@
+import json
+import random
+import sys
+import time
+from app.core.z3engine import verify_logics, verify_logics_batch
+
+# Minimum vectors per second for verify_logics_batch and minimum speed-up over a verify_logics loop.
+# Run from the repository root: python -m app.utils.benchmark_batch
+TARGETS = {
+    "full": {"throughput": 200.0, "speedup": 1.5},
+    "core": {"throughput": 300.0, "speedup": 1.5},
+    "verdict": {"throughput": 500.0, "speedup": 2.0}
+}
+
+SCENARIOS = [
+    ("tests/scenarios/logics_simple.json", "tests/scenarios/cfo_data_simple.json"),
+    ("tests/scenarios/logics_complex.json", "tests/scenarios/cfo_data_complex.json")
+]
+
+def perturbed_vectors(cfo_data, n, seed):
+
+    rng = random.Random(seed)
+
+    return [{name: value * rng.uniform(0.5, 1.5) for name, value in cfo_data.items()} for _ in range(n)]
+
+def benchmark(logics, cfo_data_list, level, fast_path):
+
+    start = time.perf_counter()
+    for cfo_data in cfo_data_list:
+        verify_logics(logics, cfo_data, fast_path=fast_path, quiet=True, level=level)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verify_logics_batch(logics, cfo_data_list, fast_path=fast_path, level=level)
+    batch_time = time.perf_counter() - start
+
+    return {
+        "vectors": len(cfo_data_list),
+        "loop_seconds": loop_time,
+        "batch_seconds": batch_time,
+        "throughput": len(cfo_data_list) / batch_time,
+        "speedup": loop_time / batch_time
+    }
+
+def run(n=500, seed=7, output_path=None):
+
+    results = []
+    passed = True
+
+    for path_logics, path_cfo_data in SCENARIOS:
+
+        with open(path_logics, "r") as f:
+            logics = json.load(f)
+        with open(path_cfo_data, "r") as f:
+            cfo_data = json.load(f)
+
+        cfo_data_list = perturbed_vectors(cfo_data, n, seed)
+
+        for level in TARGETS:
+            for fast_path in [True, False]:
+
+                result = benchmark(logics, cfo_data_list, level, fast_path)
+
+                # Targets apply to the solver path; the fast path only shows how much Z3 it saves.
+                target = TARGETS[level]
+                ok = fast_path or (result["throughput"] >= target["throughput"] and result["speedup"] >= target["speedup"])
+                passed = passed and ok
+
+                result.update({"logics": path_logics, "level": level, "fast_path": fast_path, "ok": ok})
+                results.append(result)
+
+                print(f"{path_logics:<40} {level:<8} fast_path={str(fast_path):<5} "
+                      f"{result['throughput']:>9.1f} vec/s  x{result['speedup']:.2f}  {'OK' if ok else 'BELOW TARGET'}")
+
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            json.dump({"targets": TARGETS, "results": results}, f, indent=4)
+
+    return passed
+
+if __name__ == "__main__":
+    sys.exit(0 if run(output_path=sys.argv[1] if len(sys.argv) > 1 else None) else 1)
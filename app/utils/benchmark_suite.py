@@ -0,0 +1,126 @@
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+import z3
+from app.core import instrumentation
+from app.core.z3engine import ENGINE_VERSION, verify_logics, clear_contract_cache
+from app.core.report import REPORT_TEMPLATE_VERSION, generate_portfolio_report, generate_matrix_report
+from app.core.portfolio import create_portfolio
+from app.core.postprocessing import calculate_stress_matrix
+from app.utils.generate_synthetic_fund import generate_fund
+
+# Run from the repository root: python -m app.utils.benchmark_suite [output.json] [--quick]
+# Every size is timed per stage; compare the JSON of two versions to spot regressions.
+SIZES = [
+    {"n_clients": 2, "n_quarters": 4, "n_rules": 4, "n_ratios": 1, "breach_rate": 0.1},
+    {"n_clients": 10, "n_quarters": 8, "n_rules": 6, "n_ratios": 2, "breach_rate": 0.1},
+    {"n_clients": 25, "n_quarters": 8, "n_rules": 10, "n_ratios": 4, "breach_rate": 0.2}
+]
+
+QUICK_SIZES = SIZES[:1]
+
+STRESS_STEPS = 6
+
+def timed(function):
+
+    start = time.perf_counter()
+    result = function()
+
+    return result, time.perf_counter() - start
+
+def stress_config(steps):
+
+    return {
+        "var_x": {"name": "revenue", "direction": "down", "steps": steps, "max_pct": 0.5},
+        "var_y": {"name": "total_debt", "direction": "up", "steps": steps, "max_pct": 1.0}
+    }
+
+def benchmark_size(size, seed=0):
+
+    with tempfile.TemporaryDirectory() as root_path:
+
+        fund = generate_fund(root_path, seed=seed, **size)
+        clients, years, quarters = fund["clients"], fund["years"], fund["quarters"]
+        y_stress, q_stress = years[-1], quarters[-1]
+
+        inputs = []
+        for client_id in clients:
+            for y in years:
+                for q in quarters:
+                    path = Path(root_path) / client_id / f"{y}_{q}"
+                    with open(path / "logics.json", "r") as f:
+                        logics = json.load(f)
+                    with open(path / "cfo_data.json", "r") as f:
+                        inputs.append((logics, json.load(f)))
+
+        clear_contract_cache()
+        stages = {}
+
+        _, stages["verify_logics"] = timed(lambda: [verify_logics(l, c, quiet=True) for l, c in inputs])
+        instrumentation.reset()
+        _, stages["verify_logics_solver"] = timed(lambda: [verify_logics(l, c, fast_path=False, quiet=True) for l, c in inputs])
+        _, stages["verify_logics_solver_plain"] = timed(
+            lambda: [verify_logics(l, c, fast_path=False, quiet=True, preprocessed=False) for l, c in inputs])
+
+        # Solve time of the preprocessed checks, per logic left after substituting the CFO data.
+        solver_classes = {name[len("verify.solve."):]: entry for name, entry in instrumentation.snapshot()["stages"].items()
+                          if name.startswith("verify.solve.")}
+
+        portfolio, stages["create_portfolio"] = timed(lambda: create_portfolio(clients, years, quarters, root_path, force=True))
+
+        _, stages["calculate_stress_matrix"] = timed(
+            lambda: calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config(STRESS_STEPS)))
+        matrix_results, stages["calculate_stress_matrix_vectorized"] = timed(
+            lambda: calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config(STRESS_STEPS), mode="vectorized"))
+
+        analysis_config = {c: ["leverage_ratio", "ebitda"] for c in clients}
+        _, stages["generate_portfolio_report"] = timed(
+            lambda: generate_portfolio_report(portfolio, analysis_config, f"{root_path}/portfolio_executive_summary.pdf"))
+        _, stages["generate_matrix_report"] = timed(
+            lambda: generate_matrix_report(matrix_results, y_stress, q_stress, f"{root_path}/portfolio_sensitivity_matrix.pdf"))
+
+    return {
+        "size": size,
+        "periods": len(inputs),
+        "breaches": fund["breaches"],
+        "seconds": stages,
+        "solver_classes": solver_classes,
+        "periods_per_second": {
+            "verify_logics": len(inputs) / stages["verify_logics"],
+            "create_portfolio": len(inputs) / stages["create_portfolio"]
+        }
+    }
+
+def run(sizes=SIZES, output_path=None):
+
+    results = []
+    for size in sizes:
+
+        result = benchmark_size(size)
+        results.append(result)
+
+        print(f"clients={size['n_clients']:<4} quarters={size['n_quarters']:<3} rules={size['n_rules']:<3} "
+              f"ratios={size['n_ratios']:<2} " +
+              " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in result["seconds"].items()))
+
+    report = {
+        "engine_version": ENGINE_VERSION,
+        "report_template_version": REPORT_TEMPLATE_VERSION,
+        "python": platform.python_version(),
+        "z3": z3.get_version_string(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+    return report
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    run(QUICK_SIZES if "--quick" in sys.argv else SIZES, args[0] if args else "benchmark_results.json")
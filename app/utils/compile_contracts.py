@@ -0,0 +1,33 @@
+import json
+import sys
+from pathlib import Path
+from app.core.z3engine import ENGINE_VERSION, build_artifact, contract_key
+from app.core.artifact import ARTIFACT_FILENAME, is_current, read_artifact, write_artifact
+
+# Run from the repository root: python -m app.utils.compile_contracts <fund_root> [--force]
+# Writes logics.smt2.json next to every <client>/<year>_<quarter>/logics.json whose artifact is
+# missing or was built from other content, engine or artifact version.
+def compile_fund(root_path, force=False):
+
+    written, current = 0, 0
+    for path_logics in sorted(Path(root_path).glob("*/*/logics.json")):
+
+        with open(path_logics, "r") as f:
+            logics = json.load(f)
+
+        path_artifact = path_logics.parent / ARTIFACT_FILENAME
+        artifact = read_artifact(path_artifact)
+        if not force and artifact is not None and is_current(artifact, contract_key(logics), ENGINE_VERSION):
+            current += 1
+            continue
+
+        write_artifact(path_artifact, build_artifact(logics))
+        written += 1
+
+    return {"written": written, "current": current}
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    root = args[0] if args else "tests/scenarios/Fund_01"
+    summary = compile_fund(root, force="--force" in sys.argv)
+    print(f"Fund '{root}': {summary['written']} artifacts written, {summary['current']} already current.")
@@ -0,0 +1,138 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+
+INPUTS = ["revenue", "operating_expenses", "total_debt", "cash", "interest_expense", "capex"]
+
+DEFINITIONS = [
+    ("ebitda", "ebitda == revenue - operating_expenses"),
+    ("net_debt", "net_debt == total_debt - cash"),
+    ("leverage_ratio", "leverage_ratio == net_debt / ebitda")
+]
+
+# Thresholds leave this much room around the client's base values, so only the periods picked
+# for a breach fail (quarterly noise stays well inside it). The base values do not drift, so this holds
+# however many quarters are generated.
+HEADROOM = 0.35
+BREACH_DEBT_FACTOR = 2.5
+
+def client_periods(start_year, n_quarters):
+
+    assert n_quarters > 0, "QUARTERS_BELOW_ONE"
+    assert n_quarters < 4 or n_quarters % 4 == 0, "QUARTERS_NOT_FULL_YEARS"
+
+    return [(str(start_year + i // 4), QUARTERS[i % 4]) for i in range(n_quarters)]
+
+def base_values(rng):
+
+    revenue = rng.uniform(5e5, 5e6)
+    operating_expenses = revenue * rng.uniform(0.55, 0.75)
+    ebitda = revenue - operating_expenses
+
+    return {
+        "revenue": revenue,
+        "operating_expenses": operating_expenses,
+        "total_debt": ebitda * rng.uniform(1.5, 3.0),
+        "cash": ebitda * rng.uniform(0.1, 0.4),
+        "interest_expense": ebitda * rng.uniform(0.05, 0.15),
+        "capex": ebitda * rng.uniform(0.1, 0.3)
+    }
+
+def derived_values(data, n_ratios):
+
+    values = dict(data)
+    values["ebitda"] = data["revenue"] - data["operating_expenses"]
+    values["net_debt"] = data["total_debt"] - data["cash"]
+    values["leverage_ratio"] = values["net_debt"] / values["ebitda"]
+
+    for i in range(n_ratios):
+        values[f"ratio_{i + 1}"] = (values["ebitda"] - data["capex"] * (i + 1) / n_ratios) / (data["interest_expense"] * round(1 + i / 10, 2))
+
+    return values
+
+def ratio_definitions(n_ratios):
+
+    return [(f"ratio_{i + 1}", f"ratio_{i + 1} == (ebitda - capex * {(i + 1) / n_ratios!r}) / (interest_expense * {round(1 + i / 10, 2)!r})")
+            for i in range(n_ratios)]
+
+def covenants(base, n_rules, n_ratios):
+
+    # Upper bounds on leverage and net debt, lower bounds on the rest. Rules beyond the pool repeat it
+    # with looser thresholds, which keeps every contract feasible while growing the rule count.
+    pool = [("leverage_ratio", "<=")] + [(f"ratio_{i + 1}", ">=") for i in range(n_ratios)] + \
+           [("ebitda", ">="), ("net_debt", "<="), ("cash", ">="), ("revenue", ">=")]
+
+    rules = []
+    for j in range(n_rules):
+        name, op = pool[j % len(pool)]
+        loosen = 1 + 0.1 * (j // len(pool))
+        threshold = base[name] * (1 + HEADROOM) * loosen if op == "<=" else base[name] * (1 - HEADROOM) / loosen
+        rules.append(f"{name} {op} {round(threshold, 4)!r}")
+
+    return rules
+
+def generate_fund(root_path, n_clients=3, n_quarters=8, n_rules=4, n_ratios=1, breach_rate=0.1, seed=0, start_year=2024):
+
+    assert n_clients > 0, "CLIENTS_BELOW_ONE"
+    assert n_rules > 0, "RULES_BELOW_ONE"
+    assert n_ratios >= 0, "RATIOS_BELOW_ZERO"
+    assert 0 <= breach_rate <= 1, "BREACH_RATE_INVALID"
+
+    rng = random.Random(seed)
+    periods = client_periods(start_year, n_quarters)
+    clients = [f"Client{i + 1:04d}" for i in range(n_clients)]
+    definitions = DEFINITIONS + ratio_definitions(n_ratios)
+    breaches = 0
+
+    for client_id in clients:
+
+        base = base_values(rng)
+        rules = [formula for _, formula in definitions] + covenants(derived_values(base, n_ratios), n_rules, n_ratios)
+
+        for year, q in periods:
+
+            data = {name: value * rng.uniform(0.98, 1.02) for name, value in base.items()}
+            data["operating_expenses"] = min(data["operating_expenses"], data["revenue"] * 0.8)
+
+            if rng.random() < breach_rate:
+                data["total_debt"] = data["total_debt"] * BREACH_DEBT_FACTOR
+                breaches += 1
+
+            logics = {
+                "audit_id": f"{client_id}_{year}_{q}",
+                "contract_name": "Synthetic Credit Agreement",
+                "variables": [{"name": name, "definition": name.replace("_", " ").title(), "definition_page": 1}
+                              for name in INPUTS + [name for name, _ in definitions]],
+                "logical_conditions": [{"id": i + 1, "formula": formula, "evidence": "Synthetic", "evidence_page": 1}
+                                       for i, formula in enumerate(rules)]
+            }
+
+            cfo_data = {name: round(value, 2) for name, value in data.items()}
+
+            folder = Path(root_path) / client_id / f"{year}_{q}"
+            folder.mkdir(parents=True, exist_ok=True)
+
+            with open(folder / "logics.json", "w") as f:
+                json.dump(logics, f, indent=4)
+            with open(folder / "cfo_data.json", "w") as f:
+                json.dump(cfo_data, f, indent=4)
+
+    return {
+        "clients": clients,
+        "years": sorted({y for y, _ in periods}),
+        "quarters": QUARTERS[:min(n_quarters, 4)],
+        "periods": len(periods),
+        "breaches": breaches
+    }
+
+# Run from the repository root:
+# python -m app.utils.generate_synthetic_fund [root] [n_clients] [n_quarters] [n_rules] [n_ratios] [breach_rate] [seed]
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "tests/scenarios/Fund_synthetic"
+    args = [int(a) for a in sys.argv[2:6]] + [float(a) for a in sys.argv[6:7]] + [int(a) for a in sys.argv[7:8]]
+    summary = generate_fund(root, *args)
+    print(f"Fund '{root}' generated: {len(summary['clients'])} clients, {summary['periods']} quarters, "
+          f"{summary['breaches']} breached periods.")
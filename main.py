@@ -1,6 +1,8 @@
+import logging
+from app.core import instrumentation
 from app.core.portfolio import create_portfolio
 from app.core.report import generate_portfolio_report, generate_matrix_report
-from app.core.postprocessing import calculate_stress_matrix
+from app.core.postprocessing import calculate_stress_matrix, calculate_headroom
 
 def main(clients,
         years,
@@ -11,26 +13,58 @@ def main(clients,
         q_stress,
         stress_config,
         steps_x_refined,
-        steps_y_refined):
+        steps_y_refined,
+        refinement="uniform",
+        metrics_path=None,
+        metrics_format="json",
+        time_budget=None):
 
-    portfolio = create_portfolio(clients, years, quarters, root_path)
+    assert refinement in ["uniform", "exact", "adaptive"], "REFINEMENT_INVALID"
+    assert metrics_format in ["json", "prometheus"], "METRICS_FORMAT_INVALID"
+
+    instrumentation.reset()
+
+    portfolio = create_portfolio(clients, years, quarters, root_path, cache=True, time_budget=time_budget)
     generate_portfolio_report(portfolio, analysis_config, f"{root_path}/portfolio_executive_summary.pdf")
 
-    matrix_results = calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config)
+    if refinement == "adaptive":
+
+        # One pass: the coarse grid for the report plus the fine lattice around the boundary for the headroom.
+        matrix_results = calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config, mode="adaptive",
+                                                 steps_x_refined=steps_x_refined, steps_y_refined=steps_y_refined)
+
+    else:
+
+        matrix_results = calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config)
+
+    if refinement == "exact":
 
-    stress_config["var_x"]["steps"] = steps_x_refined
-    stress_config["var_y"]["steps"] = steps_y_refined
-    
-    matrix_results_refined = calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config)
+        headroom_results = calculate_headroom(portfolio, clients, y_stress, q_stress, stress_config)
 
-    for client in matrix_results_refined:
+        for client in headroom_results:
 
-        matrix_results[client]["headroom_x"] = matrix_results_refined[client]["headroom_x"]
-        matrix_results[client]["headroom_y"] = matrix_results_refined[client]["headroom_y"]
+            matrix_results[client]["headroom_x"] = f"{headroom_results[client]['headroom_x']:.1f}%"
+            matrix_results[client]["headroom_y"] = f"{headroom_results[client]['headroom_y']:.1f}%"
+
+    elif refinement == "uniform":
+
+        stress_config["var_x"]["steps"] = steps_x_refined
+        stress_config["var_y"]["steps"] = steps_y_refined
+        
+        matrix_results_refined = calculate_stress_matrix(portfolio, clients, y_stress, q_stress, stress_config)
+
+        for client in matrix_results_refined:
+
+            matrix_results[client]["headroom_x"] = matrix_results_refined[client]["headroom_x"]
+            matrix_results[client]["headroom_y"] = matrix_results_refined[client]["headroom_y"]
         
     generate_matrix_report(matrix_results, y_stress, q_stress, f"{root_path}/portfolio_sensitivity_matrix_{y_stress}_{q_stress}.pdf")
 
+    if metrics_path is not None:
+        instrumentation.write(metrics_path, metrics_format)
+
     return matrix_results
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import copy
+import json
+import pytest
+from z3 import Solver, Not, unsat
+from app.core import instrumentation
+from app.core.artifact import ARTIFACT_FILENAME, from_artifact, is_current, read_artifact, write_artifact
+from app.core.z3engine import ENGINE_VERSION, build_artifact, clear_contract_cache, compile_logics, contract_key, verify_logics
+from app.core.portfolio import create_portfolio
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+@pytest.fixture
+def scenario():
+    clear_contract_cache()
+    yield load_json("tests/scenarios/logics_complex.json")
+    clear_contract_cache()
+
+def test_build_artifact_layout(scenario):
+    artifact = build_artifact(scenario)
+
+    assert artifact["contract_key"] == contract_key(scenario)
+    assert artifact["variables"] == [v["name"] for v in scenario["variables"]]
+    assert artifact["rules"] == [{"id": r["id"], "label": f"RULE_{r['id']}"} for r in scenario["logical_conditions"]]
+    assert artifact["smt2"].count("(assert ") == len(scenario["logical_conditions"])
+    assert is_current(artifact, contract_key(scenario), ENGINE_VERSION)
+    assert not is_current(artifact, contract_key(scenario), "other")
+
+def prove(claim):
+    s = Solver(ctx=claim.ctx)
+    s.add(Not(claim))
+    return s.check() == unsat
+
+def test_from_artifact_roundtrip(scenario, tmp_path):
+    path = tmp_path / ARTIFACT_FILENAME
+    write_artifact(path, build_artifact(scenario))
+    compiled = compile_logics(scenario)
+
+    vars, formulas, programs = from_artifact(read_artifact(path), compiled.ctx)
+
+    assert list(vars) == list(compiled.vars)
+    assert programs == compiled.programs
+    for formula, expected in zip(formulas, compiled.formulas):
+        assert prove(formula == expected)
+
+def test_read_artifact_missing(tmp_path):
+    assert read_artifact(tmp_path / ARTIFACT_FILENAME) is None
+
+@pytest.mark.parametrize("level", ["verdict", "core", "full"])
+@pytest.mark.parametrize("filename_cfo", ["cfo_data_complex.json", "cfo_data_complex_fail.json"])
+def test_verify_logics_artifact_matches_source(scenario, level, filename_cfo):
+    cfo_data = load_json(f"tests/scenarios/{filename_cfo}")
+    artifact = json.loads(json.dumps(build_artifact(scenario)))
+    expected = verify_logics(scenario, cfo_data, quiet=True, level=level)
+
+    clear_contract_cache()
+    instrumentation.reset()
+    result = verify_logics(scenario, cfo_data, quiet=True, level=level, artifact=artifact)
+
+    for key in ["status", "is_compliant", "calculated_values", "missing", "norm_metric"]:
+        assert result[key] == expected[key]
+    for key in ["conflict_variables", "conflict_rules"]:
+        assert set(result[key]) == set(expected[key])
+
+    data = instrumentation.snapshot()
+    assert data["counters"]["artifact.loaded"] == 1
+    assert "compile.parse" not in data["stages"]
+
+def test_verify_logics_stale_artifact_is_ignored(scenario):
+    artifact = build_artifact(scenario)
+    edited = copy.deepcopy(scenario)
+    edited["logical_conditions"][0]["formula"] = "purchase_money_indebtedness <= 1"
+
+    clear_contract_cache()
+    instrumentation.reset()
+    compiled = compile_logics(edited, artifact)
+
+    assert str(compiled.formulas[0]) == "purchase_money_indebtedness <= 1"
+    assert instrumentation.snapshot()["counters"]["artifact.stale"] == 1
+
+def test_create_portfolio_loads_artifacts(tmp_path):
+    for q in ["Q1", "Q2"]:
+        folder = tmp_path / "TechCorp" / f"2024_{q}"
+        folder.mkdir(parents=True)
+        source = f"tests/scenarios/Fund_01/TechCorp/2024_{q}"
+        (folder / "logics.json").write_text(open(f"{source}/logics.json").read())
+        cfo_data = load_json(f"{source}/cfo_data.json")
+        (folder / "cfo_data.json").write_text(json.dumps({k: float(v) for k, v in cfo_data.items()}))
+        write_artifact(folder / ARTIFACT_FILENAME, build_artifact(load_json(f"{source}/logics.json")))
+
+    expected = create_portfolio(["TechCorp"], ["2024"], ["Q1", "Q2"], root_path=str(tmp_path))
+
+    clear_contract_cache()
+    instrumentation.reset()
+    portfolio = create_portfolio(["TechCorp"], ["2024"], ["Q1", "Q2"], root_path=str(tmp_path))
+
+    assert instrumentation.snapshot()["counters"]["artifact.loaded"] >= 1
+    for q in ["Q1", "Q2"]:
+        result = portfolio["TechCorp"].history["2024"][q]["z3_result"]
+        assert result["is_compliant"] == expected["TechCorp"].history["2024"][q]["z3_result"]["is_compliant"]
@@ -0,0 +1,16 @@
+from app.utils.benchmark_suite import QUICK_SIZES, benchmark_size
+
+def test_benchmark_size_quick():
+    size = QUICK_SIZES[0]
+
+    result = benchmark_size(size)
+
+    assert result["size"] == size
+    assert result["periods"] == size["n_clients"] * size["n_quarters"]
+    assert result["breaches"] >= 0
+    assert set(result["seconds"]) == {"verify_logics", "verify_logics_solver", "verify_logics_solver_plain",
+                                      "create_portfolio", "calculate_stress_matrix", "calculate_stress_matrix_vectorized",
+                                      "generate_portfolio_report", "generate_matrix_report"}
+    assert all(seconds > 0 for seconds in result["seconds"].values())
+    assert result["solver_classes"]
+    assert result["periods_per_second"]["verify_logics"] > 0
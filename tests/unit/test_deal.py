@@ -1,3 +1,4 @@
+import pickle
 import pytest
 from app.core.deal import Deal
 
@@ -98,4 +99,54 @@ def test_deal_inputs(id, y, q, logics, cfo_data, expected_msg):
     with pytest.raises(AssertionError) as exc:
         deal = Deal(id)
         deal.process_logics_and_cfo_data(y, q, logics, cfo_data)
-    assert str(exc.value) == expected_msg
\ No newline at end of file
+    assert str(exc.value) == expected_msg
+
+def build_logics(client_id, year, quarter):
+    return {
+        "audit_id": f"{client_id}_{year}_{quarter}",
+        "contract_name": "History Test",
+        "variables": [{"name": "ebitda", "definition": "EBITDA", "definition_page": 1},
+                      {"name": "debt", "definition": "Debt", "definition_page": 1},
+                      {"name": "leverage", "definition": "Leverage", "definition_page": 1}],
+        "logical_conditions": [{"id": 1, "formula": "leverage == debt / ebitda", "evidence": "Def", "evidence_page": 1},
+                               {"id": 2, "formula": "leverage <= 3", "evidence": "Max", "evidence_page": 1}]
+    }
+
+def test_deal_history_periods():
+    deal = Deal(VALID_ID)
+    deal.process_logics_and_cfo_data("2025", "Q3", build_logics(VALID_ID, "2025", "Q3"), {"ebitda": 10.0, "debt": 20.0})
+    deal.process_logics_and_cfo_data("2024", "Q2", build_logics(VALID_ID, "2024", "Q2"), {"ebitda": 10.0, "debt": 40.0})
+    deal.process_logics_and_cfo_data("2025", "Q1", build_logics(VALID_ID, "2025", "Q1"), {"ebitda": 10.0, "debt": 30.0})
+
+    assert list(deal.history.keys()) == ["2025", "2024"]
+    assert len(deal.history) == 2
+    assert "2024" in deal.history and "2026" not in deal.history
+    assert deal.history.get("2026") is None
+    with pytest.raises(KeyError):
+        deal.history["2026"]
+
+    assert list(deal.history["2025"].keys()) == ["Q1", "Q2", "Q3", "Q4"]
+    assert "Q4" in deal.history["2025"]
+    assert deal.history["2025"]["Q2"] is None
+    assert deal.history["2025"].get("Q4") is None
+    assert deal.history["2025"]["Q3"]["z3_result"]["is_compliant"] == True
+    assert deal.history["2024"]["Q2"]["z3_result"]["is_compliant"] == False
+
+    assert [(y, q) for y, q, _ in deal.history.periods()] == [("2024", "Q2"), ("2025", "Q1"), ("2025", "Q3")]
+
+def test_deal_history_drops_model():
+    deal = Deal(VALID_ID)
+    logics = build_logics(VALID_ID, VALID_YEAR, VALID_QUARTER)
+    cfo_data = {"ebitda": 10.0, "debt": 20.0}
+
+    deal.process_logics_and_cfo_data(VALID_YEAR, VALID_QUARTER, logics, cfo_data)
+    result = deal.history[VALID_YEAR][VALID_QUARTER]["z3_result"]
+
+    assert result["model"] is None
+    assert result.get("calculated_values") == {"ebitda": 10.0, "debt": 20.0, "leverage": 2.0}
+    assert result.get("unknown_key", "default") == "default"
+    assert not hasattr(result, "__dict__")
+    assert pickle.loads(pickle.dumps(deal.history[VALID_YEAR][VALID_QUARTER])) == deal.history[VALID_YEAR][VALID_QUARTER]
+
+    deal.process_logics_and_cfo_data(VALID_YEAR, VALID_QUARTER, logics, {"ebitda": 10.0}, keep_model=True)
+    assert deal.history[VALID_YEAR][VALID_QUARTER]["z3_result"]["model"] is not None
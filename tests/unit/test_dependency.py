@@ -0,0 +1,177 @@
+import json
+import numpy as np
+import pytest
+from fractions import Fraction
+from z3 import RealVal
+from app.core import instrumentation
+from app.core.dependency import plan_evaluation, evaluate_plan, evaluate_plan_array, decimal_value, rule_components, slice_rules
+from app.core.z3engine import verify_logics, compile_logics, ContractSession, SlicedSession
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def make_logics(formulas, names):
+    return {
+        "audit_id": "ClientAlpha_2026_Q1",
+        "contract_name": "Dependency Test",
+        "variables": [{"name": n, "definition": "Test", "definition_page": 1} for n in names],
+        "logical_conditions": [{"id": i + 1, "formula": f, "evidence": "Test", "evidence_page": 1}
+                               for i, f in enumerate(formulas)]
+    }
+
+def test_plan_evaluation_topological_order():
+    logics = make_logics(["leverage == net_debt / ebitda",
+                          "ebitda == revenue - opex",
+                          "net_debt == debt - cash",
+                          "leverage <= 4.5"],
+                         ["revenue", "opex", "ebitda", "debt", "cash", "net_debt", "leverage"])
+    names = [v["name"] for v in logics["variables"]]
+
+    plan = plan_evaluation(compile_logics(logics).rules, names, {"revenue", "opex", "debt", "cash"})
+
+    order = [name for name, _ in plan["order"]]
+    assert order.index("leverage") > order.index("ebitda")
+    assert order.index("leverage") > order.index("net_debt")
+    assert [rule["id"] for rule in plan["checks"]] == [4]
+
+    env, conflict_rules = evaluate_plan(plan, {"revenue": 800.0, "opex": 560.0, "debt": 1200.0, "cash": 250.0})
+    assert env["leverage"] == Fraction(950, 240)
+    assert conflict_rules == []
+
+@pytest.mark.parametrize("formulas, known", [
+    (["x == y + 1", "y == x - 1"], set()),
+    (["x <= 10", "y == x * 2"], set()),
+    (["x == y + 1"], {"x"}),
+])
+def test_plan_evaluation_not_determined(formulas, known):
+    logics = make_logics(formulas, ["x", "y"])
+    assert plan_evaluation(compile_logics(logics).rules, ["x", "y"], known) is None
+
+def test_plan_evaluation_overdetermined_definition_is_checked():
+    logics = make_logics(["z == x + y"], ["x", "y", "z"])
+    plan = plan_evaluation(compile_logics(logics).rules, ["x", "y", "z"], {"x", "y", "z"})
+
+    assert plan["order"] == []
+    assert evaluate_plan(plan, {"x": 1.0, "y": 2.0, "z": 3.0})[1] == []
+    assert evaluate_plan(plan, {"x": 1.0, "y": 2.0, "z": 4.0})[1] == [1]
+
+@pytest.mark.parametrize("value", ["1/3", "2/3", "-2/3", "5", "-5", "1234.567", "-0.005", "99.999", "3/2", "-1/10"])
+def test_decimal_value_matches_z3(value):
+    assert decimal_value(Fraction(value)) == float(RealVal(value).as_decimal(2).replace('?', ''))
+
+def test_verify_logics_fast_path_matches_solver():
+    scenarios = [
+        ("logics_simple.json", "cfo_data_simple.json"),
+        ("logics_complex.json", "cfo_data_complex.json"),
+        ("logics_complex.json", "cfo_data_complex_fail.json")
+    ]
+
+    for filename_logic, filename_cfo in scenarios:
+        logics = load_json(f"tests/scenarios/{filename_logic}")
+        cfo_data = load_json(f"tests/scenarios/{filename_cfo}")
+
+        fast = verify_logics(logics, cfo_data)
+        solver = verify_logics(logics, cfo_data, fast_path=False)
+
+        assert fast["is_compliant"] == solver["is_compliant"]
+        assert fast["calculated_values"] == solver["calculated_values"]
+        assert fast["norm_metric"] == solver["norm_metric"]
+        assert fast["missing"] == solver["missing"]
+        assert set(fast["conflict_rules"]) == set(solver["conflict_rules"])
+
+def test_verify_logics_fast_path_skips_solver():
+    logics = load_json("tests/scenarios/logics_simple.json")
+    cfo_data = load_json("tests/scenarios/cfo_data_simple.json")
+
+    compiled = compile_logics(logics)
+    assert compiled.evaluate(cfo_data) is not None
+
+    instrumentation.reset()
+    fast = verify_logics(logics, cfo_data)["model"]
+    assert instrumentation.snapshot()["counters"]["verify.fast_path"] == 1
+
+    solver = verify_logics(logics, cfo_data, fast_path=False)["model"]
+    for var in compiled.vars.values():
+        assert fast[var].as_fraction() == solver[var].as_fraction()
+
+def test_verify_logics_fast_path_huge_exact_value():
+    logics = make_logics(["y == revenue ** 700"], ["revenue", "y"])
+    cfo_data = {"revenue": 800000.5}
+
+    instrumentation.reset()
+    for level in ["verdict", "full"]:
+        fast = verify_logics(logics, cfo_data, level=level)
+        solver = verify_logics(logics, cfo_data, level=level, fast_path=False)
+        assert fast["status"] == solver["status"] == "SAT"
+        assert fast["calculated_values"] == solver["calculated_values"]
+
+    assert instrumentation.snapshot()["counters"]["verify.fast_path"] == 1
+    assert decimal_value(Fraction("800000.5") ** 700) == float("inf")
+
+def test_verify_logics_division_by_zero_falls_back():
+    logics = make_logics(["r == a / b", "r <= 2"], ["a", "b", "r"])
+
+    assert compile_logics(logics).evaluate({"a": 1.0, "b": 0.0}) is None
+    assert verify_logics(logics, {"a": 1.0, "b": 0.0})["is_compliant"] == True
+
+def test_evaluate_plan_array_flags_ties_and_zero_divisions():
+    logics = make_logics(["r == a / b", "r <= 2"], ["a", "b", "r"])
+    plan = plan_evaluation(compile_logics(logics).rules, ["a", "b", "r"], {"a", "b"})
+
+    a = np.array([1.0, 4.0, 6.0, 1.0])
+    b = np.array([1.0, 2.0, 2.0, 0.0])
+    env, verdicts, unsafe = evaluate_plan_array(plan, {"a": a, "b": b}, (4,))
+
+    assert env["r"][:3].tolist() == [1.0, 2.0, 3.0]
+    assert verdicts[2][:3].tolist() == [True, True, False]
+    assert unsafe.tolist() == [False, True, False, True]
+
+SLICE_FORMULAS = ["ebitda == revenue - opex",
+                  "net_debt == debt - cash",
+                  "leverage == net_debt / ebitda",
+                  "leverage <= 4.5",
+                  "cover == ebitda / interest",
+                  "cover >= 2",
+                  "cash >= 10",
+                  "reserve + cash >= 20"]
+SLICE_NAMES = ["revenue", "opex", "ebitda", "debt", "cash", "net_debt", "leverage", "interest", "cover", "reserve"]
+SLICE_DATA = {"revenue": 800.0, "opex": 560.0, "debt": 1200.0, "cash": 250.0, "interest": 40.0}
+
+def test_rule_components():
+    rules = compile_logics(make_logics(SLICE_FORMULAS, SLICE_NAMES)).rules
+
+    components = rule_components(rules, set(SLICE_DATA))
+
+    assert sorted(sorted(rule["id"] for rule in c) for c in components) == [[1, 2, 3, 4, 5, 6], [7], [8]]
+
+@pytest.mark.parametrize("query, expected, expected_rest", [
+    ({"interest"}, [1, 5, 6], [1, 2, 3, 4, 7, 8]),
+    ({"cash"}, [1, 2, 3, 4, 7, 8], [1, 5, 6]),
+    ({"revenue"}, [1, 2, 3, 4, 5, 6], [2, 7, 8]),
+])
+def test_slice_rules(query, expected, expected_rest):
+    compiled = compile_logics(make_logics(SLICE_FORMULAS, SLICE_NAMES))
+
+    assert compiled.slice(SLICE_DATA, query) == (expected, expected_rest)
+
+def test_slice_rules_without_definitions():
+    rules = compile_logics(make_logics(SLICE_FORMULAS, SLICE_NAMES)).rules
+
+    assert slice_rules(rules, set(SLICE_DATA), {"interest"}) == ([1, 2, 3, 4, 5, 6], [7, 8])
+
+@pytest.mark.parametrize("query, values", [
+    ({"interest"}, [40.0, 100.0, 150.0]),
+    ({"cash"}, [250.0, 5.0, 1000.0]),
+    ({"revenue"}, [800.0, 600.0, 560.0]),
+])
+def test_sliced_session_matches_contract_session(query, values):
+    logics = make_logics(SLICE_FORMULAS, SLICE_NAMES)
+    session = ContractSession(logics)
+    name = next(iter(query))
+
+    for base in [SLICE_DATA, {**SLICE_DATA, "debt": 5000.0}]:
+        sliced = SlicedSession(logics, base, query)
+        for value in values:
+            data = {**base, name: value}
+            assert sliced.check(data) == session.check(data)
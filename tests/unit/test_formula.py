@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from fractions import Fraction
+from z3 import Context, Real, Solver, simplify, sat
+from app.core.formula import compile_formula, formula_variables, lower_z3, lower_python, lower_numpy
+from app.core.z3engine import verify_logics
+
+NAMES = ["ebitda", "debt", "cash"]
+
+@pytest.mark.parametrize("formula, code", [
+    ("__import__('os').system('ls')", "FORMULA_FUNCTION_NOT_ALLOWED at 1:1"),
+    ("ebitda.__class__ == 1", "FORMULA_NODE_NOT_ALLOWED at 1:1"),
+    ("revenue > 0", "FORMULA_NAME_UNKNOWN at 1:1"),
+    ("debt > cash > 0", "FORMULA_CHAINED_COMPARISON at 1:1"),
+    ("debt // cash > 0", "FORMULA_OPERATOR_NOT_ALLOWED at 1:1"),
+    ("not debt", "FORMULA_OPERATOR_NOT_ALLOWED at 1:1"),
+    ("debt in [1, 2]", "FORMULA_OPERATOR_NOT_ALLOWED at 1:1"),
+    ("debt == 'high'", "FORMULA_CONSTANT_INVALID at 1:9"),
+    ("max(debt, cash, ebitda) > 0", "FORMULA_ARITY_INVALID at 1:1"),
+    ("If(debt > 0, cash, ebitda, 1) > 0", "FORMULA_ARITY_INVALID at 1:1"),
+    ("abs(x=debt) > 0", "FORMULA_KEYWORD_ARGUMENTS_NOT_ALLOWED at 1:1"),
+    ("debt > (lambda: 1)()", "FORMULA_FUNCTION_NOT_ALLOWED at 1:8"),
+    ("debt > [c for c in cash]", "FORMULA_NODE_NOT_ALLOWED at 1:8"),
+    ("debt > > 1", "FORMULA_SYNTAX_INVALID at 1:8"),
+])
+def test_compile_formula_rejects(formula, code):
+    with pytest.raises(AssertionError) as exc:
+        compile_formula(formula, NAMES)
+    assert str(exc.value) == code
+
+def test_verify_logics_rejects_code_injection():
+    logics = {
+        "audit_id": "ClientAlpha_2026_Q1",
+        "contract_name": "Injection",
+        "variables": [{"name": "x", "definition": "Test", "definition_page": 1}],
+        "logical_conditions": [{"id": 1, "formula": "__import__('os').getcwd() == x",
+                                "evidence": "Test", "evidence_page": 1}]
+    }
+    with pytest.raises(AssertionError) as exc:
+        verify_logics(logics, {"x": 1.0})
+    assert str(exc.value) == "FORMULA_FUNCTION_NOT_ALLOWED at 1:1"
+
+@pytest.mark.parametrize("formula", [
+    "y == revenue - abs(-5)",
+    "revenue >= max(100, 200)",
+    "And(revenue >= 0, y >= min(1, 2))",
+    "y <= If(1 > 2, 3, 4) * revenue",
+])
+def test_verify_logics_constant_helper_arguments(formula):
+    logics = {
+        "audit_id": "ClientAlpha_2026_Q1",
+        "contract_name": "Constant Helpers",
+        "variables": [{"name": n, "definition": "Test", "definition_page": 1} for n in ["revenue", "y"]],
+        "logical_conditions": [{"id": 1, "formula": formula, "evidence": "Test", "evidence_page": 1}]
+    }
+    for fast_path in [True, False]:
+        assert verify_logics(logics, {"revenue": 500.0, "y": 495.0}, fast_path=fast_path)["status"] == "SAT"
+
+def test_formula_variables():
+    program = compile_formula("If(debt > 0, (debt - cash) / ebitda, 0) <= 4.5", NAMES)
+    assert formula_variables(program) == {"debt", "cash", "ebitda"}
+
+@pytest.mark.parametrize("formula", [
+    "(debt - cash) / ebitda <= 3.5",
+    "abs(cash - debt) >= 100",
+    "max(debt, cash) == min(ebitda * 2, debt)",
+    "And(debt > 0, Or(cash < 0, -ebitda <= +cash))",
+    "If(debt > cash, ebitda ** 2, 1 / 4 * ebitda) > 10",
+    "debt != cash",
+])
+def test_lowerings_agree(formula):
+    env = {"ebitda": 240.0, "debt": 1200.0, "cash": 250.0}
+    program = compile_formula(formula, NAMES)
+
+    ctx = Context()
+    vars = {n: Real(n, ctx) for n in NAMES}
+    s = Solver(ctx=ctx)
+    s.add(lower_z3(program, vars, ctx))
+    for n, v in env.items():
+        s.add(vars[n] == v)
+    expected = s.check() == sat
+
+    assert lower_python(program, {n: Fraction(str(v)) for n, v in env.items()}) == expected
+
+    arrays = {n: np.array([v, v]) for n, v in env.items()}
+    unsafe = np.zeros(2, dtype=bool)
+    assert lower_numpy(program, arrays, unsafe).tolist() == [expected, expected]
+
+def test_lower_z3_matches_eval():
+    ctx = Context()
+    vars = {n: Real(n, ctx) for n in NAMES}
+    program = compile_formula("debt / ebitda <= 2 * 1.5", NAMES)
+    assert simplify(lower_z3(program, vars, ctx)).eq(simplify(vars["debt"] / vars["ebitda"] <= 3.0))
@@ -0,0 +1,52 @@
+import json
+import pytest
+from app.core.z3engine import verify_logics
+from app.utils.generate_synthetic_fund import generate_fund
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def count_breaches(root_path, summary):
+    breaches = 0
+    for client_id in summary["clients"]:
+        for folder in (root_path / client_id).iterdir():
+            cfo_data = {k: float(v) for k, v in load_json(folder / "cfo_data.json").items()}
+            result = verify_logics(load_json(folder / "logics.json"), cfo_data, quiet=True, level="verdict")
+            breaches += not result["is_compliant"]
+    return breaches
+
+@pytest.mark.parametrize("kwargs", [
+    {"n_clients": 3, "n_quarters": 8, "n_rules": 4, "n_ratios": 1, "breach_rate": 0.2, "seed": 1},
+    {"n_clients": 2, "n_quarters": 48, "n_rules": 10, "n_ratios": 3, "breach_rate": 0.1, "seed": 2},
+    {"n_clients": 2, "n_quarters": 48, "n_rules": 6, "n_ratios": 2, "breach_rate": 0.0, "seed": 3},
+])
+def test_generate_fund_breaches_match_verification(tmp_path, kwargs):
+    summary = generate_fund(tmp_path, **kwargs)
+
+    assert summary["periods"] == kwargs["n_quarters"]
+    assert count_breaches(tmp_path, summary) == summary["breaches"]
+    assert (summary["breaches"] > 0) == (kwargs["breach_rate"] > 0)
+
+def test_generate_fund_reproducible(tmp_path):
+    first = generate_fund(tmp_path / "a", seed=5)
+    second = generate_fund(tmp_path / "b", seed=5)
+
+    assert first == second
+    for client_id in first["clients"]:
+        for folder in (tmp_path / "a" / client_id).iterdir():
+            other = tmp_path / "b" / client_id / folder.name
+            assert load_json(folder / "cfo_data.json") == load_json(other / "cfo_data.json")
+            assert load_json(folder / "logics.json") == load_json(other / "logics.json")
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"n_clients": 0}, "CLIENTS_BELOW_ONE"),
+    ({"n_rules": 0}, "RULES_BELOW_ONE"),
+    ({"n_ratios": -1}, "RATIOS_BELOW_ZERO"),
+    ({"breach_rate": 1.5}, "BREACH_RATE_INVALID"),
+    ({"n_quarters": 6}, "QUARTERS_NOT_FULL_YEARS"),
+])
+def test_generate_fund_invalid(tmp_path, kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        generate_fund(tmp_path, **kwargs)
+    assert str(exc.value) == expected_msg
@@ -0,0 +1,68 @@
+import json
+import pytest
+from app.core import instrumentation
+from app.core.z3engine import verify_logics, ContractSession
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    instrumentation.reset()
+    yield
+    instrumentation.reset()
+
+def test_verify_logics_counters():
+    logics = load_json("tests/scenarios/logics_complex.json")
+
+    verify_logics(logics, load_json("tests/scenarios/cfo_data_complex.json"), fast_path=False)
+    verify_logics(logics, load_json("tests/scenarios/cfo_data_complex_fail.json"))
+    ContractSession(logics).check(load_json("tests/scenarios/cfo_data_complex.json"))
+
+    data = instrumentation.snapshot()
+
+    assert data["counters"]["verify.calls"] == 2
+    assert data["counters"]["verify.sat"] == 1
+    assert data["counters"]["verify.unsat"] == 1
+    assert data["counters"]["solver.checks"] == 3
+    assert data["ratios"]["verify_sat_ratio"] == 0.5
+    assert data["ratios"]["solver_sat_ratio"] == pytest.approx(2 / 3)
+    for name in ["verify.evaluate", "verify.solve", "verify.model"]:
+        assert data["stages"][name]["calls"] == 2
+        assert data["stages"][name]["wall_seconds"] >= 0
+        assert data["stages"][name]["cpu_seconds"] >= 0
+
+def test_slowest_periods_and_merge(monkeypatch):
+    monkeypatch.setattr(instrumentation, "SLOWEST_PERIODS", 2)
+
+    for label, seconds in [("A_2024_Q1", 0.3), ("A_2024_Q2", 0.1), ("A_2024_Q3", 0.5)]:
+        instrumentation.record_period(label, seconds)
+    with instrumentation.stage("test.stage"):
+        instrumentation.count("test.events", 2)
+
+    worker = instrumentation.snapshot()
+    instrumentation.merge(worker)
+    data = instrumentation.snapshot()
+
+    assert [p["period"] for p in data["slowest_periods"]] == ["A_2024_Q3", "A_2024_Q3"]
+    assert data["counters"]["test.events"] == 4
+    assert data["stages"]["test.stage"]["calls"] == 2
+
+def test_write_formats(tmp_path):
+    instrumentation.count("solver.sat")
+    instrumentation.add_time("verify.solve", 0.25, 0.2)
+    instrumentation.record_period("A_2024_Q1", 0.25)
+
+    instrumentation.write(tmp_path / "metrics.json")
+    assert json.loads((tmp_path / "metrics.json").read_text())["counters"] == {"solver.sat": 1}
+
+    instrumentation.write(tmp_path / "metrics.prom", "prometheus")
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'covenant_check_stage_wall_seconds_total{stage="verify.solve"} 0.25' in text
+    assert 'covenant_check_events_total{event="solver.sat"} 1' in text
+    assert 'covenant_check_slowest_period_seconds{period="A_2024_Q1"} 0.25' in text
+
+    with pytest.raises(AssertionError) as exc:
+        instrumentation.write(tmp_path / "metrics.txt", "csv")
+    assert str(exc.value) == "METRICS_FORMAT_INVALID"
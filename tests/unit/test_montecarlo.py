@@ -0,0 +1,142 @@
+import pytest, copy, json
+import numpy as np
+from app.core import montecarlo
+from app.core.deal import Deal
+from app.core.formula import NotDetermined
+from statistics import NormalDist
+from app.core.montecarlo import simulate_breach_probability, shock_multipliers, cholesky_factor, normal_cdf, wilson_interval
+from app.core.z3engine import verify_logics
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def build_portfolio():
+    portfolio = {}
+    for client_id, debt in [("ClientAlpha", 30000000.0), ("ClientBeta", 36000000.0)]:
+        deal = Deal(client_id)
+        cfo_data = {**load_json("tests/scenarios/cfo_data_simple.json"), "consolidated_funded_indebtedness": debt}
+        deal.process_logics_and_cfo_data("2026", "Q1", load_json("tests/scenarios/logics_simple.json"), cfo_data)
+        portfolio[client_id] = deal
+    return portfolio
+
+SHOCK_CONFIG = {
+    "shocks": [
+        {"name": "consolidated_net_income", "distribution": "normal", "mean": -0.1, "std": 0.25},
+        {"name": "consolidated_funded_indebtedness", "distribution": "lognormal", "mean": 0.1, "std": 0.2},
+        {"name": "unrestricted_cash", "distribution": "uniform", "low": -0.5, "high": 0.2}
+    ],
+    "correlation": [[1.0, -0.5, 0.3], [-0.5, 1.0, -0.2], [0.3, -0.2, 1.0]]
+}
+
+def test_shock_multipliers_correlated():
+    factor = cholesky_factor(SHOCK_CONFIG)
+    multipliers = shock_multipliers(SHOCK_CONFIG["shocks"], factor, np.random.default_rng(0), 20000)
+
+    income = multipliers["consolidated_net_income"]
+    assert np.mean(income) == pytest.approx(0.9, abs=0.01)
+    assert np.std(income) == pytest.approx(0.25, abs=0.01)
+    assert np.corrcoef(income, multipliers["consolidated_funded_indebtedness"])[0, 1] == pytest.approx(-0.5, abs=0.03)
+    assert multipliers["unrestricted_cash"].min() >= 0.5 and multipliers["unrestricted_cash"].max() <= 1.2
+
+def test_normal_cdf():
+    z = np.linspace(-6.0, 6.0, 241)
+    assert np.max(np.abs(normal_cdf(z) - np.array([NormalDist().cdf(v) for v in z]))) < 1e-7
+
+def test_wilson_interval():
+    assert wilson_interval(0, 100, 1.96)[0] == 0.0
+    low, high = wilson_interval(50, 100, 1.96)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+
+def test_simulate_breach_probability_matches_solver():
+    portfolio = build_portfolio()
+
+    results = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, draws=300, seed=3)
+
+    # One chunk: replay its draws through the full verification.
+    seed = np.random.SeedSequence(3).spawn(1)[0]
+    multipliers = shock_multipliers(SHOCK_CONFIG["shocks"], cholesky_factor(SHOCK_CONFIG), np.random.default_rng(seed), 300)
+
+    for c in portfolio:
+        entry = portfolio[c].history["2026"]["Q1"]
+        breaches = 0
+        for k in range(300):
+            test_data = entry["cfo_data"].copy()
+            for name, multiplier in multipliers.items():
+                test_data[name] *= multiplier[k]
+            breaches += not verify_logics(entry["logics"], test_data, quiet=True, level="verdict")["is_compliant"]
+
+        result = results[c]
+        assert result["breaches"] == breaches
+        assert result["breach_probability"] == breaches / 300
+        assert result["confidence_interval"][0] <= result["breach_probability"] <= result["confidence_interval"][1]
+        assert result["rules"]["5"]["breaches"] == breaches
+        assert result["rules"]["1"]["breaches"] == 0
+
+    assert 0 < results["ClientAlpha"]["breach_probability"] < results["ClientBeta"]["breach_probability"]
+
+def test_simulate_breach_probability_solver_fallback(monkeypatch):
+    portfolio = build_portfolio()
+    expected = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, draws=200)
+
+    def not_determined(*args):
+        raise NotDetermined()
+
+    monkeypatch.setattr(montecarlo, "evaluate_plan_array", not_determined)
+    result = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, draws=200)
+
+    for c in portfolio:
+        assert result[c]["solved_draws"] == 200
+        assert result[c]["breaches"] == expected[c]["breaches"]
+        assert result[c]["rules"] == expected[c]["rules"]
+    assert result["ClientBeta"]["breaches"] > 0
+
+def test_simulate_breach_probability_reproducible():
+    portfolio = build_portfolio()
+    kwargs = {"draws": 5000, "seed": 11}
+
+    first = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, **kwargs)
+    second = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, **kwargs)
+    other = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, draws=5000, seed=12)
+
+    calls = []
+    parallel = simulate_breach_probability(portfolio, list(portfolio), "2026", "Q1", SHOCK_CONFIG, workers=2,
+                                           progress=lambda done, total: calls.append((done, total)), **kwargs)
+
+    assert second == first
+    assert parallel == first
+    assert other != first
+    assert calls[-1] == (4, 4)
+
+@pytest.mark.parametrize("patch, expected_msg", [
+    ({"shocks": []}, "SHOCKS_IMPOSSIBLE_COUNT"),
+    ({"shocks": [{"name": "unrestricted_cash", "distribution": "beta"}]}, "DISTRIBUTION_INVALID_IN_shock_0"),
+    ({"shocks": [{"name": "unrestricted_cash", "distribution": "normal", "mean": 0.0}]}, "STD_MISSING_IN_shock_0"),
+    ({"shocks": [{"name": "unrestricted_cash", "distribution": "normal", "mean": 0.0, "std": -0.1}]}, "STD_NEGATIVE_IN_shock_0"),
+    ({"shocks": [{"name": "unrestricted_cash", "distribution": "uniform", "low": 0.1, "high": 0.1}]}, "RANGE_EMPTY_IN_shock_0"),
+    ({"shocks": SHOCK_CONFIG["shocks"][:1] * 2, "correlation": [[1.0, 0.0], [0.0, 1.0]]}, "SHOCKS_DUPLICATED"),
+    ({"correlation": [[1.0, 0.0], [0.0, 1.0]]}, "CORRELATION_SHAPE_INVALID"),
+    ({"correlation": [[1.0, 0.5, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]}, "CORRELATION_NOT_SYMMETRIC"),
+    ({"correlation": [[1.0, 0.9, -0.9], [0.9, 1.0, 0.9], [-0.9, 0.9, 1.0]]}, "CORRELATION_NOT_POSITIVE_DEFINITE"),
+    ({"shocks": [{"name": "revenue", "distribution": "normal", "mean": 0.0, "std": 0.1}], "correlation": [[1.0]]},
+     "SHOCK_VARIABLE_NOT_IN_CFO_DATA"),
+])
+def test_simulate_breach_probability_config_invalid(patch, expected_msg):
+    config = {**copy.deepcopy(SHOCK_CONFIG), **patch}
+    with pytest.raises(AssertionError) as exc:
+        simulate_breach_probability(build_portfolio(), ["ClientAlpha"], "2026", "Q1", config, draws=10)
+    assert str(exc.value) == expected_msg
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"draws": 0}, "DRAWS_IMPOSSIBLE_VALUE"),
+    ({"draws": 10.0}, "DRAWS_NOT_INT"),
+    ({"seed": None}, "SEED_NOT_INT"),
+    ({"confidence": 1.0}, "CONFIDENCE_IMPOSSIBLE_VALUE"),
+    ({"workers": 0}, "WORKERS_BELOW_ONE"),
+    ({"progress": "log"}, "PROGRESS_NOT_CALLABLE"),
+])
+def test_simulate_breach_probability_arguments_invalid(kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        simulate_breach_probability(build_portfolio(), ["ClientAlpha"], "2026", "Q1", SHOCK_CONFIG, **kwargs)
+    assert str(exc.value) == expected_msg
@@ -1,6 +1,10 @@
 import json
+import time
+from pathlib import Path
 import pytest
+from app.core import instrumentation
 from app.core.portfolio import create_portfolio
+from app.core.manifest import ReportManifest
 
 VALID_CLIENTS = ["Netflix"]
 VALID_YEARS = ["2026"]
@@ -107,4 +111,216 @@ def test_portfolio_indexing():
                 assert isinstance(entry["cfo_data"]["revenue"], (float))
                 assert "is_compliant" in entry["z3_result"]
                 assert isinstance(entry["z3_result"]["is_compliant"], bool)
-                assert "definition" in entry["logics"]["variables"][0]
\ No newline at end of file
+                assert "definition" in entry["logics"]["variables"][0]
+
+def copy_fund(src, dst, clients, years, quarters):
+    for client_id in clients:
+        for y in years:
+            for q in quarters:
+                period_folder = dst / client_id / f"{y}_{q}"
+                period_folder.mkdir(parents=True)
+                source = Path(src) / client_id / f"{y}_{q}"
+                (period_folder / "logics.json").write_text((source / "logics.json").read_text())
+                cfo_data = json.loads((source / "cfo_data.json").read_text())
+                (period_folder / "cfo_data.json").write_text(json.dumps({k: float(v) for k, v in cfo_data.items()}))
+
+def test_create_portfolio_workers_match_sequential(tmp_path):
+    clients = ["TechCorp", "HealthCorp"]
+    years = ["2024"]
+    quarters = ["Q1", "Q2", "Q3"]
+    copy_fund("tests/scenarios/Fund_01", tmp_path, clients, years, quarters)
+
+    sequential = create_portfolio(clients, years, quarters, root_path=str(tmp_path))
+    parallel = create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=2)
+
+    assert list(parallel.keys()) == clients
+    for client_id in clients:
+        assert list(parallel[client_id].history.keys()) == years
+        for q in ["Q1", "Q2", "Q3", "Q4"]:
+            expected = sequential[client_id].history["2024"][q]
+            entry = parallel[client_id].history["2024"][q]
+            if expected is None:
+                assert entry is None
+                continue
+            assert entry["logics"] == expected["logics"]
+            assert entry["cfo_data"] == expected["cfo_data"]
+            assert entry["z3_result"]["model"] is None
+            for key in ["status", "is_compliant", "calculated_values", "missing", "norm_metric"]:
+                assert entry["z3_result"][key] == expected["z3_result"][key]
+            for key in ["conflict_variables", "conflict_rules"]:
+                assert set(entry["z3_result"][key]) == set(expected["z3_result"][key])
+        assert (tmp_path / client_id / "2024_Q3" / "report_final_2024_Q3.pdf").exists()
+
+@pytest.mark.parametrize("workers, expected_msg", [
+    ("2", "WORKERS_NOT_AN_INT"),
+    (0, "WORKERS_BELOW_ONE"),
+])
+def test_create_portfolio_workers_invalid(workers, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        create_portfolio(VALID_CLIENTS, VALID_YEARS, VALID_QUARTERS, VALID_PATH, workers=workers)
+    assert str(exc.value) == expected_msg
+
+def cache_stats(caplog):
+    message = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Verification cache")][-1]
+    hits, misses = message.split(": ")[1].rstrip(".").split(", ")
+    return int(hits.split()[0]), int(misses.split()[0])
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_create_portfolio_cache_solves_only_changed_periods(tmp_path, caplog, workers):
+    clients = ["TechCorp"]
+    years = ["2024"]
+    quarters = ["Q1", "Q2", "Q3"]
+    copy_fund("tests/scenarios/Fund_01", tmp_path, clients, years, quarters)
+    caplog.set_level("INFO", logger="app.core.portfolio")
+
+    first = create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers, cache=True)
+    assert cache_stats(caplog) == (0, 3)
+    assert (tmp_path / ".verification_cache.sqlite").exists()
+
+    second = create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers, cache=True)
+    assert cache_stats(caplog) == (3, 0)
+    for q in quarters:
+        cached = second["TechCorp"].history["2024"][q]["z3_result"]
+        solved = first["TechCorp"].history["2024"][q]["z3_result"]
+        assert cached["model"] is None
+        assert {k: v for k, v in cached.items() if k != "model"} == {k: v for k, v in solved.items() if k != "model"}
+
+    path_cfo_data = tmp_path / "TechCorp" / "2024_Q2" / "cfo_data.json"
+    cfo_data = json.loads(path_cfo_data.read_text())
+    cfo_data["revenue"] = cfo_data["revenue"] * 0.5
+    path_cfo_data.write_text(json.dumps(cfo_data))
+
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers, cache=True)
+    assert cache_stats(caplog) == (2, 1)
+
+def test_create_portfolio_cache_invalid():
+    with pytest.raises(AssertionError) as exc:
+        create_portfolio(VALID_CLIENTS, VALID_YEARS, VALID_QUARTERS, VALID_PATH, cache="yes")
+    assert str(exc.value) == "CACHE_NOT_A_BOOL"
+
+def report_stats(caplog):
+    message = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Reports")][-1]
+    rendered, skipped = message.split(": ")[1].rstrip(".").split(", ")
+    return int(rendered.split()[0]), int(skipped.split()[0])
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_create_portfolio_skips_unchanged_reports(tmp_path, caplog, workers):
+    clients = ["TechCorp"]
+    years = ["2024"]
+    quarters = ["Q1", "Q2"]
+    copy_fund("tests/scenarios/Fund_01", tmp_path, clients, years, quarters)
+    caplog.set_level("INFO", logger="app.core.portfolio")
+
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers)
+    assert report_stats(caplog) == (4, 0)
+    manifest = json.loads((tmp_path / "report_manifest.json").read_text())
+    assert sorted(manifest) == ["TechCorp/2024_Q1/report_final_2024_Q1.pdf", "TechCorp/2024_Q1/report_initial_2024_Q1.pdf",
+                                "TechCorp/2024_Q2/report_final_2024_Q2.pdf", "TechCorp/2024_Q2/report_initial_2024_Q2.pdf"]
+
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers)
+    assert report_stats(caplog) == (0, 4)
+
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers, force=True)
+    assert report_stats(caplog) == (4, 0)
+
+    path_cfo_data = tmp_path / "TechCorp" / "2024_Q2" / "cfo_data.json"
+    cfo_data = json.loads(path_cfo_data.read_text())
+    cfo_data["revenue"] = cfo_data["revenue"] * 0.5
+    path_cfo_data.write_text(json.dumps(cfo_data))
+    (tmp_path / "TechCorp" / "2024_Q1" / "report_initial_2024_Q1.pdf").unlink()
+
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers)
+    assert report_stats(caplog) == (2, 2)
+    assert (tmp_path / "TechCorp" / "2024_Q1" / "report_initial_2024_Q1.pdf").exists()
+
+def test_report_manifest_by_directory(tmp_path):
+    entries = {"TechCorp/2024_Q1/report_final_2024_Q1.pdf": "a", "TechCorp/2024_Q1/report_initial_2024_Q1.pdf": "b",
+               "TechCorp/2024_Q2/report_final_2024_Q2.pdf": "c"}
+    groups = ReportManifest(str(tmp_path), entries=entries).by_directory()
+
+    assert groups == {"TechCorp/2024_Q1": {k: entries[k] for k in list(entries)[:2]},
+                      "TechCorp/2024_Q2": {"TechCorp/2024_Q2/report_final_2024_Q2.pdf": "c"}}
+
+def test_create_portfolio_force_invalid():
+    with pytest.raises(AssertionError) as exc:
+        create_portfolio(VALID_CLIENTS, VALID_YEARS, VALID_QUARTERS, VALID_PATH, force=1)
+    assert str(exc.value) == "FORCE_NOT_A_BOOL"
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_create_portfolio_instrumentation(tmp_path, workers):
+    clients = ["TechCorp", "HealthCorp"]
+    years = ["2024"]
+    quarters = ["Q1", "Q2"]
+    copy_fund("tests/scenarios/Fund_01", tmp_path, clients, years, quarters)
+
+    instrumentation.reset()
+    create_portfolio(clients, years, quarters, root_path=str(tmp_path), workers=workers)
+    data = instrumentation.snapshot()
+
+    assert data["counters"]["verify.calls"] == 4
+    assert data["stages"]["portfolio.create"]["calls"] == 1
+    assert data["stages"]["portfolio.period"]["calls"] == 4
+    assert data["stages"]["portfolio.load_json"]["calls"] == 8
+    assert data["stages"]["report.final"]["calls"] == 4
+    assert sorted(p["period"] for p in data["slowest_periods"]) == \
+        ["HealthCorp_2024_Q1", "HealthCorp_2024_Q2", "TechCorp_2024_Q1", "TechCorp_2024_Q2"]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_create_portfolio_time_budget_unknown(tmp_path, caplog, workers):
+    period_folder = tmp_path / "Alpha" / "2024_Q1"
+    period_folder.mkdir(parents=True)
+    (period_folder / "logics.json").write_text(json.dumps({
+        "audit_id": "Alpha_2024_Q1",
+        "contract_name": "Complexity Test",
+        "variables": [{"name": "x", "definition": "Non-linear math", "definition_page": 9}],
+        "logical_conditions": [{"id": 999, "formula": "x**x == 50", "evidence": "Complexity breach", "evidence_page": 1}]
+    }))
+    (period_folder / "cfo_data.json").write_text(json.dumps({}))
+    caplog.set_level("INFO", logger="app.core.portfolio")
+
+    with pytest.raises(AssertionError) as exc:
+        create_portfolio(["Alpha"], ["2024"], ["Q1"], root_path=str(tmp_path), workers=workers)
+    assert str(exc.value) == "RESULT_UNKNOWN"
+
+    for _ in range(2):
+        portfolio = create_portfolio(["Alpha"], ["2024"], ["Q1"], root_path=str(tmp_path), workers=workers,
+                                     cache=True, time_budget=10)
+        z3_result = portfolio["Alpha"].history["2024"]["Q1"]["z3_result"]
+        assert z3_result["status"] == "UNKNOWN"
+        assert z3_result["is_compliant"] is None
+        # UNKNOWN responses are not cached, so every run tries again.
+        assert cache_stats(caplog) == (0, 1)
+    assert (period_folder / "report_final_2024_Q1.pdf").exists()
+
+def test_create_portfolio_time_budget_is_respected(tmp_path):
+    # Every check on this system runs until its timeout: the preprocessed check, the tracked recheck and
+    # both retry tactics must share the budget instead of each getting all of it.
+    formulas = ["x*x*y + y*y*z + z*z*w + w*w*x == 7", "x*y*z*w == 3", "x*x + y*y + z*z + w*w <= 10",
+                "x*y - z*w >= 1.5", "x*z*z - y*w*w == 2.25", "u*v*x - w*y*u == 1.1"]
+    period_folder = tmp_path / "Alpha" / "2024_Q1"
+    period_folder.mkdir(parents=True)
+    (period_folder / "logics.json").write_text(json.dumps({
+        "audit_id": "Alpha_2024_Q1",
+        "contract_name": "Complexity Test",
+        "variables": [{"name": name, "definition": "Non-linear math", "definition_page": 9} for name in "xyzwuv"],
+        "logical_conditions": [{"id": k, "formula": f, "evidence": "Complexity", "evidence_page": 1}
+                               for k, f in enumerate(formulas, start=1)]
+    }))
+    (period_folder / "cfo_data.json").write_text(json.dumps({}))
+
+    start = time.time()
+    portfolio = create_portfolio(["Alpha"], ["2024"], ["Q1"], root_path=str(tmp_path), time_budget=2)
+    elapsed = time.time() - start
+
+    assert portfolio["Alpha"].history["2024"]["Q1"]["z3_result"]["status"] == "UNKNOWN"
+    assert elapsed < 2 + 1.5
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"time_budget": "10"}, "TIME_BUDGET_NOT_A_NUMBER"),
+    ({"time_budget": 0}, "TIME_BUDGET_NOT_POSITIVE"),
+    ({"limits": {"timeout_ms": 10}}, "LIMITS_INVALID"),
+])
+def test_create_portfolio_limits_invalid(kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        create_portfolio(VALID_CLIENTS, VALID_YEARS, VALID_QUARTERS, VALID_PATH, **kwargs)
+    assert str(exc.value) == expected_msg
@@ -1,5 +1,9 @@
-import pytest, copy
-from app.core.postprocessing import calculate_stress_matrix
+import pytest, copy, json
+import numpy as np
+from app.core import postprocessing
+from app.core.deal import Deal
+from app.core.postprocessing import calculate_stress_matrix, calculate_headroom, trace_frontier, refine_verdicts
+from app.core.postprocessing import calculate_stress_space, sample_unit_cube, session_checker, stress_factor
 
 VALID_PORTFOLIO = {"Client1": {"history": {"2024": {"Q1": {"logics": [], "cfo_data": {}}}}}}
 VALID_CLIENTS = ["Netflix"]
@@ -56,4 +60,276 @@ def test_calculate_stress_matrix_config_details(target_key, patch, expected_msg)
         calculate_stress_matrix({}, ["C1"], "2024", "Q1", test_config)
     
     assert expected_msg in str(exc.value)
-    assert target_key in str(exc.value)
\ No newline at end of file
+    assert target_key in str(exc.value)
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def build_portfolio():
+    deal = Deal("ClientAlpha")
+    deal.process_logics_and_cfo_data("2026", "Q1", load_json("tests/scenarios/logics_simple.json"),
+                                     load_json("tests/scenarios/cfo_data_simple.json"))
+    return {deal.id: deal}
+
+STRESS_CONFIG_SIMPLE = {
+    "var_x": {"name": "consolidated_net_income", "direction": "down", "steps": 6, "max_pct": 0.6},
+    "var_y": {"name": "consolidated_funded_indebtedness", "direction": "up", "steps": 6, "max_pct": 0.6}
+}
+
+def test_calculate_stress_matrix_mode_invalid():
+    with pytest.raises(AssertionError) as exc:
+        calculate_stress_matrix(build_portfolio(), ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode="turbo")
+    assert str(exc.value) == "MODE_INVALID"
+
+def test_calculate_stress_matrix_incremental_matches_naive():
+    portfolio = build_portfolio()
+
+    naive = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode="naive")
+    incremental = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode="incremental")
+
+    assert incremental == naive
+    cells = [cell["is_compliant"] for row in naive["ClientAlpha"]["grid"] for cell in row]
+    assert any(cells) and not all(cells)
+
+def test_calculate_headroom_exact_breakeven():
+    portfolio = build_portfolio()
+
+    headroom = calculate_headroom(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, tolerance=1e-6)
+
+    # Leverage limit 4.0 with EBITDA 10M and cash 5M: debt can grow from 30M to 45M (+50%).
+    assert headroom["ClientAlpha"]["headroom_x"] == pytest.approx(60.0)
+    assert headroom["ClientAlpha"]["headroom_y"] == pytest.approx(50.0, abs=1e-4)
+    assert headroom["ClientAlpha"]["headroom_y"] <= 50.0
+    assert headroom["ClientAlpha"]["solves"] < 30
+
+    matrix = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE)
+    assert matrix["ClientAlpha"]["headroom_y"] == "50.0%"
+
+def test_calculate_headroom_tolerance_invalid():
+    with pytest.raises(AssertionError) as exc:
+        calculate_headroom(build_portfolio(), ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, tolerance=0.0)
+    assert str(exc.value) == "TOLERANCE_NOT_POSITIVE"
+
+def test_calculate_stress_matrix_frontier_matches_full_grid():
+    portfolio = build_portfolio()
+    config = copy.deepcopy(STRESS_CONFIG_SIMPLE)
+    config["var_x"]["steps"] = 20
+    config["var_y"]["steps"] = 20
+
+    full = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config)
+    frontier = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config, mode="frontier")
+
+    solved_cells = frontier["ClientAlpha"].pop("solved_cells")
+
+    assert frontier == full
+    assert solved_cells <= 21 + 21
+
+def test_calculate_stress_matrix_vectorized_matches_full_grid():
+    logics = load_json("tests/scenarios/Fund_01/TechCorp/2024_Q1/logics.json")
+
+    portfolio = {}
+    for client_id, revenue in [("TechCorp", 800000.0), ("HealthCorp", 900000.0), ("RetailCorp", 700000.0)]:
+        deal = Deal(client_id)
+        cfo_data = {"revenue": revenue, "operating_expenses": revenue * 0.7, "total_debt": 1200000.0,
+                    "cash": 250000.0, "min_ebitda_threshold": 120000.0}
+        deal.process_logics_and_cfo_data("2024", "Q1", {**logics, "audit_id": f"{client_id}_2024_Q1"}, cfo_data)
+        portfolio[client_id] = deal
+
+    config = {
+        "var_x": {"name": "revenue", "direction": "down", "steps": 20, "max_pct": 0.2},
+        "var_y": {"name": "operating_expenses", "direction": "up", "steps": 20, "max_pct": 0.2}
+    }
+
+    full = calculate_stress_matrix(portfolio, list(portfolio), "2024", "Q1", config)
+    vectorized = calculate_stress_matrix(portfolio, list(portfolio), "2024", "Q1", config, mode="vectorized")
+
+    solved_cells = {c: vectorized[c].pop("solved_cells") for c in vectorized}
+
+    assert vectorized == full
+    assert all(n < 21 * 21 for n in solved_cells.values())
+
+def test_calculate_stress_matrix_vectorized_variable_outside_contract():
+    deal = Deal("ClientAlpha")
+    cfo_data = {**load_json("tests/scenarios/cfo_data_simple.json"), "unused_metric": 100.0}
+    deal.process_logics_and_cfo_data("2026", "Q1", load_json("tests/scenarios/logics_simple.json"), cfo_data)
+    portfolio = {deal.id: deal}
+
+    config = copy.deepcopy(STRESS_CONFIG_SIMPLE)
+    config["var_x"]["name"] = "unused_metric"
+
+    incremental = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config)
+    vectorized = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config, mode="vectorized")
+
+    vectorized["ClientAlpha"].pop("solved_cells")
+    assert vectorized == incremental
+    assert incremental["ClientAlpha"]["headroom_x"] == "60.0%"
+
+@pytest.mark.parametrize("mode", ["incremental", "frontier"])
+def test_calculate_stress_matrix_workers_match_sequential(mode):
+    portfolio = build_portfolio()
+
+    calls = []
+    sequential = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode=mode)
+    parallel = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode=mode,
+                                       workers=3, progress=lambda done, total: calls.append((done, total)))
+
+    assert parallel == sequential
+    assert calls[-1][0] == calls[-1][1]
+    assert len(calls) == (3 if mode == "incremental" else 1)
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"workers": "2"}, "WORKERS_NOT_INT"),
+    ({"workers": 0}, "WORKERS_BELOW_ONE"),
+    ({"progress": "log"}, "PROGRESS_NOT_CALLABLE"),
+])
+def test_calculate_stress_matrix_parallel_arguments_invalid(kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        calculate_stress_matrix(build_portfolio(), ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, **kwargs)
+    assert str(exc.value) == expected_msg
+
+def test_trace_frontier_undecided_cells():
+    # OK below the anti-diagonal, with one cell on the frontier the solver could not decide.
+    def check_cell(j, i):
+        if (j, i) == (1, 2):
+            return None
+        return i + j < 3
+
+    verdicts, solved = trace_frontier(check_cell, 3, 4)
+
+    assert verdicts == [[True, True, True, False],
+                        [True, True, None, False],
+                        [True, False, False, False]]
+    assert solved == 6
+
+def test_refine_verdicts_matches_full_grid():
+    # Staircase boundary on a 41 x 41 lattice, refined from 5 x 5 blocks.
+    check_cell = lambda j, i: 3 * i + 2 * j < 90
+
+    verdicts, solved = refine_verdicts(check_cell, 41, 41, 5, 5)
+
+    assert verdicts == [[check_cell(j, i) for i in range(41)] for j in range(41)]
+    assert solved < 41 * 41 / 2
+
+def test_calculate_stress_matrix_adaptive_matches_uniform():
+    portfolio = build_portfolio()
+    config = copy.deepcopy(STRESS_CONFIG_SIMPLE)
+    config["var_x"]["steps"] = 4
+    config["var_y"]["steps"] = 4
+
+    coarse = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config)
+    adaptive = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config, mode="adaptive",
+                                       steps_x_refined=20, steps_y_refined=20)
+
+    config["var_x"]["steps"] = 20
+    config["var_y"]["steps"] = 20
+    fine = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config)
+
+    result = adaptive["ClientAlpha"]
+    refinement = result.pop("refinement")
+    solved_cells = result.pop("solved_cells")
+
+    assert result["grid"] == coarse["ClientAlpha"]["grid"]
+    assert result["metadata"] == coarse["ClientAlpha"]["metadata"]
+    assert (result["headroom_x"], result["headroom_y"]) == (fine["ClientAlpha"]["headroom_x"], fine["ClientAlpha"]["headroom_y"])
+
+    assert refinement["cells"] == 21 * 21
+    assert refinement["solved_cells"] < 21 * 21 / 2
+    assert solved_cells == refinement["solved_cells"]
+    for row, boundary in zip(fine["ClientAlpha"]["grid"], refinement["boundary"]):
+        assert boundary["pct_y"] == row[0]["pct_y"]
+        assert boundary["last_safe_pct_x"] == max([cell["pct_x"] for cell in row if cell["is_compliant"]], default=None)
+
+def test_calculate_stress_matrix_adaptive_off_lattice_coarse_cells():
+    portfolio = build_portfolio()
+    config = copy.deepcopy(STRESS_CONFIG_SIMPLE)
+    config["var_x"]["steps"] = 4
+    config["var_y"]["steps"] = 4
+
+    coarse = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config)
+    adaptive = calculate_stress_matrix(portfolio, ["ClientAlpha"], "2026", "Q1", config, mode="adaptive",
+                                       steps_x_refined=10, steps_y_refined=10)
+
+    assert adaptive["ClientAlpha"]["grid"] == coarse["ClientAlpha"]["grid"]
+    assert adaptive["ClientAlpha"]["solved_cells"] > adaptive["ClientAlpha"]["refinement"]["solved_cells"]
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"steps_x_refined": 20}, "REFINED_STEPS_NOT_INT"),
+    ({"steps_x_refined": 20, "steps_y_refined": 20.0}, "REFINED_STEPS_NOT_INT"),
+    ({"steps_x_refined": 3, "steps_y_refined": 20}, "REFINED_STEPS_IMPOSSIBLE_VALUE"),
+    ({"steps_x_refined": 20, "steps_y_refined": 201}, "REFINED_STEPS_IMPOSSIBLE_VALUE"),
+])
+def test_calculate_stress_matrix_adaptive_steps_invalid(kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        calculate_stress_matrix(build_portfolio(), ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE, mode="adaptive", **kwargs)
+    assert str(exc.value) == expected_msg
+
+SPACE_CONFIG_SIMPLE = {
+    "variables": [
+        {"name": "consolidated_net_income", "direction": "down", "max_pct": 0.6},
+        {"name": "consolidated_funded_indebtedness", "direction": "up", "max_pct": 0.6},
+        {"name": "unrestricted_cash", "direction": "down", "max_pct": 0.5},
+        {"name": "interest_expense", "direction": "up", "max_pct": 0.9}
+    ]
+}
+
+def test_sample_unit_cube_lhs_strata():
+    points = sample_unit_cube("lhs", 50, 3, seed=7)
+
+    assert points.shape == (50, 3)
+    for k in range(3):
+        assert sorted(np.floor(points[:, k] * 50).astype(int).tolist()) == list(range(50))
+    assert np.array_equal(points, sample_unit_cube("lhs", 50, 3, seed=7))
+
+def test_calculate_stress_space_matches_solver():
+    portfolio = build_portfolio()
+
+    result = calculate_stress_space(portfolio, ["ClientAlpha"], "2026", "Q1", SPACE_CONFIG_SIMPLE, samples=200)["ClientAlpha"]
+
+    entry = portfolio["ClientAlpha"].history["2026"]["Q1"]
+    check = session_checker(entry["logics"], entry["cfo_data"], set(result["metadata"]["variables"]))
+    for point in result["points"]:
+        test_data = entry["cfo_data"].copy()
+        for var in SPACE_CONFIG_SIMPLE["variables"]:
+            test_data[var["name"]] *= stress_factor(var, point["pct"][var["name"]])
+        assert point["is_compliant"] == check(test_data)
+
+    assert len(result["points"]) == 200
+    assert 0 < result["compliant_fraction"] < 1
+    assert result["compliant_fraction"] == sum(p["is_compliant"] for p in result["points"]) / 200
+    assert result["standard_error"] > 0
+
+    headroom = calculate_headroom(portfolio, ["ClientAlpha"], "2026", "Q1", STRESS_CONFIG_SIMPLE)["ClientAlpha"]
+    assert result["marginal_headroom"]["consolidated_net_income"] == pytest.approx(headroom["headroom_x"])
+    assert result["marginal_headroom"]["consolidated_funded_indebtedness"] == pytest.approx(headroom["headroom_y"])
+
+def test_calculate_stress_space_sobol():
+    pytest.importorskip("scipy")
+
+    result = calculate_stress_space(build_portfolio(), ["ClientAlpha"], "2026", "Q1", SPACE_CONFIG_SIMPLE,
+                                    samples=128, method="sobol")["ClientAlpha"]
+
+    assert len(result["points"]) == 128
+    assert 0 < result["compliant_fraction"] < 1
+
+def test_calculate_stress_space_sobol_requires_scipy(monkeypatch):
+    monkeypatch.setattr(postprocessing, "qmc", None)
+    with pytest.raises(AssertionError) as exc:
+        calculate_stress_space(build_portfolio(), ["ClientAlpha"], "2026", "Q1", SPACE_CONFIG_SIMPLE, samples=128, method="sobol")
+    assert str(exc.value) == "SOBOL_REQUIRES_SCIPY"
+
+@pytest.mark.parametrize("config, kwargs, expected_msg", [
+    ([], {}, "SPACE_CONFIG_NOT_DICT"),
+    ({}, {}, "VARIABLES_MISSING"),
+    ({"variables": []}, {}, "VARIABLES_IMPOSSIBLE_COUNT"),
+    ({"variables": [{"name": "a", "direction": "down"}]}, {}, "MAX_PCT_MISSING_IN_var_0"),
+    ({"variables": SPACE_CONFIG_SIMPLE["variables"][:1] * 2}, {}, "VARIABLES_DUPLICATED"),
+    (SPACE_CONFIG_SIMPLE, {"method": "grid"}, "METHOD_INVALID"),
+    (SPACE_CONFIG_SIMPLE, {"samples": 0}, "SAMPLES_IMPOSSIBLE_VALUE"),
+    (SPACE_CONFIG_SIMPLE, {"samples": 10.0}, "SAMPLES_NOT_INT"),
+    (SPACE_CONFIG_SIMPLE, {"seed": "0"}, "SEED_NOT_INT"),
+])
+def test_calculate_stress_space_inputs_invalid(config, kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        calculate_stress_space(build_portfolio(), ["ClientAlpha"], "2026", "Q1", config, **kwargs)
+    assert str(exc.value) == expected_msg
@@ -1,7 +1,7 @@
 import json
 from pypdf import PdfReader
 from app.core.report import *
-from app.core.z3engine import validate_json, verify_logics
+from app.core.z3engine import validate_json, verify_logics, SolverLimits
 from app.core.portfolio import create_portfolio
 
 LOGICS_FILENAME = "logics_simple.json"
@@ -124,4 +124,28 @@ def test_generate_matrix_report():
 
     assert metrics["pages"] == EXPECTED_PAGES
     assert metrics["word_count"] == EXPECTED_WORDS
-    assert metrics["char_count"] == EXPECTED_CHARS
\ No newline at end of file
+    assert metrics["char_count"] == EXPECTED_CHARS
+
+def pdf_text(filepath):
+    return " ".join([p.extract_text() for p in PdfReader(filepath).pages])
+
+def test_generate_reports_unknown(tmp_path):
+
+    logics = {
+        "audit_id": "ClientAlpha_2026_Q1",
+        "contract_name": "Complexity Test",
+        "variables": [{"name": "x", "definition": "Non-linear math", "definition_page": 9}],
+        "logical_conditions": [{"id": 999, "formula": "x**x == 50", "evidence": "Complexity breach", "evidence_page": 1}]
+    }
+    z3_result = verify_logics(logics, {}, limits=SolverLimits(timeout_ms=2000, allow_unknown=True))
+
+    final_path = str(tmp_path / "final_report_unknown.pdf")
+    generate_final_report(z3_result, logics, {}, final_path)
+    assert "UNDECIDED: SOLVER RETURNED UNKNOWN" in pdf_text(final_path)
+
+    matrix_results = load_json("tests/scenarios/Fund_01/matrix_results.json")
+    next(iter(matrix_results.values()))["grid"][0][0]["is_compliant"] = None
+
+    output_path = str(tmp_path / "portfolio_sensitivity_matrix_unknown.pdf")
+    generate_matrix_report(matrix_results, "2024", "Q1", output_path)
+    assert "UNKNOWN" in pdf_text(output_path)
@@ -0,0 +1,56 @@
+import copy
+import json
+import pytest
+from app.core import result_cache
+from app.core.result_cache import ResultCache, result_key, verify_logics_cached
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+@pytest.fixture
+def scenario():
+    return load_json("tests/scenarios/logics_simple.json"), load_json("tests/scenarios/cfo_data_simple.json")
+
+def test_result_key_inputs(scenario, monkeypatch):
+    logics, cfo_data = scenario
+    key = result_key(logics, cfo_data)
+
+    renamed = copy.deepcopy(logics)
+    renamed["audit_id"] = "Other_2030_Q4"
+    assert result_key(renamed, cfo_data) == key
+    assert result_key(logics, dict(reversed(list(cfo_data.items())))) == key
+
+    edited = copy.deepcopy(cfo_data)
+    edited[next(iter(edited))] += 1.0
+    assert result_key(logics, edited) != key
+
+    edited_logics = copy.deepcopy(logics)
+    edited_logics["logical_conditions"][0]["formula"] += " + 0"
+    assert result_key(edited_logics, cfo_data) != key
+
+    monkeypatch.setattr(result_cache, "ENGINE_VERSION", "test")
+    assert result_key(logics, cfo_data) != key
+
+def test_verify_logics_cached_roundtrip(scenario, tmp_path):
+    logics, cfo_data = scenario
+    cache = ResultCache(tmp_path / "cache.sqlite")
+
+    solved = verify_logics_cached(logics, cfo_data, cache)
+    assert cache.stats() == {"hits": 0, "misses": 1}
+    cache.close()
+
+    cache = ResultCache(tmp_path / "cache.sqlite")
+    cached = verify_logics_cached(logics, cfo_data, cache)
+    assert cache.stats() == {"hits": 1, "misses": 0}
+    assert cached["model"] is None
+    assert {k: v for k, v in cached.items() if k != "model"} == {k: v for k, v in solved.items() if k != "model"}
+
+def test_verify_logics_cached_validates_cfo_data(scenario, tmp_path):
+    logics, cfo_data = scenario
+    cache = ResultCache(tmp_path / "cache.sqlite")
+    verify_logics_cached(logics, cfo_data, cache)
+
+    with pytest.raises(AssertionError) as exc:
+        verify_logics_cached(logics, {**cfo_data, "extra": 1}, cache)
+    assert str(exc.value) == "CFO_DATA_VAR_INVALID"
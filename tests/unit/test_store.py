@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from app.core.deal import Deal
+from app.core.store import PortfolioStore, build_store
+
+def build_logics(client_id, year, quarter):
+    return {
+        "audit_id": f"{client_id}_{year}_{quarter}",
+        "contract_name": "Store Test",
+        "variables": [{"name": "ebitda", "definition": "EBITDA", "definition_page": 1},
+                      {"name": "debt", "definition": "Debt", "definition_page": 1},
+                      {"name": "leverage", "definition": "Leverage", "definition_page": 1}],
+        "logical_conditions": [{"id": 1, "formula": "leverage == debt / ebitda", "evidence": "Def", "evidence_page": 1},
+                               {"id": 2, "formula": "leverage <= 3", "evidence": "Max", "evidence_page": 1}]
+    }
+
+DATA = {
+    "Alpha": [("2024", "Q2", 10.0, 20.0), ("2024", "Q1", 10.0, 25.0), ("2024", "Q3", 10.0, 40.0)],
+    "Beta": [("2024", "Q1", 20.0, 20.0), ("2024", "Q3", 20.0, 30.0)]
+}
+
+@pytest.fixture
+def portfolio_and_store():
+    store = PortfolioStore()
+    portfolio = {}
+    for client_id, periods in DATA.items():
+        deal = Deal(client_id, store=store)
+        for y, q, ebitda, debt in periods:
+            deal.process_logics_and_cfo_data(y, q, build_logics(client_id, y, q), {"ebitda": ebitda, "debt": debt})
+        portfolio[client_id] = deal
+    return portfolio, store
+
+def test_store_axes(portfolio_and_store):
+    _, store = portfolio_and_store
+
+    assert store.deals == ["Alpha", "Beta"]
+    assert store.periods == [("2024", "Q1"), ("2024", "Q2"), ("2024", "Q3")]
+    assert store.variables == ["ebitda", "debt", "leverage"]
+    assert store.values.shape == (2, 3, 3)
+    assert store.recorded.tolist() == [[True, True, True], [True, False, True]]
+    assert store.compliant.tolist() == [[True, True, False], [True, False, True]]
+
+def test_store_queries(portfolio_and_store):
+    _, store = portfolio_and_store
+
+    # Breached periods have no solver values, only the reported cfo_data.
+    np.testing.assert_allclose(store.series("leverage", "Alpha"), [2.5, 2.0, np.nan])
+    np.testing.assert_allclose(store.series("leverage"), [[2.5, 2.0, np.nan], [1.0, np.nan, 1.5]])
+    np.testing.assert_allclose(store.cross_section("2024", "Q3", ["debt", "leverage"]), [[40.0, np.nan], [30.0, 1.5]])
+
+    np.testing.assert_allclose(store.aggregate("leverage"), [1.75, 2.0, 1.5])
+    np.testing.assert_allclose(store.aggregate("leverage", how="max", over="periods"), [2.5, 1.5])
+    np.testing.assert_allclose(store.compliance_rate(), [1.0, 1.0, 0.5])
+    np.testing.assert_allclose(store.compliance_rate(over="periods"), [2 / 3, 1.0])
+    assert store.breaches() == [("Alpha", ("2024", "Q3"))]
+
+def test_store_reprocessed_period_is_replaced(portfolio_and_store):
+    portfolio, store = portfolio_and_store
+
+    portfolio["Alpha"].process_logics_and_cfo_data("2024", "Q3", build_logics("Alpha", "2024", "Q3"),
+                                                   {"ebitda": 10.0, "debt": 10.0})
+
+    assert store.series("leverage", "Alpha")[2] == 1.0
+    assert store.breaches() == []
+
+def test_build_store_matches_incremental(portfolio_and_store):
+    portfolio, store = portfolio_and_store
+    rebuilt = build_store(portfolio)
+
+    assert rebuilt.deals == store.deals
+    assert rebuilt.periods == store.periods
+    assert rebuilt.variables == store.variables
+    np.testing.assert_array_equal(rebuilt.values, store.values)
+    np.testing.assert_array_equal(rebuilt.compliant, store.compliant)
+
+@pytest.mark.parametrize("how, over, expected_msg", [
+    ("mode", "deals", "AGGREGATE_INVALID"),
+    ("mean", "variables", "AXIS_INVALID"),
+])
+def test_store_aggregate_invalid(portfolio_and_store, how, over, expected_msg):
+    _, store = portfolio_and_store
+    with pytest.raises(AssertionError) as exc:
+        store.aggregate("leverage", how=how, over=over)
+    assert str(exc.value) == expected_msg
+
+def test_store_unknown_periods(portfolio_and_store):
+    portfolio, store = portfolio_and_store
+
+    portfolio["Beta"].record("2024", "Q2", build_logics("Beta", "2024", "Q2"), {"ebitda": 20.0, "debt": 25.0}, {
+        "status": "UNKNOWN", "is_compliant": None, "calculated_values": {}, "model": None, "missing": {},
+        "norm_metric": None, "conflict_variables": [], "conflict_rules": []
+    })
+
+    assert portfolio["Beta"].history["2024"]["Q2"]["z3_result"]["is_compliant"] is None
+    assert store.unknown.tolist() == [[False, False, False], [False, True, False]]
+    assert store.undecided() == [("Beta", ("2024", "Q2"))]
+    assert store.breaches() == [("Alpha", ("2024", "Q3"))]
+    np.testing.assert_allclose(store.compliance_rate(), [1.0, 1.0, 0.5])
+
+def test_store_growth_keeps_cells_aligned():
+    rng = np.random.default_rng(0)
+    store = PortfolioStore()
+    expected = {}
+
+    periods = [(str(y), q) for y in range(2000, 2030) for q in ["Q1", "Q2", "Q3", "Q4"]]
+    for k in rng.permutation(len(periods) * 40)[:2000]:
+        deal_id, (y, q) = f"deal_{k % 40}", periods[k // 40]
+        name = f"var_{k % 7}"
+        store.update(deal_id, y, q, {name: float(k)}, {"is_compliant": bool(k % 2), "calculated_values": {}})
+        expected[(deal_id, y, q)] = (name, float(k), bool(k % 2))
+
+    assert store.periods == sorted(store.periods, key=lambda p: (p[0], ["Q1", "Q2", "Q3", "Q4"].index(p[1])))
+    assert store.values.shape == (40, len(store.periods), 7)
+    assert store.storage["values"].shape[0] < 2 * 40 and store.storage["values"].shape[1] < 2 * len(store.periods)
+    assert store.recorded.sum() == len(expected)
+    for (deal_id, y, q), (name, value, compliant) in expected.items():
+        d, p = store.deal_index[deal_id], store.period_index[(y, q)]
+        assert store.values[d, p, store.variable_index[name]] == value
+        assert np.isnan(store.values[d, p]).sum() == 6
+        assert store.compliant[d, p] == compliant
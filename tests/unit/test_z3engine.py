@@ -1,6 +1,13 @@
+import copy
 import json
+import logging
+import multiprocessing
 import pytest
-from app.core.z3engine import verify_logics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from z3 import Real, RealVal
+from app.core import z3engine, instrumentation
+from app.core.z3engine import verify_logics, verify_logics_batch, ContractSession, SolverLimits, RETRY_TACTICS, preprocess, compile_logics, contract_key, contract_cache_info, clear_contract_cache
 
 def load_json(path):
     with open(path, 'r') as f:
@@ -137,4 +144,327 @@ def test_verify_logics_bad_cfo_data():
         verify_logics(logics, bad_cfo_data)
     assert str(exc.value) == "CFO_DATA_VAR_INVALID"
     print(f"ERROR: {exc.value}")
-    
\ No newline at end of file
+    
+def test_contract_session_matches_verify_logics():
+
+    scenarios = [
+        ("logics_simple.json", "cfo_data_simple.json"),
+        ("logics_complex.json", "cfo_data_complex.json"),
+        ("logics_complex.json", "cfo_data_complex_fail.json")
+    ]
+
+    for filename_logic, filename_cfo in scenarios:
+
+        logic_data = load_json(f"tests/scenarios/{filename_logic}")
+        cfo_data = load_json(f"tests/scenarios/{filename_cfo}")
+
+        session = ContractSession(logic_data)
+
+        assert session.check(cfo_data) == verify_logics(logic_data, cfo_data)["is_compliant"]
+        assert session.check(cfo_data) == verify_logics(logic_data, cfo_data)["is_compliant"]
+
+def test_contract_session_bad_cfo_data():
+    logics = load_json("tests/scenarios/logics_simple.json")
+    session = ContractSession(logics)
+
+    with pytest.raises(AssertionError) as exc:
+        session.check({"consolidated_net_income": "6000000"})
+    assert str(exc.value) == "CFO_DATA_VAR_INVALID"
+
+    assert session.check(load_json("tests/scenarios/cfo_data_simple.json")) == True
+
+def test_compile_logics_cache_hits_across_audit_ids():
+    clear_contract_cache()
+
+    logics = load_json("tests/scenarios/logics_simple.json")
+    cfo_data = load_json("tests/scenarios/cfo_data_simple.json")
+
+    first = verify_logics(logics, cfo_data)
+    second = verify_logics({**logics, "audit_id": "ClientBeta_2026_Q2"}, cfo_data)
+
+    assert contract_cache_info()["misses"] == 1
+    assert contract_cache_info()["hits"] == 1
+    assert compile_logics(logics) is compile_logics({**logics, "audit_id": "Other"})
+    assert second["calculated_values"] == first["calculated_values"]
+
+    edited = copy.deepcopy(logics)
+    edited["logical_conditions"][4]["formula"] = "consolidated_total_net_leverage_ratio <= 2.0"
+    assert compile_logics(edited) is not compile_logics(logics)
+    assert verify_logics(edited, cfo_data)["is_compliant"] == False
+
+def test_compile_logics_cache_eviction(monkeypatch):
+    clear_contract_cache()
+    monkeypatch.setattr(z3engine, "CONTRACT_CACHE_SIZE", 2)
+
+    logics = load_json("tests/scenarios/logics_simple.json")
+    variants = []
+    for limit in ["3.0", "4.0", "5.0"]:
+        variant = copy.deepcopy(logics)
+        variant["logical_conditions"][4]["formula"] = f"consolidated_total_net_leverage_ratio <= {limit}"
+        variants.append(variant)
+        compile_logics(variant)
+
+    assert contract_cache_info()["size"] == 2
+    assert contract_key(variants[0]) not in z3engine._contract_cache
+    assert contract_key(variants[2]) in z3engine._contract_cache
+
+def test_compile_logics_invalid_is_not_cached():
+    clear_contract_cache()
+
+    logics = load_json("tests/scenarios/logics_simple.json")
+    logics["variables"][0]["definition"] = ""
+
+    with pytest.raises(AssertionError) as exc:
+        compile_logics(logics)
+    assert str(exc.value) == "DEFINITION_EMPTY"
+    assert contract_cache_info()["size"] == 0
+
+def test_verify_logics_logging(caplog):
+    logics = load_json("tests/scenarios/logics_simple.json")
+    cfo_data = load_json("tests/scenarios/cfo_data_simple.json")
+
+    with caplog.at_level(logging.INFO, logger="app.core.z3engine"):
+        verify_logics(logics, cfo_data)
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith("Rule #1: ") for m in messages)
+    assert "STATUS: COMPLIANT (SAT)." in messages
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="app.core.z3engine"):
+        verify_logics(logics, cfo_data, quiet=True)
+    assert caplog.records == []
+
+    with caplog.at_level(logging.DEBUG, logger="app.core.z3engine"):
+        verify_logics(logics, cfo_data, quiet=True)
+    assert any("compile=" in r.getMessage() and "solve=" in r.getMessage() for r in caplog.records)
+
+@pytest.mark.parametrize("filename_logic, filename_cfo", [
+    ("logics_simple.json", "cfo_data_simple.json"),
+    ("logics_complex.json", "cfo_data_complex.json"),
+    ("logics_complex.json", "cfo_data_complex_fail.json")
+])
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_verify_logics_levels(filename_logic, filename_cfo, fast_path):
+    logics = load_json(f"tests/scenarios/{filename_logic}")
+    cfo_data = load_json(f"tests/scenarios/{filename_cfo}")
+
+    full = verify_logics(logics, cfo_data, fast_path=fast_path)
+    core = verify_logics(logics, cfo_data, fast_path=fast_path, level="core")
+    verdict = verify_logics(logics, cfo_data, fast_path=fast_path, level="verdict")
+
+    for result in [core, verdict]:
+        assert result["status"] == full["status"]
+        assert result["is_compliant"] == full["is_compliant"]
+        assert result["missing"] == full["missing"]
+        assert result["calculated_values"] == {}
+        assert result["model"] is None
+        assert result["norm_metric"] == 0
+
+    assert set(core["conflict_variables"]) == set(full["conflict_variables"])
+    assert set(core["conflict_rules"]) == set(full["conflict_rules"])
+    assert verdict["conflict_variables"] == []
+    assert verdict["conflict_rules"] == []
+
+def test_verify_logics_level_invalid():
+    logics = load_json("tests/scenarios/logics_simple.json")
+    cfo_data = load_json("tests/scenarios/cfo_data_simple.json")
+
+    with pytest.raises(AssertionError) as exc:
+        verify_logics(logics, cfo_data, level="model")
+    assert str(exc.value) == "LEVEL_INVALID"
+
+@pytest.mark.parametrize("level", ["verdict", "core", "full"])
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_verify_logics_batch_matches_verify_logics(level, fast_path):
+    logics = load_json("tests/scenarios/logics_complex.json")
+    cfo_data_list = [
+        load_json("tests/scenarios/cfo_data_complex.json"),
+        load_json("tests/scenarios/cfo_data_complex_fail.json"),
+        load_json("tests/scenarios/cfo_data_complex.json")
+    ]
+
+    batch = verify_logics_batch(logics, cfo_data_list, fast_path=fast_path, level=level)
+
+    assert len(batch) == len(cfo_data_list)
+    for result, cfo_data in zip(batch, cfo_data_list):
+        expected = verify_logics(logics, cfo_data, fast_path=fast_path, level=level)
+        for key in ["status", "is_compliant", "calculated_values", "missing", "norm_metric"]:
+            assert result[key] == expected[key]
+        for key in ["conflict_variables", "conflict_rules"]:
+            assert bool(result[key]) == bool(expected[key])
+
+def test_verify_logics_batch_nonlinear():
+    logics = {
+        "audit_id": "ClientAlpha_2026_Q1",
+        "contract_name": "Batch Test",
+        "variables": [{"name": "x", "definition": "Test", "definition_page": 1},
+                      {"name": "y", "definition": "Test", "definition_page": 1}],
+        "logical_conditions": [{"id": 1, "formula": "x * y == 12", "evidence": "Test", "evidence_page": 1},
+                               {"id": 2, "formula": "y * y == x", "evidence": "Test", "evidence_page": 1}]
+    }
+
+    batch = verify_logics_batch(logics, [{}, {"x": 4.0}, {"x": 5.0}])
+
+    assert [result["is_compliant"] for result in batch] == [True, False, False]
+
+@pytest.mark.parametrize("cfo_data_list, expected_msg", [
+    ({"x": 1.0}, "CFO_DATA_LIST_NOT_LIST"),
+    ([{"x": 1.0}, None], "CFO_DATA_NOT_DICT"),
+    ([{"consolidated_ebitda": 1}], "CFO_DATA_VAR_INVALID"),
+])
+def test_verify_logics_batch_invalid(cfo_data_list, expected_msg):
+    logics = load_json("tests/scenarios/logics_simple.json")
+
+    with pytest.raises(AssertionError) as exc:
+        verify_logics_batch(logics, cfo_data_list)
+    assert str(exc.value) == expected_msg
+
+LOGICS_UNKNOWN = {
+    "audit_id": "ClientAlpha_2026_Q1",
+    "contract_name": "Complexity Test",
+    "variables": [{"name": "x", "definition": "Non-linear math", "definition_page": 9}],
+    "logical_conditions": [{"id": 999, "formula": "x**x == 50", "evidence": "Complexity breach", "evidence_page": 1}]
+}
+
+@pytest.mark.parametrize("level", ["verdict", "core", "full"])
+def test_verify_logics_unknown_allowed(level):
+    limits = SolverLimits(timeout_ms=2000, allow_unknown=True)
+
+    result = verify_logics(LOGICS_UNKNOWN, {}, level=level, limits=limits)
+
+    assert result["status"] == "UNKNOWN"
+    assert result["is_compliant"] is None
+    assert result["calculated_values"] == {}
+    assert result["conflict_rules"] == []
+
+def test_verify_logics_unknown_retries():
+    instrumentation.reset()
+    limits = SolverLimits(timeout_ms=2000, allow_unknown=True, retry_tactics=RETRY_TACTICS)
+
+    result = verify_logics(LOGICS_UNKNOWN, {}, quiet=True, limits=limits)
+
+    assert result["is_compliant"] is None
+    assert instrumentation.snapshot()["counters"]["solver.retries"] == len(RETRY_TACTICS)
+
+def test_verify_logics_rlimit_exhausted():
+    logics = load_json("tests/scenarios/logics_complex.json")
+    cfo_data = load_json("tests/scenarios/cfo_data_complex.json")
+
+    with pytest.raises(AssertionError) as exc:
+        verify_logics(logics, cfo_data, fast_path=False, quiet=True, limits=SolverLimits(rlimit=1))
+    assert str(exc.value) == "RESULT_UNKNOWN"
+
+    result = verify_logics(logics, cfo_data, fast_path=False, quiet=True, limits=SolverLimits(rlimit=1, allow_unknown=True))
+    assert result["status"] == "UNKNOWN"
+
+    result = verify_logics(logics, cfo_data, fast_path=False, quiet=True, limits=SolverLimits(timeout_ms=10000))
+    assert result["is_compliant"] is True
+
+def test_contract_session_unknown_allowed():
+    session = ContractSession(LOGICS_UNKNOWN, SolverLimits(timeout_ms=2000, allow_unknown=True))
+
+    assert session.check({}) is None
+
+@pytest.mark.parametrize("kwargs, expected_msg", [
+    ({"timeout_ms": 1.5}, "TIMEOUT_NOT_INT"),
+    ({"timeout_ms": 0}, "TIMEOUT_BELOW_ONE"),
+    ({"rlimit": "1"}, "RLIMIT_NOT_INT"),
+    ({"rlimit": -1}, "RLIMIT_BELOW_ONE"),
+    ({"allow_unknown": 1}, "ALLOW_UNKNOWN_NOT_BOOL"),
+    ({"retry_tactics": "nra"}, "RETRY_TACTICS_NOT_LIST"),
+    ({"deadline": "soon"}, "DEADLINE_NOT_A_NUMBER"),
+])
+def test_solver_limits_invalid(kwargs, expected_msg):
+    with pytest.raises(AssertionError) as exc:
+        SolverLimits(**kwargs)
+    assert str(exc.value) == expected_msg
+
+def test_solver_limits_within():
+    assert SolverLimits().within(250.7).timeout_ms == 250
+    assert SolverLimits(timeout_ms=100).within(250).timeout_ms == 100
+    assert SolverLimits(timeout_ms=100).within(-5).timeout_ms == 1
+
+def test_solver_limits_until():
+    limits = SolverLimits(timeout_ms=100000, allow_unknown=True).until(time.time() + 5)
+    assert limits.allow_unknown
+    assert 4000 < limits.timeout() <= 5000
+    assert SolverLimits(timeout_ms=100).until(time.time() + 5).timeout() == 100
+    assert SolverLimits().until(time.time() - 5).timeout() == 1
+    assert SolverLimits(timeout_ms=100).timeout() == 100
+
+LOGICS_RATIO = {
+    "audit_id": "ClientAlpha_2026_Q1",
+    "contract_name": "Preprocess Test",
+    "variables": [{"name": "revenue", "definition": "Revenue", "definition_page": 1},
+                  {"name": "costs", "definition": "Costs", "definition_page": 1},
+                  {"name": "ebitda", "definition": "EBITDA", "definition_page": 1},
+                  {"name": "debt", "definition": "Debt", "definition_page": 1},
+                  {"name": "leverage", "definition": "Leverage", "definition_page": 1}],
+    "logical_conditions": [{"id": 1, "formula": "ebitda == revenue - costs", "evidence": "Def", "evidence_page": 1},
+                           {"id": 2, "formula": "leverage == debt / ebitda", "evidence": "Def", "evidence_page": 1},
+                           {"id": 3, "formula": "leverage <= 3", "evidence": "Max", "evidence_page": 1}]
+}
+
+@pytest.mark.parametrize("cfo_data, expected_class", [
+    ({"revenue": 100.0, "costs": 60.0, "debt": 80.0}, "QF_LRA"),
+    ({"revenue": 100.0, "costs": 60.0}, "QF_LRA"),
+    ({"revenue": 100.0, "debt": 80.0}, "QF_NRA"),
+    ({}, "QF_NRA"),
+])
+def test_preprocess_solver_class(cfo_data, expected_class):
+    _, solver_class = preprocess(compile_logics(LOGICS_RATIO), cfo_data)
+    assert solver_class == expected_class
+
+@pytest.mark.parametrize("level", ["verdict", "core", "full"])
+@pytest.mark.parametrize("cfo_data", [
+    {"revenue": 100.0, "costs": 60.0, "debt": 80.0},
+    {"revenue": 100.0, "costs": 60.0, "debt": 200.0},
+    {"revenue": 100.0, "costs": 60.0},
+    {"revenue": 100.0, "debt": 80.0},
+])
+def test_verify_logics_preprocessed_matches_plain(level, cfo_data):
+    instrumentation.reset()
+
+    result = verify_logics(LOGICS_RATIO, cfo_data, fast_path=False, quiet=True, level=level)
+    expected = verify_logics(LOGICS_RATIO, cfo_data, fast_path=False, quiet=True, level=level, preprocessed=False)
+
+    for key in ["status", "is_compliant", "missing"]:
+        assert result[key] == expected[key]
+    for key in ["conflict_variables", "conflict_rules"]:
+        assert set(result[key]) == set(expected[key])
+    if "costs" in cfo_data:
+        assert result["calculated_values"] == expected["calculated_values"]
+
+    stages = instrumentation.snapshot()["stages"]
+    solver_class = "QF_LRA" if "costs" in cfo_data else "QF_NRA"
+    assert stages["verify.preprocess"]["calls"] == 1
+    assert stages[f"verify.solve.{solver_class}"]["calls"] == 1
+
+def test_verify_logics_preprocessed_unevaluated_power():
+    logics = copy.deepcopy(LOGICS_RATIO)
+    logics["logical_conditions"] = [{"id": 1, "formula": "ebitda == revenue ** 700", "evidence": "Def", "evidence_page": 1}]
+    cfo_data = {"revenue": 800000.5, "costs": 1.0, "debt": 1.0, "leverage": 1.0}
+
+    result = verify_logics(logics, cfo_data, fast_path=False, quiet=True)
+    expected = verify_logics(logics, cfo_data, fast_path=False, quiet=True, preprocessed=False)
+
+    assert result["status"] == "SAT"
+    assert result["calculated_values"] == expected["calculated_values"]
+
+def test_verify_logics_core_independent_of_history():
+    logics = load_json("tests/scenarios/Fund_01/TechCorp/2024_Q3/logics.json")
+    cfo_data = {k: float(v) for k, v in load_json("tests/scenarios/Fund_01/TechCorp/2024_Q3/cfo_data.json").items()}
+
+    # A fresh process has built nothing else before this contract.
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        expected = pool.submit(verify_logics, logics, cfo_data, quiet=True).result()
+
+    # Terms built elsewhere in this process must not move the unsat core.
+    clear_contract_cache()
+    [Real(f"noise_{i}") for i in range(500)]
+    [Real(name) * 3 + RealVal("1/7") >= 2 for name in ["revenue", "total_debt", "cash", "operating_expenses", "ebitda"]]
+    result = verify_logics(logics, cfo_data, quiet=True)
+
+    assert result["is_compliant"] is False
+    for key in ["conflict_variables", "conflict_rules"]:
+        assert set(result[key]) == set(expected[key])